@@ -0,0 +1,221 @@
+"""
+Benchmark the Python services under load.
+
+    python -m benchmarks ai --concurrency 16 --requests 400
+    python -m benchmarks all --backend fake --update-baseline
+    python -m benchmarks ai-service --url http://localhost:8000 --pid 1234
+
+Each service is started with uvicorn (unless ``--url`` points at a running
+one), its endpoints are driven one after the other, and the run is written
+to ``benchmarks/results/``. When a baseline for the same service, backend
+and load exists, the run is compared against it and the command exits with
+status 1 if any metric regressed by more than ``--threshold``.
+"""
+import argparse
+import asyncio
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks import report
+from benchmarks.loadgen import run_load
+from benchmarks.procstats import ProcessSampler
+from benchmarks.scenarios import ROOT, SERVICES, Service
+
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+
+def resolve_backend(service: Service, requested: str) -> str:
+    if requested == "auto":
+        return "real" if service.real_models_available() else "fake"
+    return requested
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class ServerProcess:
+    """
+    A service started with uvicorn on a free local port, logging to a file.
+    """
+
+    def __init__(self, service: Service, backend: str, workers: int):
+        self.service = service
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ)
+        env.update(service.env)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, service.cwd, env.get("PYTHONPATH")]))
+        env["BENCH_FAKE_MODELS"] = "1" if backend == "fake" else "0"
+        # Without an API key the LLM calls of services/ai go to the stub even with real models
+        env["BENCH_FAKE_LLM"] = "1" if backend == "fake" or not env.get("OPENAI_API_KEY") else "0"
+        # Per-request info logs would be measured as part of every request
+        env.setdefault("LOG_LEVEL", "WARNING")
+        self.log = tempfile.NamedTemporaryFile(
+            prefix=f"bench-{service.name}-", suffix=".log", delete=False
+        )
+        command = [
+            sys.executable, "-m", "uvicorn", service.app,
+            "--host", "127.0.0.1", "--port", str(self.port),
+            "--log-level", "warning", "--no-access-log", "--workers", str(workers)
+        ]
+        self.process = subprocess.Popen(command, cwd=service.cwd, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def log_tail(self, lines: int = 30) -> str:
+        with open(self.log.name, encoding="utf-8", errors="replace") as f:
+            return "".join(f.readlines()[-lines:])
+
+    async def wait_ready(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(base_url=self.url, timeout=5) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"{self.service.name} exited during startup:\n{self.log_tail()}")
+                try:
+                    if (await client.get(self.service.ready_path)).status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.5)
+        raise RuntimeError(f"{self.service.name} not ready after {timeout:.0f}s:\n{self.log_tail()}")
+
+    def stop(self) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
+
+async def benchmark_service(service: Service, args: argparse.Namespace) -> Dict[str, Any]:
+    backend = resolve_backend(service, args.backend)
+    server = None
+    url, pid = args.url, args.pid
+    if url is None:
+        print(f"[{service.name}] starting with {backend} models", file=sys.stderr)
+        server = ServerProcess(service, backend, args.workers)
+        url, pid = server.url, server.pid
+
+    endpoints = [e for e in service.endpoints if not args.endpoint or e.name in args.endpoint]
+    run: Dict[str, Any] = {
+        "config": {
+            "service": service.name,
+            "backend": backend if args.url is None else "external",
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "workers": args.workers
+        },
+        "environment": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "endpoints": {}
+    }
+    try:
+        if server is not None:
+            started = time.perf_counter()
+            await server.wait_ready(args.startup_timeout)
+            run["startup_seconds"] = round(time.perf_counter() - started, 2)
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+            for endpoint in endpoints:
+                print(f"[{service.name}] {endpoint.name}: {args.requests} requests x{args.concurrency}", file=sys.stderr)
+                async with ProcessSampler(pid) as sampler:
+                    result = await run_load(client, endpoint, args.concurrency, args.requests, args.warmup)
+                run["endpoints"][endpoint.name] = report.summarize(result, sampler.result())
+    finally:
+        if server is not None:
+            server.stop()
+            os.unlink(server.log.name)
+    return run
+
+def check_baseline(run: Dict[str, Any], path: str, threshold: float) -> List[Dict[str, Any]]:
+    baseline = report.load_baseline(path)
+    if baseline is None:
+        print(f"No baseline at {path}; run with --update-baseline to create it", file=sys.stderr)
+        return []
+    reasons = report.comparable(run, baseline)
+    if reasons:
+        print(f"Baseline {path} not comparable, skipped ({'; '.join(reasons)})", file=sys.stderr)
+        return []
+    return report.compare(run, baseline, threshold)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("service", choices=[*SERVICES, "all"])
+    parser.add_argument("--backend", choices=["auto", "real", "fake"], default="auto",
+                        help="models to serve: real when available (auto), or the deterministic fakes")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    parser.add_argument("--endpoint", action="append", help="only these endpoints (repeatable)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--url", help="benchmark an already running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="with --url, the server pid to measure RSS and CPU")
+    parser.add_argument("--baseline-dir", default=os.path.join(BENCH_DIR, "baselines"))
+    parser.add_argument("--results-dir", default=os.path.join(BENCH_DIR, "results"))
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed relative regression per metric (0.15 = 15%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="save this run as the new baseline")
+    args = parser.parse_args(argv)
+    if args.url and args.service == "all":
+        parser.error("--url needs a single service")
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    names = list(SERVICES) if args.service == "all" else [args.service]
+    regressions: List[Dict[str, Any]] = []
+    for name in names:
+        run = asyncio.run(benchmark_service(SERVICES[name], args))
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        report.save_json(os.path.join(args.results_dir, f"{name}-{stamp}.json"), run)
+        print(f"\n{name} ({run['config']['backend']} models, concurrency {args.concurrency})")
+        print(report.format_table(run))
+        for endpoint_name, endpoint in run["endpoints"].items():
+            if endpoint["errors"]:
+                print(f"{endpoint_name}: {endpoint['errors']} errors, e.g. {endpoint.get('sample_error')}")
+
+        baseline_path = os.path.join(args.baseline_dir, f"{name}-{run['config']['backend']}.json")
+        if args.update_baseline:
+            os.makedirs(args.baseline_dir, exist_ok=True)
+            report.save_json(baseline_path, run)
+            print(f"Baseline saved to {baseline_path}")
+            continue
+        found = check_baseline(run, baseline_path, args.threshold)
+        for regression in found:
+            change = f" ({regression['change']:+.1%})" if regression["change"] is not None else ""
+            print(f"REGRESSION {name}/{regression['endpoint']} {regression['metric']}: "
+                  f"{regression['baseline']} -> {regression['current']}{change}")
+        regressions.extend(found)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+"""
+ASGI entry points the benchmark runner starts with uvicorn.
+
+Each module imports a service's real application and, when the runner asks
+for fake backends (``BENCH_FAKE_MODELS=1``, ``BENCH_FAKE_LLM=1``), swaps its
+model loaders for the deterministic fakes of ``benchmarks.backends`` before
+the application starts. Routing, validation, batching, executors and
+serialization stay the real code.
+"""
+import os
+
+def fake_models() -> bool:
+    return os.getenv("BENCH_FAKE_MODELS", "0") == "1"
+
+def fake_llm() -> bool:
+    return os.getenv("BENCH_FAKE_LLM", "0") == "1"
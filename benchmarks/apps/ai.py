@@ -0,0 +1,47 @@
+"""
+services/ai under benchmark (run from services/ai: ``uvicorn benchmarks.apps.ai:app``).
+"""
+from app import main
+from app.config import settings
+from app.services.llm import LLMClient
+from app.services.model_registry import ModelRegistry
+from benchmarks.apps import fake_llm, fake_models
+from benchmarks.backends import (
+    FakeSpacy,
+    FakeSummarizer,
+    FakeTextClassifier,
+    FakeTokenClassifier,
+    Latency,
+    fake_llm_transport
+)
+
+def create_fake_model_registry(executor=None) -> ModelRegistry:
+    registry = ModelRegistry(executor)
+    registry.register("spacy", lambda: FakeSpacy(Latency(1.0, 0.05)))
+    registry.register(
+        "sentiment", lambda: FakeTextClassifier(["positive", "neutral", "negative"], Latency(8.0, 1.5)), engine="fake"
+    )
+    registry.register("ner", lambda: FakeTokenClassifier(Latency(8.0, 1.5)), engine="fake")
+    registry.register("summarizer", lambda: FakeSummarizer(Latency(20.0, 4.0)), engine="fake")
+    return registry
+
+def create_fake_llm_client() -> LLMClient:
+    # The real client (pool, semaphore, retries) in front of a stub completions endpoint
+    return LLMClient(
+        api_key="benchmark",
+        model="fake",
+        base_url="http://llm.benchmark/v1",
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        retry_backoff_seconds=settings.LLM_RETRY_BACKOFF_SECONDS,
+        timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+        transport=fake_llm_transport(Latency(150.0, 0.2))
+    )
+
+if fake_models():
+    main.create_model_registry = create_fake_model_registry
+if fake_llm():
+    main.create_llm_client = create_fake_llm_client
+
+app = main.app
@@ -0,0 +1,36 @@
+"""
+services/ai-service under benchmark (run from services/ai-service: ``uvicorn benchmarks.apps.ai_service:app``).
+"""
+import os
+import main
+from condition_classifier import ConditionCatalogue
+from benchmarks.apps import fake_models
+from benchmarks.backends import FakeConditionClassifier, FakeTextClassifier, Latency
+
+def _catalogue() -> ConditionCatalogue:
+    return ConditionCatalogue.load(os.getenv(
+        "CONDITION_CATALOGUE",
+        os.path.join(os.path.dirname(os.path.abspath(main.__file__)), "conditions.json")
+    ))
+
+if fake_models():
+    loader = main.model_loader
+    # Nothing to import: the fakes need neither torch nor onnxruntime
+    loader.prepare = None
+    loader.register(
+        "sentiment",
+        lambda: FakeTextClassifier(["1 star", "2 stars", "3 stars", "4 stars", "5 stars"], Latency(8.0, 1.5)),
+        lambda pipe: pipe("Aquecimento do modelo")
+    )
+    loader.register(
+        "text_classifier",
+        lambda: FakeTextClassifier(["LABEL_0", "LABEL_1"], Latency(8.0, 1.5)),
+        lambda pipe: pipe("Aquecimento do modelo")
+    )
+    loader.register(
+        "conditions",
+        lambda: FakeConditionClassifier(_catalogue(), Latency(10.0, 0.4)),
+        lambda classifier: classifier.classify(["Symptoms: febre"])
+    )
+
+app = main.app
@@ -0,0 +1,45 @@
+"""
+packages/llama-core under benchmark (run from packages/llama-core: ``uvicorn benchmarks.apps.llama_core:app``).
+
+With fake models the GGUF files are not needed: every model size is served
+by the real ``BatchScheduler`` (continuous batching, prefix cache, deadlines)
+over ``FakeLlamaBackend``. llama-cpp-python must still be installed, as the
+service imports it.
+"""
+import os
+from contextlib import contextmanager
+from src import main
+from src.prefix_cache import create_prefix_cache_from_env
+from src.scheduler import BatchScheduler
+from benchmarks.apps import fake_models
+from benchmarks.backends import FakeLlamaBackend, Latency
+
+class FakeModel:
+    pass
+
+def create_fake_scheduler(name: str) -> BatchScheduler:
+    # Same settings as create_scheduler_from_env, with the fake decode backend
+    n_batch = int(os.getenv("LLAMA_BATCH_SIZE", "512"))
+    max_sequences = int(os.getenv("LLAMA_PARALLEL_SEQUENCES", "4"))
+    model = FakeModel()
+
+    @contextmanager
+    def acquire():
+        yield model
+
+    return BatchScheduler(
+        name,
+        acquire,
+        lambda model: FakeLlamaBackend(n_batch, Latency(15.0, 0.05)),
+        max_sequences=max_sequences,
+        max_queue=int(os.getenv("LLAMA_MAX_QUEUE", "16")),
+        context_per_sequence=int(os.getenv("LLAMA_CONTEXT_PER_SEQUENCE", "2048")),
+        prefix_cache=create_prefix_cache_from_env(first_seq_id=max_sequences)
+    )
+
+if fake_models():
+    for size in main.schedulers:
+        main.schedulers[size] = create_fake_scheduler(size)
+    main.model_manager.pinned.clear()
+
+app = main.app
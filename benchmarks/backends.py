@@ -0,0 +1,283 @@
+"""
+Deterministic stand-ins for the models behind the three Python services.
+
+Each fake returns the same output for the same input and spends a
+predictable amount of time per call: ``base_ms`` per forward pass plus
+``per_item_ms`` per input in the batch (per token for the Llama backend).
+The time is spent in ``time.sleep``, which releases the GIL as a native
+forward pass does, so batching and thread-pool behaviour of the services
+are exercised realistically. ``BENCH_FAKE_LATENCY_SCALE`` scales every cost,
+to approximate slower or faster hardware.
+"""
+import asyncio
+import json
+import os
+import time
+import zlib
+from typing import Any, Dict, List, Sequence, Union
+
+import httpx
+
+LATENCY_SCALE = float(os.getenv("BENCH_FAKE_LATENCY_SCALE", "1.0"))
+
+def stable_hash(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+class Latency:
+    """
+    Cost model of one forward pass: ``base_ms + per_item_ms * items``.
+    """
+
+    def __init__(self, base_ms: float, per_item_ms: float = 0.0):
+        self.base_ms = base_ms
+        self.per_item_ms = per_item_ms
+
+    def seconds(self, items: int = 1) -> float:
+        return (self.base_ms + self.per_item_ms * items) * LATENCY_SCALE / 1000
+
+    def spend(self, items: int = 1) -> None:
+        time.sleep(self.seconds(items))
+
+def _as_list(inputs: Union[str, Sequence[str]]) -> List[str]:
+    return [inputs] if isinstance(inputs, str) else list(inputs)
+
+class WhitespaceTokenizer:
+    """
+    Word-level tokenizer with the subset of the Hugging Face API the services use.
+    """
+
+    model_max_length = 512
+
+    def __init__(self):
+        self._words: Dict[int, str] = {}
+
+    def num_special_tokens_to_add(self, pair: bool = False) -> int:
+        return 2
+
+    def _id(self, word: str) -> int:
+        # Ids derived from the word, so copies of the tokenizer agree and no lock is needed
+        token_id = 1000 + stable_hash(word) % 1_000_000
+        self._words[token_id] = word
+        return token_id
+
+    def __call__(self, text: Union[str, Sequence[str]], add_special_tokens: bool = True, **options: Any):
+        def encode(value: str) -> List[int]:
+            ids = [self._id(word) for word in value.split()]
+            return [101, *ids, 102] if add_special_tokens else ids
+
+        if isinstance(text, str):
+            return {"input_ids": encode(text)}
+        return {"input_ids": [encode(value) for value in text]}
+
+    def decode(self, ids: Sequence[int], skip_special_tokens: bool = True) -> str:
+        return " ".join(self._words[i] for i in ids if i in self._words)
+
+class FakeTextClassifier:
+    """
+    ``text-classification`` / ``sentiment-analysis`` pipeline.
+    """
+
+    def __init__(self, labels: Sequence[str], latency: Latency):
+        self.labels = list(labels)
+        self.latency = latency
+        self.tokenizer = WhitespaceTokenizer()
+
+    def __call__(self, inputs: Union[str, Sequence[str]], batch_size: int = 1, **options: Any) -> List[Dict[str, Any]]:
+        texts = _as_list(inputs)
+        self.latency.spend(len(texts))
+        results = []
+        for text in texts:
+            digest = stable_hash(text)
+            results.append({
+                "label": self.labels[digest % len(self.labels)],
+                "score": 0.5 + (digest % 500) / 1000
+            })
+        return results
+
+class FakeTokenClassifier:
+    """
+    ``ner`` pipeline: capitalized words are tagged as entities.
+    """
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.tokenizer = WhitespaceTokenizer()
+
+    def __call__(self, inputs: Union[str, Sequence[str]], batch_size: int = 1, **options: Any):
+        texts = _as_list(inputs)
+        self.latency.spend(len(texts))
+        results = []
+        for text in texts:
+            entities, offset = [], 0
+            for word in text.split():
+                start = text.index(word, offset)
+                offset = start + len(word)
+                if word[:1].isupper():
+                    entities.append({
+                        "word": word.strip(".,;:!?"),
+                        "entity": "B-PER" if stable_hash(word) % 2 else "B-LOC",
+                        "score": 0.9,
+                        "start": start,
+                        "end": offset
+                    })
+            results.append(entities)
+        return results[0] if isinstance(inputs, str) else results
+
+class FakeSummarizer:
+    """
+    ``summarization`` pipeline: keeps the first words of the text, up to ``max_length``.
+    """
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.tokenizer = WhitespaceTokenizer()
+
+    def __call__(self, inputs: Union[str, Sequence[str]], batch_size: int = 1, max_length: int = 130, **options: Any):
+        texts = _as_list(inputs)
+        # Generation cost grows with the summary length, not only the batch
+        self.latency.spend(len(texts) * max(1, max_length // 32))
+        return [{"summary_text": " ".join(text.split()[:max_length])} for text in texts]
+
+# Words the fake spaCy model tags with the medical labels NLPService looks for
+MEDICAL_LABELS = {
+    "dor": "SYMPTOM", "febre": "SYMPTOM", "tosse": "SYMPTOM", "náusea": "SYMPTOM", "cansaço": "SYMPTOM",
+    "gripe": "CONDITION", "diabetes": "CONDITION", "hipertensão": "CONDITION", "enxaqueca": "CONDITION",
+    "dipirona": "MEDICATION", "paracetamol": "MEDICATION", "ibuprofeno": "MEDICATION"
+}
+
+class _Token:
+    def __init__(self, text: str):
+        self.text = text
+        self.dep_ = "ROOT"
+
+class _Span:
+    def __init__(self, text: str, start: int, label: str = ""):
+        self.text = text
+        self.start_char = start
+        self.end_char = start + len(text)
+        self.label_ = label
+        self.root = _Token(text.split()[-1] if text.split() else text)
+
+class FakeDoc:
+    def __init__(self, text: str):
+        self.ents: List[_Span] = []
+        self.noun_chunks: List[_Span] = []
+        offset = 0
+        for word in text.split():
+            start = text.index(word, offset)
+            offset = start + len(word)
+            clean = word.strip(".,;:!?").lower()
+            if clean in MEDICAL_LABELS:
+                self.ents.append(_Span(word.strip(".,;:!?"), start, MEDICAL_LABELS[clean]))
+            elif len(clean) > 7:
+                self.noun_chunks.append(_Span(word.strip(".,;:!?"), start))
+        self.sents = [
+            _Span(sentence.strip() + ".", 0)
+            for sentence in text.replace("!", ".").replace("?", ".").split(".")
+            if sentence.strip()
+        ]
+
+class FakeSpacy:
+    """
+    spaCy ``Language``: one parse per call, costed per word.
+    """
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    def __call__(self, text: str) -> FakeDoc:
+        self.latency.spend(len(text.split()))
+        return FakeDoc(text)
+
+class FakeConditionClassifier:
+    """
+    Zero-shot condition classifier of ai-service: every catalogue label scored per text.
+    """
+
+    def __init__(self, catalogue: Any, latency: Latency):
+        self.catalogue = catalogue
+        self.latency = latency
+
+    def classify(self, texts: Sequence[str]) -> List[List[Dict[str, Any]]]:
+        # One NLI pair per (text, label), as the real classifier batches them
+        self.latency.spend(len(texts) * len(self.catalogue.labels))
+        results = []
+        for text in texts:
+            conditions = [
+                {"condition": label, "probability": (stable_hash(text + label) % 1000) / 1000}
+                for label in self.catalogue.labels
+            ]
+            conditions.sort(key=lambda condition: condition["probability"], reverse=True)
+            results.append(conditions)
+        return results
+
+class FakeLlamaBackend:
+    """
+    Batch backend of the llama-core scheduler (same interface as ``LlamaBatchBackend``).
+
+    Tokens are bytes of lowercase letters; the next token is always the
+    following letter, so generations never stop early and run to ``max_tokens``.
+    A decode call costs ``base_ms`` plus ``per_item_ms`` per token in the batch.
+    """
+
+    n_vocab = 128
+    eos = 0
+
+    def __init__(self, n_batch: int, latency: Latency):
+        import numpy as np
+
+        self._np = np
+        self.n_batch = n_batch
+        self.latency = latency
+
+    def tokenize(self, text: str) -> List[int]:
+        return [97 + byte % 26 for byte in text.encode("utf-8")] or [97]
+
+    def detokenize(self, tokens: List[int]) -> bytes:
+        return bytes(tokens)
+
+    def decode(self, entries: List[Any]) -> List[Any]:
+        self.latency.spend(len(entries))
+        rows = []
+        for token, _, _, logits in entries:
+            if logits:
+                row = self._np.full(self.n_vocab, -10.0, dtype=self._np.float32)
+                row[97 + (token - 97 + 1) % 26] = 10.0
+                rows.append(row)
+        return rows
+
+    def copy(self, source: int, target: int, length: int) -> None:
+        pass
+
+    def clear(self, seq_id: int) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+def fake_llm_transport(latency: Latency) -> httpx.MockTransport:
+    """
+    OpenAI chat completions endpoint answering every prompt with one JSON
+    document that satisfies all the prompts of services/ai.
+    """
+    async def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        prompt = payload["messages"][-1]["content"]
+        await asyncio.sleep(latency.seconds(len(prompt.split())))
+        content = json.dumps({
+            "summary": "Paciente relata sintomas leves. Recomenda-se acompanhamento.",
+            "key_points": ["sintomas leves"],
+            "recommendations": ["Manter hidratação adequada.", "Retornar se os sintomas piorarem."],
+            "concerns": [],
+            "symptom_analysis": [{"name": "dor", "description": "dor leve", "severity": "moderate"}],
+            "possible_conditions": [
+                {"name": "gripe", "description": "infecção viral", "confidence": 0.6, "severity": "low"}
+            ],
+            "urgency_level": "low"
+        }, ensure_ascii=False)
+        return httpx.Response(200, json={
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split())}
+        })
+
+    return httpx.MockTransport(handler)
@@ -0,0 +1,99 @@
+"""
+Closed-loop HTTP load generator.
+
+``concurrency`` virtual clients each send a request, wait for the complete
+response, then send the next, until ``requests`` responses were measured.
+Warm-up requests run first and are not measured. Streaming endpoints also
+record the time to the first body chunk.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    path: str
+    # Request body for the i-th request; deterministic so runs are comparable
+    payload: Optional[Callable[[int], Any]] = None
+    stream: bool = False
+    # Statuses that count as successful (e.g. 429 when measuring admission control)
+    ok_statuses: tuple = (200,)
+    # Extra check of a (non-streaming) response body, for APIs that report errors with a 200
+    check: Optional[Callable[[httpx.Response], bool]] = None
+
+@dataclass
+class LoadResult:
+    latencies: List[float] = field(default_factory=list)
+    first_byte: List[float] = field(default_factory=list)
+    statuses: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+    wall_seconds: float = 0.0
+    # First failure seen, to explain a run with errors
+    sample_error: Optional[str] = None
+
+async def _send(client: httpx.AsyncClient, endpoint: Endpoint, index: int, result: Optional[LoadResult]) -> None:
+    body = endpoint.payload(index) if endpoint.payload is not None else None
+    started = time.perf_counter()
+    first_byte = None
+    try:
+        if endpoint.stream:
+            async with client.stream(endpoint.method, endpoint.path, json=body) as response:
+                async for _ in response.aiter_bytes():
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                status = response.status_code
+        else:
+            response = await client.request(endpoint.method, endpoint.path, json=body)
+            status = response.status_code
+    except httpx.HTTPError as e:
+        if result is not None:
+            result.errors += 1
+            result.statuses["error"] = result.statuses.get("error", 0) + 1
+            result.sample_error = result.sample_error or repr(e)
+        return
+    elapsed = time.perf_counter() - started
+    if result is None:
+        return
+    result.statuses[str(status)] = result.statuses.get(str(status), 0) + 1
+    failed = status not in endpoint.ok_statuses
+    if not failed and endpoint.check is not None and not endpoint.stream:
+        failed = not endpoint.check(response)
+    if failed:
+        result.errors += 1
+        # A streamed body was consumed chunk by chunk and is not kept
+        detail = "" if endpoint.stream else f": {response.text[:200]}"
+        result.sample_error = result.sample_error or f"HTTP {status}{detail}"
+        return
+    result.latencies.append(elapsed)
+    if first_byte is not None:
+        result.first_byte.append(first_byte)
+
+async def run_load(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    concurrency: int,
+    requests: int,
+    warmup: int = 0
+) -> LoadResult:
+    """
+    Drive ``endpoint`` with ``concurrency`` clients for ``requests`` measured requests.
+    """
+    async def drive(indices: List[int], result: Optional[LoadResult]) -> None:
+        async def worker() -> None:
+            while indices:
+                await _send(client, endpoint, indices.pop(), result)
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+    # Warm-up uses indices past the measured ones, so both phases see distinct inputs
+    await drive(list(range(requests + warmup - 1, requests - 1, -1)), None)
+
+    result = LoadResult()
+    started = time.perf_counter()
+    await drive(list(range(requests - 1, -1, -1)), result)
+    result.wall_seconds = time.perf_counter() - started
+    return result
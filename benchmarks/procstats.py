@@ -0,0 +1,120 @@
+"""
+RSS and CPU usage of a server process and its children, read from /proc.
+
+Multi-worker servers (ai-service's serve.py, uvicorn --workers) fork their
+workers, so every measurement covers the whole process tree. On systems
+without /proc the sampler reports nothing instead of failing the run.
+"""
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+def supported() -> bool:
+    return os.path.isdir("/proc/self")
+
+def _stat_fields(pid: int) -> Optional[List[str]]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces; the fields after it are fixed
+    return data[data.rindex(")") + 2:].split()
+
+def process_tree(pid: int) -> List[int]:
+    """
+    Return ``pid`` and all its descendants.
+    """
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            fields = _stat_fields(int(entry))
+            if fields is not None:
+                children.setdefault(int(fields[1]), []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+def rss_bytes(pids: List[int]) -> int:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+def cpu_seconds(pids: List[int]) -> float:
+    """
+    User plus system CPU time of the processes, in seconds.
+    """
+    ticks = 0
+    for pid in pids:
+        fields = _stat_fields(pid)
+        if fields is not None:
+            ticks += int(fields[11]) + int(fields[12])
+    return ticks / _CLOCK_TICKS
+
+class ProcessSampler:
+    """
+    Samples the RSS of a process tree in the background while a phase runs,
+    and measures the CPU time it used over the phase.
+    """
+
+    def __init__(self, pid: Optional[int], interval_seconds: float = 0.1):
+        self.pid = pid
+        self.interval_seconds = interval_seconds
+        self._samples: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+        self._cpu_start = 0.0
+        self._wall_start = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.pid is not None and supported()
+
+    def _pids(self) -> List[int]:
+        return process_tree(self.pid)
+
+    async def __aenter__(self) -> "ProcessSampler":
+        if self.enabled:
+            loop = asyncio.get_running_loop()
+            self._cpu_start = cpu_seconds(self._pids())
+            self._wall_start = loop.time()
+            self._samples = [rss_bytes(self._pids())]
+            self._task = asyncio.create_task(self._sample())
+        return self
+
+    async def _sample(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            self._samples.append(rss_bytes(self._pids()))
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._wall = asyncio.get_running_loop().time() - self._wall_start
+            self._cpu = cpu_seconds(self._pids()) - self._cpu_start
+            self._samples.append(rss_bytes(self._pids()))
+
+    def result(self) -> Optional[Dict[str, float]]:
+        if self._task is None:
+            return None
+        return {
+            "rss_peak_mb": round(max(self._samples) / 2 ** 20, 1),
+            "rss_mean_mb": round(sum(self._samples) / len(self._samples) / 2 ** 20, 1),
+            "cpu_seconds": round(self._cpu, 3),
+            # 100% is one core fully busy
+            "cpu_percent": round(100 * self._cpu / self._wall, 1) if self._wall > 0 else 0.0
+        }
@@ -0,0 +1,159 @@
+"""
+Summaries of benchmark runs, JSON baselines and regression checks.
+"""
+import json
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+from benchmarks.loadgen import LoadResult
+
+# Metrics compared against a baseline: name -> True when higher is better
+COMPARED_METRICS = {
+    "throughput_rps": True,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "resources.rss_peak_mb": False,
+    "resources.cpu_seconds_per_request": False,
+}
+
+# Absolute slack below which a difference is noise (ms, MB, ...), whatever the ratio
+MIN_DELTA = {
+    "latency_ms.p50": 2.0,
+    "latency_ms.p95": 5.0,
+    "latency_ms.p99": 10.0,
+    "resources.rss_peak_mb": 10.0,
+    "resources.cpu_seconds_per_request": 0.0005,
+}
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    Linearly interpolated percentile ``q`` (0-100) of ``values``.
+    """
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def _latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    millis = [value * 1000 for value in seconds]
+    if not millis:
+        return {}
+    return {
+        "p50": round(percentile(millis, 50), 2),
+        "p95": round(percentile(millis, 95), 2),
+        "p99": round(percentile(millis, 99), 2),
+        "mean": round(sum(millis) / len(millis), 2),
+        "max": round(max(millis), 2)
+    }
+
+def summarize(result: LoadResult, resources: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Turn a load result (and the server's resource usage over it) into report metrics.
+    """
+    completed = len(result.latencies)
+    summary: Dict[str, Any] = {
+        "requests": completed + result.errors,
+        "errors": result.errors,
+        "error_rate": round(result.errors / (completed + result.errors), 4) if completed + result.errors else 0.0,
+        "statuses": result.statuses,
+        "throughput_rps": round(completed / result.wall_seconds, 2) if result.wall_seconds else 0.0,
+        "latency_ms": _latency_summary(result.latencies)
+    }
+    if result.first_byte:
+        summary["first_byte_ms"] = _latency_summary(result.first_byte)
+    if resources is not None:
+        resources = dict(resources)
+        resources["cpu_seconds_per_request"] = round(resources["cpu_seconds"] / completed, 5) if completed else 0.0
+        summary["resources"] = resources
+    if result.sample_error:
+        summary["sample_error"] = result.sample_error
+    return summary
+
+def _metric(summary: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = summary
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) and not math.isnan(value) else None
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float
+) -> List[Dict[str, Any]]:
+    """
+    Return the regressions of ``current`` against ``baseline``: metrics worse
+    by more than ``threshold`` (a fraction) and by more than their noise
+    floor, plus any increase of the error rate.
+    """
+    regressions = []
+    for name, endpoint in current["endpoints"].items():
+        reference = baseline.get("endpoints", {}).get(name)
+        if reference is None:
+            continue
+        if endpoint["error_rate"] > reference.get("error_rate", 0.0):
+            regressions.append({
+                "endpoint": name,
+                "metric": "error_rate",
+                "baseline": reference.get("error_rate", 0.0),
+                "current": endpoint["error_rate"],
+                "change": None
+            })
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = _metric(reference, metric), _metric(endpoint, metric)
+            if before is None or after is None or before == 0:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            if worse > threshold and abs(after - before) > MIN_DELTA.get(metric, 0.0):
+                regressions.append({
+                    "endpoint": name,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": round(change, 4)
+                })
+    return regressions
+
+def comparable(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Return why two runs cannot be compared (different load or backends), if they cannot.
+    """
+    reasons = []
+    for key in ("service", "backend", "concurrency", "requests"):
+        if current["config"].get(key) != baseline.get("config", {}).get(key):
+            reasons.append(f"{key}: baseline {baseline.get('config', {}).get(key)!r}, run {current['config'].get(key)!r}")
+    return reasons
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_json(path: str, data: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+def format_table(run: Dict[str, Any]) -> str:
+    """
+    Render a run as a plain-text table, one endpoint per line.
+    """
+    header = f"{'endpoint':<28}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>7}{'rss MB':>9}{'cpu %':>8}"
+    lines = [header, "-" * len(header)]
+    for name, endpoint in run["endpoints"].items():
+        latency = endpoint["latency_ms"]
+        resources = endpoint.get("resources", {})
+        lines.append(
+            f"{name:<28}{endpoint['throughput_rps']:>9.1f}"
+            f"{latency.get('p50', float('nan')):>9.1f}{latency.get('p95', float('nan')):>9.1f}"
+            f"{latency.get('p99', float('nan')):>9.1f}{endpoint['errors']:>7}"
+            f"{resources.get('rss_peak_mb', float('nan')):>9.1f}{resources.get('cpu_percent', float('nan')):>8.1f}"
+        )
+    return "\n".join(lines)
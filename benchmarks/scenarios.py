@@ -0,0 +1,149 @@
+"""
+The services under benchmark: how to start them, when they are ready, and
+the endpoints driven with deterministic request bodies.
+"""
+import importlib.util
+import os
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from benchmarks.loadgen import Endpoint
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SENTENCES = [
+    "Estou com dor de cabeça forte desde ontem à noite.",
+    "Tive febre de 38 graus e um pouco de tosse seca.",
+    "O paracetamol ajudou, mas a dor voltou depois de algumas horas.",
+    "Sinto cansaço durante o dia e náusea pela manhã.",
+    "Tenho histórico de hipertensão e tomo remédio diariamente.",
+    "A enxaqueca costuma piorar quando durmo pouco.",
+    "Meu pai tem diabetes e minha mãe teve gripe forte no mês passado.",
+    "Recomendo repouso, hidratação e observar a evolução dos sintomas.",
+    "Evite ibuprofeno até descartarmos problemas gástricos.",
+    "Se a febre persistir por mais de três dias, procure atendimento presencial.",
+    "Consultei o Doutor Silva em São Paulo na semana passada.",
+    "Os exames de sangue estavam normais, exceto pela glicose elevada.",
+]
+
+def text(index: int, sentences: int) -> str:
+    """
+    Deterministic text of ``sentences`` sentences for request ``index``.
+    """
+    rng = random.Random(index)
+    return " ".join(rng.choice(SENTENCES) for _ in range(sentences)) + f" Registro {index}."
+
+def _messages(index: int, count: int) -> List[Dict[str, Any]]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": f"m{index}-{i}",
+            "role": "user" if i % 2 == 0 else "professional",
+            "content": text(index * 100 + i, 2),
+            "timestamp": (start + timedelta(minutes=i)).isoformat()
+        }
+        for i in range(count)
+    ]
+
+@dataclass
+class Service:
+    name: str
+    # Working directory of the server, relative to the repository root
+    directory: str
+    # ASGI app started with ``uvicorn``, from ``benchmarks.apps``
+    app: str
+    ready_path: str
+    endpoints: List[Endpoint]
+    # Whether the real models can run here
+    real_models_available: Callable[[], bool]
+    # Environment for the server process, on top of the caller's
+    env: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def cwd(self) -> str:
+        return os.path.join(ROOT, self.directory)
+
+def _importable(*modules: str) -> bool:
+    return all(importlib.util.find_spec(module) is not None for module in modules)
+
+def _ai_endpoints() -> List[Endpoint]:
+    return [
+        Endpoint("chat_analyze", "POST", "/api/v1/chat/analyze", lambda i: {
+            "consultation_id": f"bench-{i}",
+            "messages": _messages(i, 6)
+        }),
+        Endpoint("chat_summary", "POST", "/api/v1/chat/summary", lambda i: {
+            "consultation_id": f"bench-{i}",
+            "messages": _messages(i, 6)
+        }),
+        Endpoint("health_analyze", "POST", "/api/v1/health/analyze", lambda i: {
+            "symptoms_description": text(i, 3),
+            "patient_age": 20 + i % 60,
+            "patient_gender": "F" if i % 2 else "M"
+        }),
+        Endpoint("health_report", "POST", "/api/v1/health/report", lambda i: {
+            "consultation_id": f"bench-{i}",
+            "patient_id": f"patient-{i % 50}",
+            "symptoms": ["dor de cabeça", "febre"],
+            "observations": text(i, 4)
+        }),
+    ]
+
+def _ai_service_endpoints() -> List[Endpoint]:
+    return [
+        Endpoint("sentiment", "POST", "/analyze/sentiment", lambda i: {"text": text(i, 2)}),
+        Endpoint("classify", "POST", "/classify/text", lambda i: {"text": text(i, 2)}),
+        Endpoint("health", "POST", "/analyze/health", lambda i: {
+            "symptoms": ["febre", "tosse", "dor de cabeça"][: 1 + i % 3],
+            "patient_history": text(i, 1),
+            "age": 20 + i % 60
+        }),
+        Endpoint("sentiment_batch_16", "POST", "/analyze/sentiment/batch", lambda i: {
+            "items": [{"text": text(i * 16 + j, 1)} for j in range(16)]
+        }),
+    ]
+
+def _llama_endpoints() -> List[Endpoint]:
+    def request(i: int) -> Dict[str, Any]:
+        return {"prompt": text(i, 2), "max_tokens": 32, "temperature": 0.0, "model_size": "7B"}
+
+    return [
+        Endpoint("generate", "POST", "/generate", request, check=lambda response: "text" in response.json()),
+        Endpoint("generate_stream", "POST", "/generate/stream", request, stream=True),
+    ]
+
+def _gguf_present() -> bool:
+    return os.path.exists(os.path.join(ROOT, "packages/llama-core/models/llama-2-7b-chat.gguf"))
+
+SERVICES: Dict[str, Service] = {
+    "ai": Service(
+        name="ai",
+        directory="services/ai",
+        app="benchmarks.apps.ai:app",
+        ready_path="/health",
+        endpoints=_ai_endpoints(),
+        real_models_available=lambda: _importable("torch", "transformers", "spacy"),
+        # Measure the models, not the result cache; no MongoDB needed for persistence
+        env={"CACHE_ENABLED": "false", "ANALYSIS_STORE_ENABLED": "false"}
+    ),
+    "ai-service": Service(
+        name="ai-service",
+        directory="services/ai-service",
+        app="benchmarks.apps.ai_service:app",
+        ready_path="/ready",
+        endpoints=_ai_service_endpoints(),
+        real_models_available=lambda: _importable("torch", "transformers")
+    ),
+    "llama-core": Service(
+        name="llama-core",
+        directory="packages/llama-core",
+        app="benchmarks.apps.llama_core:app",
+        ready_path="/health",
+        endpoints=_llama_endpoints(),
+        real_models_available=lambda: _importable("llama_cpp") and _gguf_present(),
+        # Room for the whole measured concurrency in the queue: 429s would not measure generation
+        env={"LLAMA_MAX_QUEUE": "256"}
+    ),
+}
@@ -0,0 +1,70 @@
+import asyncio
+import httpx
+from benchmarks import report
+from benchmarks.loadgen import Endpoint, LoadResult, run_load
+
+def run(coro):
+    return asyncio.run(coro)
+
+def make_run(rps=100.0, p50=10.0, p95=20.0, p99=30.0, error_rate=0.0, rss=100.0, concurrency=8):
+    return {
+        "config": {"service": "ai", "backend": "fake", "concurrency": concurrency, "requests": 200},
+        "endpoints": {
+            "chat": {
+                "error_rate": error_rate,
+                "throughput_rps": rps,
+                "latency_ms": {"p50": p50, "p95": p95, "p99": p99},
+                "resources": {"rss_peak_mb": rss, "cpu_seconds_per_request": 0.01}
+            }
+        }
+    }
+
+def test_percentile_interpolates():
+    values = [4, 1, 3, 2]
+    assert report.percentile(values, 0) == 1
+    assert report.percentile(values, 50) == 2.5
+    assert report.percentile(values, 100) == 4
+
+def test_summarize_counts_errors_and_cpu_per_request():
+    result = LoadResult(latencies=[0.01, 0.02, 0.03, 0.04], statuses={"200": 4, "500": 1}, errors=1, wall_seconds=2.0)
+    summary = report.summarize(result, {"rss_peak_mb": 50.0, "cpu_seconds": 0.4})
+    assert summary["requests"] == 5
+    assert summary["error_rate"] == 0.2
+    assert summary["throughput_rps"] == 2.0
+    assert summary["latency_ms"]["p50"] == 25.0
+    assert summary["resources"]["cpu_seconds_per_request"] == 0.1
+
+def test_compare_flags_regressions_beyond_threshold():
+    regressions = report.compare(make_run(rps=80.0, p95=30.0), make_run(), threshold=0.15)
+    assert {r["metric"] for r in regressions} == {"throughput_rps", "latency_ms.p95"}
+    assert report.compare(make_run(rps=90.0, p95=22.0), make_run(), threshold=0.15) == []
+
+def test_compare_ignores_differences_under_the_noise_floor():
+    # +50% but only 1 ms: scheduling noise on a fast endpoint
+    assert report.compare(make_run(p50=3.0), make_run(p50=2.0), threshold=0.15) == []
+
+def test_compare_flags_new_errors():
+    regressions = report.compare(make_run(error_rate=0.01), make_run(), threshold=0.15)
+    assert [r["metric"] for r in regressions] == ["error_rate"]
+
+def test_comparable_requires_the_same_load():
+    assert report.comparable(make_run(), make_run()) == []
+    assert report.comparable(make_run(concurrency=16), make_run())[0].startswith("concurrency")
+
+def test_run_load_measures_only_after_warmup():
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.path)
+        return httpx.Response(500 if len(seen) == 7 else 200, json={})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://bench") as client:
+            return await run_load(client, Endpoint("ping", "GET", "/ping"), concurrency=2, requests=5, warmup=3)
+
+    result = run(scenario())
+    assert len(seen) == 8
+    assert len(result.latencies) == 4
+    assert result.errors == 1
+    assert result.statuses == {"200": 4, "500": 1}
+    assert result.sample_error.startswith("HTTP 500")
@@ -1,8 +1,15 @@
-import os
-import requests
-from pathlib import Path
+import argparse
 import hashlib
+import json
+import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import requests
 
 MODELS = {
     "7B": {
@@ -19,54 +26,383 @@ MODELS = {
     }
 }
 
-def download_file(url: str, destination: Path, chunk_size: int = 8192):
-    """Download um arquivo grande em chunks"""
-    response = requests.get(url, stream=True)
-    total_size = int(response.headers.get('content-length', 0))
-    
-    with open(destination, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=chunk_size):
-            if chunk:
-                f.write(chunk)
-                f.flush()
-                # Calcular e mostrar progresso
-                progress = (f.tell() / total_size) * 100
-                sys.stdout.write(f"\rBaixando... {progress:.1f}%")
-                sys.stdout.flush()
-    print("\nDownload completo!")
-
-def verify_md5(file_path: Path, expected_md5: str) -> bool:
-    """Verifica o MD5 do arquivo baixado"""
-    md5_hash = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            md5_hash.update(chunk)
-    return md5_hash.hexdigest() == expected_md5
-
-def main():
-    models_dir = Path("models")
-    models_dir.mkdir(exist_ok=True)
-    
-    for model_size, info in MODELS.items():
-        model_path = models_dir / f"llama-2-{model_size.lower()}-chat.gguf"
-        
-        if model_path.exists():
-            print(f"Modelo {model_size} já existe. Verificando MD5...")
-            if verify_md5(model_path, info["md5"]):
-                print("MD5 verificado com sucesso!")
-                continue
+MiB = 1024 * 1024
+# Leituras pequenas da rede: numa queda de conexão perde-se no máximo um bloco
+READ_CHUNK = 64 * 1024
+
+class DownloadError(Exception):
+    """Falha definitiva ao baixar ou verificar um modelo"""
+
+class OrderedHasher:
+    """
+    Calcula MD5 e SHA-256 em ordem enquanto os segmentos chegam fora de ordem.
+
+    Dados gravados exatamente na fronteira já hasheada são processados direto
+    da memória; os demais ficam registrados e são lidos de volta do arquivo
+    (ainda no page cache) quando a fronteira os alcança.
+    """
+
+    def __init__(self, fd: int, read_size: int = 4 * MiB):
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.frontier = 0
+        self._fd = fd
+        self._read_size = read_size
+        self._pending: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, offset: int, data: bytes) -> None:
+        with self._lock:
+            if offset == self.frontier:
+                self._update(data)
+                self.frontier += len(data)
+                self._drain()
             else:
-                print("MD5 inválido. Baixando novamente...")
-                model_path.unlink()
-        
-        print(f"Baixando modelo {model_size}...")
-        download_file(info["url"], model_path)
-        
-        if verify_md5(model_path, info["md5"]):
-            print("Download concluído e verificado!")
+                self._pending[offset] = offset + len(data)
+
+    def add_range(self, start: int, end: int) -> None:
+        """Registra um intervalo já presente no arquivo (ex.: de um download retomado)"""
+        if end > start:
+            with self._lock:
+                self._pending[start] = end
+                self._drain()
+
+    def _drain(self) -> None:
+        while self.frontier in self._pending:
+            end = self._pending.pop(self.frontier)
+            while self.frontier < end:
+                data = os.pread(self._fd, min(self._read_size, end - self.frontier), self.frontier)
+                if not data:
+                    raise DownloadError("Arquivo parcial menor que o esperado")
+                self._update(data)
+                self.frontier += len(data)
+
+    def _update(self, data: bytes) -> None:
+        self.md5.update(data)
+        self.sha256.update(data)
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {"md5": self.md5.hexdigest(), "sha256": self.sha256.hexdigest()}
+
+class DownloadState:
+    """Progresso dos segmentos, persistido ao lado do arquivo parcial para permitir retomar"""
+
+    def __init__(self, path: Path, url: str, size: int, segments: List[List[int]]):
+        self.path = path
+        self.url = url
+        self.size = size
+        # [início, fim, bytes já gravados]
+        self.segments = segments
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+
+    @classmethod
+    def load_or_create(cls, path: Path, part_path: Path, url: str, size: int, segment_size: int) -> "DownloadState":
+        if path.exists() and part_path.exists() and part_path.stat().st_size == size:
+            try:
+                data = json.loads(path.read_text())
+                if data["url"] == url and data["size"] == size:
+                    return cls(path, url, size, data["segments"])
+            except (ValueError, KeyError):
+                pass
+        segments = [[start, min(start + segment_size, size), 0] for start in range(0, size, segment_size)]
+        return cls(path, url, size, segments)
+
+    def advance(self, segment: List[int], written: int) -> None:
+        with self._lock:
+            segment[2] += written
+        # Persistir a cada gravação custaria mais que a própria escrita; uma vez por segundo basta
+        if time.monotonic() - self._saved_at >= 1.0:
+            self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            payload = json.dumps({"url": self.url, "size": self.size, "segments": self.segments})
+            self._saved_at = time.monotonic()
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(payload)
+        os.replace(tmp, self.path)
+
+    def downloaded(self) -> int:
+        with self._lock:
+            return sum(done for _, _, done in self.segments)
+
+class Progress:
+    """Progresso agregado de todos os downloads, impresso em uma linha"""
+
+    def __init__(self):
+        self._totals: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._printed_at = 0.0
+        self._bytes = 0
+
+    def start(self, name: str, total: int, done: int) -> None:
+        with self._lock:
+            self._totals[name] = [done, total]
+
+    def add(self, name: str, count: int) -> None:
+        with self._lock:
+            self._totals[name][0] += count
+            self._bytes += count
+            if time.monotonic() - self._printed_at < 0.5:
+                return
+            self._printed_at = time.monotonic()
+            parts = [f"{name} {100 * done / total:.1f}%" for name, (done, total) in self._totals.items() if total]
+            speed = self._bytes / max(time.monotonic() - self._started, 1e-6) / MiB
+        sys.stdout.write(f"\rBaixando... {' | '.join(parts)} ({speed:.1f} MiB/s)")
+        sys.stdout.flush()
+
+def probe(session: requests.Session, url: str) -> Dict[str, object]:
+    """Descobre o tamanho do arquivo e se o servidor aceita requisições com Range"""
+    response = session.head(url, allow_redirects=True, timeout=30)
+    response.raise_for_status()
+    size = int(response.headers.get("content-length", 0))
+    ranged = response.headers.get("accept-ranges", "").lower() == "bytes"
+    if not size:
+        raise DownloadError(f"O servidor não informou o tamanho de {url}")
+    return {"size": size, "ranged": ranged}
+
+def preallocate(path: Path, size: int) -> None:
+    with open(path, "ab") as f:
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(f.fileno(), 0, size)
         else:
-            print("Erro na verificação do MD5. Por favor, tente novamente.")
-            model_path.unlink()
+            f.truncate(size)
+
+def _pwrite_all(fd: int, data: bytes, offset: int) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+def _download_segment(
+    url: str,
+    fd: int,
+    segment: List[int],
+    state: DownloadState,
+    hasher: OrderedHasher,
+    progress: Progress,
+    name: str,
+    ranged: bool,
+    buffer_size: int,
+    retries: int
+) -> None:
+    session = requests.Session()
+    attempt = 0
+    while True:
+        start, end, done = segment
+        if start + done >= end:
+            return
+        buffer = bytearray()
+        offset = start + done
+
+        def flush():
+            nonlocal offset
+            if buffer:
+                data = bytes(buffer)
+                _pwrite_all(fd, data, offset)
+                hasher.add(offset, data)
+                state.advance(segment, len(data))
+                offset += len(data)
+                buffer.clear()
+
+        try:
+            headers = {"Range": f"bytes={offset}-{end - 1}"} if ranged else {}
+            with session.get(url, headers=headers, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                if ranged and response.status_code != 206:
+                    raise DownloadError(f"Servidor ignorou o Range (status {response.status_code})")
+                for chunk in response.iter_content(chunk_size=READ_CHUNK):
+                    remaining = end - offset - len(buffer)
+                    buffer += chunk[:remaining]
+                    progress.add(name, min(len(chunk), remaining))
+                    if len(buffer) >= buffer_size:
+                        flush()
+                    if remaining <= len(chunk):
+                        break
+            flush()
+            if segment[0] + segment[2] < end:
+                raise DownloadError("Conexão encerrada antes do fim do segmento")
+            return
+        except (requests.RequestException, DownloadError) as e:
+            # O que já chegou é válido: grava e retoma a partir daí
+            flush()
+            attempt += 1
+            if attempt > retries:
+                raise DownloadError(f"Segmento {start}-{end} falhou após {retries} tentativas: {e}") from e
+            if not ranged:
+                # Sem Range não há como retomar no meio: recomeça o arquivo
+                raise DownloadError(f"Download interrompido e o servidor não aceita Range: {e}") from e
+            time.sleep(min(2 ** attempt, 30) * 0.5)
+
+def download_file(
+    url: str,
+    destination: Path,
+    expected: Optional[Dict[str, str]] = None,
+    connections: int = 8,
+    segment_size: int = 64 * MiB,
+    buffer_size: int = 4 * MiB,
+    retries: int = 5,
+    progress: Optional[Progress] = None,
+    name: Optional[str] = None
+) -> Dict[str, str]:
+    """
+    Baixa `url` para `destination` em segmentos paralelos e verifica os hashes.
+
+    O arquivo é pré-alocado em `<destino>.part` e o progresso de cada segmento
+    fica em `<destino>.part.json`, então uma execução interrompida continua de
+    onde parou. MD5 e SHA-256 são calculados durante o download; `expected`
+    pode conter qualquer um dos dois. Retorna os hashes calculados.
+    """
+    name = name or destination.name
+    progress = progress or Progress()
+    part_path = destination.with_name(destination.name + ".part")
+    state_path = destination.with_name(destination.name + ".part.json")
+
+    info = probe(requests.Session(), url)
+    size = info["size"]
+    ranged = info["ranged"]
+    if not ranged:
+        segment_size = size
+        connections = 1
+
+    state = DownloadState.load_or_create(state_path, part_path, url, size, segment_size)
+    if not ranged:
+        # Sem Range não há retomada: qualquer progresso anterior é descartado
+        state.segments = [[0, size, 0]]
+    preallocate(part_path, size)
+    state.save()
+
+    fd = os.open(part_path, os.O_RDWR)
+    try:
+        hasher = OrderedHasher(fd)
+        for start, _, done in state.segments:
+            hasher.add_range(start, start + done)
+        progress.start(name, size, state.downloaded())
+
+        pending = [segment for segment in state.segments if segment[0] + segment[2] < segment[1]]
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, connections), thread_name_prefix=f"download-{name}") as pool:
+                futures = [
+                    pool.submit(_download_segment, url, fd, segment, state, hasher, progress, name, ranged, buffer_size, retries)
+                    for segment in pending
+                ]
+                for future in as_completed(futures):
+                    future.result()
+        finally:
+            # Mesmo após uma falha, o progresso gravado fica disponível para a próxima execução
+            state.save()
+
+        if hasher.frontier != size:
+            raise DownloadError(f"Download incompleto: {hasher.frontier} de {size} bytes verificados")
+        digests = hasher.hexdigests()
+    finally:
+        os.close(fd)
+
+    for algorithm, value in (expected or {}).items():
+        if value and digests[algorithm] != value:
+            part_path.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+            raise DownloadError(f"{algorithm.upper()} inválido para {name}: esperado {value}, obtido {digests[algorithm]}")
+
+    os.replace(part_path, destination)
+    state_path.unlink(missing_ok=True)
+    write_marker(destination, digests)
+    return digests
+
+def _marker_path(path: Path) -> Path:
+    return path.with_name(path.name + ".verified.json")
+
+def write_marker(path: Path, digests: Dict[str, str]) -> None:
+    """Registra os hashes de um arquivo verificado, para não relê-lo nas próximas execuções"""
+    stat = path.stat()
+    _marker_path(path).write_text(json.dumps({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, **digests}))
+
+def file_digests(path: Path, read_size: int = 4 * MiB) -> Dict[str, str]:
+    """Hashes de um arquivo existente; usa o marcador se o arquivo não mudou desde a verificação"""
+    marker = _marker_path(path)
+    stat = path.stat()
+    if marker.exists():
+        try:
+            data = json.loads(marker.read_text())
+            if data["size"] == stat.st_size and data["mtime_ns"] == stat.st_mtime_ns:
+                return {"md5": data["md5"], "sha256": data["sha256"]}
+        except (ValueError, KeyError):
+            pass
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(read_size), b""):
+            md5.update(chunk)
+            sha256.update(chunk)
+    digests = {"md5": md5.hexdigest(), "sha256": sha256.hexdigest()}
+    write_marker(path, digests)
+    return digests
+
+def expected_digests(info: Dict[str, str]) -> Dict[str, str]:
+    return {algorithm: info[algorithm] for algorithm in ("md5", "sha256") if info.get(algorithm)}
+
+def ensure_model(size: str, info: Dict[str, str], models_dir: Path, progress: Progress, **options) -> Dict[str, str]:
+    """Garante que o modelo `size` está presente e íntegro em `models_dir`"""
+    model_path = models_dir / f"llama-2-{size.lower()}-chat.gguf"
+    expected = expected_digests(info)
+
+    if model_path.exists():
+        print(f"Modelo {size} já existe. Verificando hashes...")
+        digests = file_digests(model_path)
+        if all(digests[algorithm] == value for algorithm, value in expected.items()):
+            print(f"Modelo {size} verificado com sucesso!")
+            return digests
+        print(f"Hash inválido para o modelo {size}. Baixando novamente...")
+        model_path.unlink()
+        _marker_path(model_path).unlink(missing_ok=True)
+
+    print(f"Baixando modelo {size}...")
+    digests = download_file(info["url"], model_path, expected, progress=progress, name=size, **options)
+    print(f"\nModelo {size} baixado e verificado (md5 {digests['md5']}, sha256 {digests['sha256']})")
+    return digests
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Baixa e verifica os modelos GGUF do Llama 2")
+    parser.add_argument("--only", nargs="+", choices=list(MODELS), help="baixa apenas os modelos indicados (ex.: --only 7B)")
+    parser.add_argument("--models-dir", default="models", help="diretório de destino (padrão: models)")
+    parser.add_argument("--connections", type=int, default=8, help="conexões paralelas por modelo")
+    parser.add_argument("--jobs", type=int, default=2, help="modelos baixados ao mesmo tempo")
+    parser.add_argument("--segment-size-mb", type=int, default=64, help="tamanho de cada segmento com Range")
+    parser.add_argument("--retries", type=int, default=5, help="tentativas por segmento")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    models_dir = Path(args.models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    selected = {size: info for size, info in MODELS.items() if not args.only or size in args.only}
+
+    progress = Progress()
+    options = {
+        "connections": args.connections,
+        "segment_size": args.segment_size_mb * MiB,
+        "retries": args.retries
+    }
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {
+            pool.submit(ensure_model, size, info, models_dir, progress, **options): size
+            for size, info in selected.items()
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except (DownloadError, requests.RequestException, OSError) as e:
+                failed.append(futures[future])
+                print(f"\nErro ao baixar o modelo {futures[future]}: {e}")
+
+    if failed:
+        print(f"Falha em: {', '.join(sorted(failed))}. Execute novamente para retomar.")
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
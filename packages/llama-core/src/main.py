@@ -1,70 +1,236 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from llama_cpp import Llama
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import hmac
+import os
+import time
 import uvicorn
+from sanara_common import metrics
+from sanara_common.profiling import PROFILE_MODES, ProfilerBusy, capture_profile
+
+try:
+    from .streaming import TokenStream, stream_frames
+    from .model_manager import ModelUnavailable, create_model_manager_from_env
+    from .scheduler import GenerationRequest, SchedulerSaturated, create_scheduler_from_env
+except ImportError:  # executado como script: python src/main.py
+    from streaming import TokenStream, stream_frames
+    from model_manager import ModelUnavailable, create_model_manager_from_env
+    from scheduler import GenerationRequest, SchedulerSaturated, create_scheduler_from_env
 
 app = FastAPI(title="Sanara Llama Core")
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Prazo padrão de uma geração, da admissão na fila até o último token
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("LLAMA_TIMEOUT_SECONDS", "120"))
+
+# Token dos endpoints /admin; vazio, eles não existem
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
 
 class LlamaRequest(BaseModel):
     prompt: str
     max_tokens: Optional[int] = 100
     temperature: Optional[float] = 0.7
     model_size: Optional[str] = "7B"
+    timeout_seconds: Optional[float] = None
 
 class LlamaResponse(BaseModel):
     text: str
     tokens_used: int
+    finish_reason: Optional[str] = None
 
-# Inicialização dos modelos
-models = {}
+# Modelos disponíveis; cada um é carregado no primeiro uso
 model_paths = {
     "7B": "./models/llama-2-7b-chat.gguf",
     "13B": "./models/llama-2-13b-chat.gguf",
     "70B": "./models/llama-2-70b-chat.gguf"
 }
 
+def _load_model(path: str) -> Llama:
+    # mmap: as páginas do modelo são compartilhadas com o page cache e carregadas sob demanda.
+    # O contexto é dividido entre as sequências decodificadas em paralelo pelo scheduler,
+    # mais as células reservadas aos prefixos de prompt em cache.
+    return Llama(
+        model_path=path,
+        n_ctx=(
+            int(os.getenv("LLAMA_CONTEXT_PER_SEQUENCE", "2048")) * int(os.getenv("LLAMA_PARALLEL_SEQUENCES", "4"))
+            + int(os.getenv("LLAMA_PREFIX_CACHE_TOKENS", "2048"))
+        ),
+        n_batch=int(os.getenv("LLAMA_BATCH_SIZE", "512")),
+        use_mmap=True
+    )
+
+model_manager = create_model_manager_from_env(model_paths, _load_model)
+
+# Um scheduler (e uma thread de decodificação) por modelo
+schedulers = {
+    size: create_scheduler_from_env(size, lambda size=size: model_manager.use(size))
+    for size in model_paths
+}
+for scheduler in schedulers.values():
+    # O backend do scheduler segura o Llama; sem isto o modelo descarregado continuaria na memória
+    model_manager.on_evict(scheduler.release)
+
 @app.on_event("startup")
 async def startup_event():
-    """Carrega os modelos Llama na inicialização"""
+    """Pré-carrega em segundo plano apenas os modelos fixados"""
+    loop = asyncio.get_running_loop()
+    for size in model_manager.pinned:
+        loop.run_in_executor(None, _preload, size)
+
+def _preload(size: str) -> None:
     try:
-        for size, path in model_paths.items():
-            models[size] = Llama(
-                model_path=path,
-                n_ctx=2048,
-                n_batch=512
-            )
+        with model_manager.use(size):
+            pass
     except Exception as e:
-        print(f"Erro ao carregar modelos: {e}")
+        print(f"Erro ao carregar modelo {size}: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for scheduler in schedulers.values():
+        scheduler.stop()
+    model_manager.unload_all()
+
+def _submit(request: LlamaRequest, sink: Optional[TokenStream] = None) -> GenerationRequest:
+    timeout = request.timeout_seconds or DEFAULT_TIMEOUT_SECONDS
+    generation = GenerationRequest(
+        request.prompt,
+        request.max_tokens,
+        request.temperature,
+        deadline=time.monotonic() + timeout,
+        sink=sink
+    )
+    schedulers[request.model_size].submit(generation)
+    return generation
 
 @app.post("/generate", response_model=LlamaResponse)
 async def generate_text(request: LlamaRequest):
     """Gera texto usando o modelo Llama especificado"""
     try:
-        model = models.get(request.model_size)
-        if not model:
+        if request.model_size not in model_paths:
             raise ValueError(f"Modelo {request.model_size} não encontrado")
         
-        output = model(
-            request.prompt,
-            max_tokens=request.max_tokens,
-            temperature=request.temperature
-        )
+        generation = _submit(request)
+        try:
+            output = await asyncio.wrap_future(generation.future)
+        except asyncio.CancelledError:
+            generation.cancel()
+            raise
         
         return LlamaResponse(
-            text=output["choices"][0]["text"],
-            tokens_used=output["usage"]["total_tokens"]
+            text=output["text"],
+            tokens_used=output["prompt_tokens"] + output["completion_tokens"],
+            finish_reason=output["finish_reason"]
         )
+    except SchedulerSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ModelUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except (asyncio.TimeoutError, TimeoutError):
+        raise HTTPException(status_code=504, detail="Tempo limite de geração excedido")
     except Exception as e:
         return {"error": str(e)}
 
+@app.post("/generate/stream")
+async def generate_text_stream(request: LlamaRequest):
+    """Gera texto em streaming (NDJSON), um quadro por token"""
+    if request.model_size not in model_paths:
+        raise HTTPException(status_code=404, detail=f"Modelo {request.model_size} não encontrado")
+    
+    stream = TokenStream(asyncio.get_running_loop())
+    try:
+        generation = _submit(request, sink=stream)
+    except SchedulerSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    # O scheduler encerra a geração no prazo; a folga cobre só a entrega dos últimos quadros
+    timeout = (request.timeout_seconds or DEFAULT_TIMEOUT_SECONDS) + 5
+    return StreamingResponse(
+        stream_frames(stream, asyncio.wrap_future(generation.future), timeout),
+        media_type="application/x-ndjson"
+    )
+
 @app.get("/health")
 async def health_check():
     """Endpoint de verificação de saúde"""
     return {
         "status": "healthy",
-        "models_loaded": list(models.keys())
+        "models_loaded": model_manager.loaded(),
+        "memory": model_manager.stats(),
+        "schedulers": {size: scheduler.stats() for size, scheduler in schedulers.items()}
     }
 
+def collect_scheduler_metrics() -> List[metrics.MetricFamily]:
+    """Filas, tokens e cache de prefixos que os schedulers já contam"""
+    queue_depth = metrics.MetricFamily("queue_depth", "gauge", "Items waiting in an internal queue")
+    active = metrics.MetricFamily("llm_sequences_active", "gauge", "Sequences being decoded")
+    tokens = metrics.MetricFamily("tokens_total", "counter", "Tokens processed by a generative model")
+    generations = metrics.MetricFamily("llm_generations_total", "counter", "Generations by outcome")
+    lookups = metrics.MetricFamily("cache_lookups_total", "counter", "Cache lookups by outcome")
+    entries = metrics.MetricFamily("cache_entries", "gauge", "Entries held in a cache")
+    for size, scheduler in schedulers.items():
+        stats = scheduler.stats()
+        queue_depth.add(stats["queued"], queue=f"scheduler:{size}")
+        active.add(stats["active"], model=size)
+        tokens.add(stats["prompt_tokens"], model=size, kind="prompt")
+        tokens.add(stats["generated_tokens"], model=size, kind="completion")
+        for outcome in ("completed", "cancelled", "expired", "failed", "rejected"):
+            generations.add(stats[outcome], model=size, outcome=outcome)
+        prefix = stats.get("prefix_cache")
+        if prefix is not None:
+            lookups.add(prefix["hits"], cache=f"prefix:{size}", result="hit")
+            lookups.add(prefix["lookups"] - prefix["hits"], cache=f"prefix:{size}", result="miss")
+            entries.add(prefix["entries"], cache=f"prefix:{size}")
+    memory = model_manager.stats()
+    ready = metrics.MetricFamily("model_ready", "gauge", "1 when the model is loaded and warmed up")
+    for size in model_paths:
+        ready.add(1 if size in memory["models"] else 0, model=size)
+    return [
+        queue_depth,
+        active,
+        tokens,
+        generations,
+        lookups,
+        entries,
+        ready,
+        metrics.MetricFamily("model_memory_bytes", "gauge", "Bytes held by loaded models and by the whole process")
+            .add(memory["model_bytes"], kind="models")
+            .add(memory["resident_bytes"], kind="resident")
+    ]
+
+metrics.registry.register_collector(collect_scheduler_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Só com o X-Admin-Token configurado; sem token configurado, os endpoints /admin não existem"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Token de administração inválido")
+
+@app.post("/admin/profile", response_class=PlainTextResponse)
+async def profile(
+    mode: str = Query("sample", description=f"Um de: {', '.join(PROFILE_MODES)}"),
+    seconds: float = Query(10.0, gt=0),
+    limit: int = Query(50, ge=1, le=1000),
+    _: None = Depends(require_admin)
+):
+    """Perfila o processo por `seconds` e devolve o relatório (o modo sample inclui as threads dos schedulers)"""
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode deve ser um de: {', '.join(PROFILE_MODES)}")
+    if seconds > PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds deve ser no máximo {PROFILE_MAX_SECONDS:g}")
+    try:
+        report = await capture_profile(mode, seconds, limit)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(report, headers={"X-Worker-PID": str(os.getpid()), "X-Profile-Mode": mode})
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,199 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+class ModelUnavailable(Exception):
+    """Lançada quando um modelo não cabe no orçamento de memória no momento"""
+
+class _LoadedModel:
+    def __init__(self, model: Any, size_bytes: int, load_seconds: float):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.in_use = 0
+        self.last_used = time.time()
+
+def physical_memory_bytes() -> int:
+    """Memória física total da máquina (0 se não for possível obter)"""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+def resident_bytes() -> int:
+    """RSS atual do processo (Linux); 0 em outras plataformas"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+class ModelManager:
+    """
+    Carrega modelos GGUF sob demanda respeitando um orçamento de memória.
+
+    Cada modelo é carregado no primeiro uso com mmap, então o custo estimado é
+    o tamanho do arquivo. Quando um novo modelo não cabe no orçamento, os
+    modelos ociosos menos usados recentemente são descarregados; modelos
+    fixados (`pinned`) e modelos em uso nunca são descarregados.
+    """
+
+    def __init__(
+        self,
+        model_paths: Dict[str, str],
+        budget_bytes: int,
+        loader: Callable[[str], Any],
+        pinned: Iterable[str] = (),
+        max_events: int = 100
+    ):
+        self.model_paths = model_paths
+        self.budget_bytes = budget_bytes
+        self.pinned = set(pinned)
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._load_locks = {size: threading.Lock() for size in model_paths}
+        self._loaded: "OrderedDict[str, _LoadedModel]" = OrderedDict()
+        # Bytes reservados por carregamentos em andamento
+        self._reserved = 0
+        self._events: deque = deque(maxlen=max_events)
+        self._evict_listeners: List[Callable[[Any], None]] = []
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._loaded)
+
+    @contextmanager
+    def use(self, size: str) -> Iterator[Any]:
+        """Entrega o modelo carregado (carregando se preciso) e o marca como em uso"""
+        entry = self._acquire(size)
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+
+    def _acquire(self, size: str) -> _LoadedModel:
+        if size not in self.model_paths:
+            raise ValueError(f"Modelo {size} não encontrado")
+
+        with self._lock:
+            entry = self._mark_used(size)
+        if entry is not None:
+            return entry
+
+        # Um carregamento por modelo; outras chamadas aguardam e reaproveitam
+        with self._load_locks[size]:
+            with self._lock:
+                entry = self._mark_used(size)
+                if entry is not None:
+                    return entry
+                size_bytes = os.path.getsize(self.model_paths[size])
+                evicted = self._make_room(size, size_bytes)
+                self._reserved += size_bytes
+            self._release_models(evicted)
+
+            started = time.perf_counter()
+            try:
+                model = self._loader(self.model_paths[size])
+            except Exception:
+                with self._lock:
+                    self._reserved -= size_bytes
+                raise
+            entry = _LoadedModel(model, size_bytes, time.perf_counter() - started)
+            with self._lock:
+                self._reserved -= size_bytes
+                entry.in_use += 1
+                self._loaded[size] = entry
+                self._record("load", size, size_bytes, seconds=round(entry.load_seconds, 3))
+            return entry
+
+    def _mark_used(self, size: str) -> Optional[_LoadedModel]:
+        entry = self._loaded.get(size)
+        if entry is not None:
+            entry.in_use += 1
+            self._loaded.move_to_end(size)
+        return entry
+
+    def _make_room(self, size: str, size_bytes: int) -> List[_LoadedModel]:
+        """Remove modelos ociosos (LRU) até caber `size_bytes`; chamado com o lock"""
+        if size_bytes > self.budget_bytes:
+            raise ModelUnavailable(
+                f"Modelo {size} ({size_bytes} bytes) excede o orçamento de memória ({self.budget_bytes} bytes)"
+            )
+
+        used = self._reserved + sum(entry.size_bytes for entry in self._loaded.values())
+        victims = []
+        for name, entry in self._loaded.items():
+            if used + size_bytes <= self.budget_bytes:
+                break
+            if entry.in_use == 0 and name not in self.pinned:
+                victims.append(name)
+                used -= entry.size_bytes
+        if used + size_bytes > self.budget_bytes:
+            raise ModelUnavailable(f"Memória insuficiente para carregar o modelo {size}: modelos em uso ou fixados")
+
+        evicted = []
+        for name in victims:
+            entry = self._loaded.pop(name)
+            evicted.append(entry)
+            self._record("evict", name, entry.size_bytes)
+        return evicted
+
+    def on_evict(self, listener: Callable[[Any], None]) -> None:
+        """Registra `listener`, chamado com cada modelo descarregado para soltar as referências a ele"""
+        self._evict_listeners.append(listener)
+
+    def _release_models(self, entries: List[_LoadedModel]) -> None:
+        for entry in entries:
+            for listener in self._evict_listeners:
+                listener(entry.model)
+            entry.model = None
+        if entries:
+            # Llama libera o contexto no __del__; força a coleta imediata
+            gc.collect()
+
+    def _record(self, event: str, size: str, size_bytes: int, **extra: Any) -> None:
+        self._events.append({"event": event, "model": size, "bytes": size_bytes, "timestamp": time.time(), **extra})
+
+    def unload_all(self) -> None:
+        with self._lock:
+            entries = list(self._loaded.values())
+            self._loaded.clear()
+        self._release_models(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {
+                name: {
+                    "bytes": entry.size_bytes,
+                    "in_use": entry.in_use,
+                    "pinned": name in self.pinned,
+                    "load_seconds": round(entry.load_seconds, 3),
+                    "last_used": entry.last_used
+                }
+                for name, entry in self._loaded.items()
+            }
+            return {
+                "budget_bytes": self.budget_bytes,
+                "model_bytes": sum(entry.size_bytes for entry in self._loaded.values()),
+                "resident_bytes": resident_bytes(),
+                "pinned": sorted(self.pinned),
+                "models": models,
+                "events": list(self._events)
+            }
+
+def create_model_manager_from_env(model_paths: Dict[str, str], loader: Callable[[str], Any]) -> ModelManager:
+    """Cria o gerenciador a partir das variáveis de ambiente"""
+    budget_gb = os.getenv("LLAMA_MEMORY_BUDGET_GB")
+    if budget_gb:
+        budget_bytes = int(float(budget_gb) * 1024 ** 3)
+    else:
+        # Sem configuração explícita, reserva 25% da RAM para o sistema e o KV cache
+        budget_bytes = int(physical_memory_bytes() * 0.75)
+    pinned = [size.strip() for size in os.getenv("LLAMA_PINNED_MODELS", "").split(",") if size.strip()]
+    return ModelManager(model_paths, budget_bytes, loader, pinned=pinned)
@@ -0,0 +1,147 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+class _Entry:
+    def __init__(self, seq_id: int, length: int, keys: List[bytes]):
+        self.seq_id = seq_id
+        self.length = length
+        self.keys = keys
+
+class PrefixCache:
+    """
+    Índice de prefixos de prompt mantidos no KV cache do llama.cpp.
+
+    Cada entrada ocupa um `seq_id` reservado cujas células de KV guardam os
+    primeiros `length` tokens de um prompt já avaliado. Os prefixos são
+    indexados pelo hash dos tokens em múltiplos de `block_size`, então uma
+    entrada também serve qualquer prompt que compartilhe apenas o começo (por
+    exemplo, as instruções fixas de um template). O total de tokens mantidos é
+    limitado por `max_tokens`, com descarte LRU.
+
+    Esta classe só faz a contabilidade; copiar e remover as células fica com o
+    scheduler (`llama_kv_cache_seq_cp` / `llama_kv_cache_seq_rm`).
+    """
+
+    def __init__(self, first_seq_id: int, max_entries: int = 8, max_tokens: int = 2048, block_size: int = 32):
+        self.block_size = block_size
+        self.max_tokens = max_tokens
+        self._free_ids = list(range(first_seq_id, first_seq_id + max_entries))
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        # hash do prefixo -> (seq_id, comprimento)
+        self._index: Dict[bytes, Tuple[int, int]] = {}
+        self._tokens = 0
+        self.lookups = 0
+        self.hits = 0
+        self.saved_tokens = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_tokens >= self.block_size and bool(self._free_ids or self._entries)
+
+    def _block_keys(self, tokens: List[int], limit: int) -> List[Tuple[int, bytes]]:
+        """Hashes dos prefixos de `tokens` em cada múltiplo de `block_size` até `limit`"""
+        data = np.asarray(tokens[:limit], dtype=np.int32).tobytes()
+        hasher = hashlib.blake2b(digest_size=16)
+        keys = []
+        step = self.block_size * 4
+        for end in range(step, len(data) + 1, step):
+            hasher.update(data[end - step:end])
+            keys.append((end // 4, hasher.copy().digest()))
+        return keys
+
+    def lookup(self, tokens: List[int]) -> Optional[Tuple[int, int]]:
+        """
+        Procura o maior prefixo em cache de `tokens`.
+
+        Retorna `(seq_id, comprimento)` ou None. Ao menos um token do prompt
+        fica de fora, para que a avaliação produza os logits do próximo token.
+        """
+        if not self.enabled:
+            return None
+        self.lookups += 1
+        for length, key in reversed(self._block_keys(tokens, len(tokens) - 1)):
+            found = self._index.get(key)
+            if found is not None:
+                seq_id, _ = found
+                self._entries.move_to_end(seq_id)
+                self.hits += 1
+                self.saved_tokens += length
+                return seq_id, length
+        return None
+
+    def insert(self, tokens: List[int]) -> Tuple[Optional[int], int, List[int]]:
+        """
+        Reserva uma entrada para o prefixo de `tokens` alinhado a `block_size`.
+
+        Retorna `(seq_id, comprimento, seq_ids_descartados)`; `seq_id` é None
+        se o prefixo já estiver em cache ou não couber. O chamador deve copiar
+        as células do prompt para `seq_id` e limpar os descartados.
+        """
+        if not self.enabled:
+            return None, 0, []
+        keys = self._block_keys(tokens, len(tokens))
+        if not keys:
+            return None, 0, []
+        length, last_key = keys[-1]
+        if last_key in self._index or length > self.max_tokens:
+            return None, 0, []
+
+        evicted = []
+        while self._entries and (not self._free_ids or self._tokens + length > self.max_tokens):
+            evicted.append(self._evict())
+        seq_id = self._free_ids.pop(0)
+        entry = _Entry(seq_id, length, [key for _, key in keys])
+        self._entries[seq_id] = entry
+        self._tokens += length
+        for block_length, key in keys:
+            # Prefixos curtos já indexados continuam apontando para a entrada anterior
+            self._index.setdefault(key, (seq_id, block_length))
+        return seq_id, length, evicted
+
+    def _evict(self) -> int:
+        seq_id, entry = self._entries.popitem(last=False)
+        for key in entry.keys:
+            if self._index.get(key, (None,))[0] == seq_id:
+                del self._index[key]
+        # Prefixos compartilhados com outras entradas passam a apontar para elas
+        for other in reversed(self._entries.values()):
+            for position, key in enumerate(other.keys, start=1):
+                self._index.setdefault(key, (other.seq_id, position * self.block_size))
+        self._tokens -= entry.length
+        self._free_ids.append(seq_id)
+        self.evictions += 1
+        return seq_id
+
+    def clear(self) -> List[int]:
+        """Esvazia o índice e retorna os `seq_id` que estavam em uso"""
+        seq_ids = list(self._entries)
+        while self._entries:
+            self._evict()
+        return seq_ids
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "cached_tokens": self._tokens,
+            "max_tokens": self.max_tokens,
+            "block_size": self.block_size,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "saved_prompt_tokens": self.saved_tokens,
+            "evictions": self.evictions
+        }
+
+def create_prefix_cache_from_env(first_seq_id: int) -> PrefixCache:
+    """Cria o cache de prefixos a partir das variáveis de ambiente"""
+    return PrefixCache(
+        first_seq_id,
+        max_entries=int(os.getenv("LLAMA_PREFIX_CACHE_ENTRIES", "8")),
+        max_tokens=int(os.getenv("LLAMA_PREFIX_CACHE_TOKENS", "2048")),
+        block_size=int(os.getenv("LLAMA_PREFIX_BLOCK_TOKENS", "32"))
+    )
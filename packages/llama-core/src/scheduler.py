@@ -0,0 +1,525 @@
+import codecs
+import math
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from contextlib import AbstractContextManager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import llama_cpp
+import numpy as np
+from sanara_common import metrics
+from sanara_common.metrics import BATCH_DURATION, BATCH_SIZE, STAGE_DURATION
+
+try:
+    from .prefix_cache import PrefixCache, create_prefix_cache_from_env
+except ImportError:  # executado como script: python src/main.py
+    from prefix_cache import PrefixCache, create_prefix_cache_from_env
+
+# Tokens por passo de decodificação (até n_batch)
+BATCH_TOKENS_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+BATCH_TOKENS = metrics.registry.histogram(
+    "inference_batch_tokens",
+    "Tokens evaluated per decode step, prompt chunks included",
+    ("model",),
+    BATCH_TOKENS_BUCKETS
+)
+
+# (token, posição, sequência, precisa de logits)
+BatchEntry = Tuple[int, int, int, bool]
+
+class SchedulerSaturated(Exception):
+    """Lançada quando a fila do modelo está cheia"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LlamaBatchBackend:
+    """
+    Adapta uma instância Llama à API de batch multi-sequência do llama.cpp.
+
+    Cada chamada a `decode` avalia tokens de várias sequências em uma única
+    passagem; o KV cache é compartilhado e separado por `seq_id`.
+    """
+
+    def __init__(self, model: Any, n_batch: int):
+        self._model = model
+        self.n_batch = n_batch
+        self.n_vocab = model.n_vocab()
+        self.eos = model.token_eos()
+        self._batch = llama_cpp.llama_batch_init(n_batch, 0, 1)
+        # O contexto pode conter estado de uso anterior; começa limpo
+        llama_cpp.llama_kv_cache_seq_rm(model.ctx, -1, -1, -1)
+
+    def tokenize(self, text: str) -> List[int]:
+        return self._model.tokenize(text.encode("utf-8"))
+
+    def detokenize(self, tokens: List[int]) -> bytes:
+        return self._model.detokenize(tokens)
+
+    def decode(self, entries: List[BatchEntry]) -> List[np.ndarray]:
+        """Avalia `entries` e retorna os logits das entradas que os pediram"""
+        batch = self._batch
+        batch.n_tokens = len(entries)
+        for i, (token, pos, seq_id, logits) in enumerate(entries):
+            batch.token[i] = token
+            batch.pos[i] = pos
+            batch.n_seq_id[i] = 1
+            batch.seq_id[i][0] = seq_id
+            batch.logits[i] = logits
+        status = llama_cpp.llama_decode(self._model.ctx, batch)
+        if status != 0:
+            raise RuntimeError(f"llama_decode falhou com código {status}")
+        return [
+            np.ctypeslib.as_array(llama_cpp.llama_get_logits_ith(self._model.ctx, i), shape=(self.n_vocab,)).copy()
+            for i, entry in enumerate(entries)
+            if entry[3]
+        ]
+
+    def copy(self, source: int, target: int, length: int) -> None:
+        """Compartilha as primeiras `length` posições de `source` com `target` (sem copiar memória)"""
+        llama_cpp.llama_kv_cache_seq_cp(self._model.ctx, source, target, 0, length)
+
+    def clear(self, seq_id: int) -> None:
+        llama_cpp.llama_kv_cache_seq_rm(self._model.ctx, seq_id, -1, -1)
+
+    def close(self) -> None:
+        llama_cpp.llama_batch_free(self._batch)
+        self._model = None
+
+class GenerationRequest:
+    """Uma geração admitida pelo scheduler"""
+
+    def __init__(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        deadline: float,
+        sink: Optional[Any] = None
+    ):
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.deadline = deadline
+        # Destino opcional dos trechos gerados (ex.: TokenStream), com push/close/cancelled
+        self.sink = sink
+        self.future: "Future[Dict[str, Any]]" = Future()
+        self._cancelled = threading.Event()
+        self.submitted = time.monotonic()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.sink is not None and self.sink.cancelled)
+
+class _Sequence:
+    def __init__(self, request: GenerationRequest, seq_id: int, prompt_tokens: List[int]):
+        self.request = request
+        self.seq_id = seq_id
+        self.prompt_tokens = prompt_tokens
+        # Tokens ainda não avaliados: o prompt no início, depois o último token amostrado
+        self.pending = list(prompt_tokens)
+        self.pos = 0
+        self.cached_tokens = 0
+        self.generated: List[int] = []
+        self.text: List[str] = []
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.started = time.monotonic()
+
+class BatchScheduler:
+    """
+    Scheduler de continuous batching para um modelo.
+
+    As requisições entram em uma fila limitada; uma thread dedicada admite até
+    `max_sequences` gerações simultâneas e, a cada passo, monta um batch com um
+    token de cada sequência em decodificação mais trechos dos prompts novos
+    (até `n_batch` tokens). Sequências terminam por EOS, `max_tokens`, prazo
+    ou cancelamento, liberando a vaga para a próxima da fila imediatamente.
+
+    O modelo é obtido por `acquire` só enquanto há trabalho, então um modelo
+    ocioso pode ser descarregado pelo gerenciador de memória, que chama
+    `release` para fechar o backend que o referencia. Com um
+    `prefix_cache`, prefixos de prompts já avaliados ficam no KV cache e novas
+    sequências que os compartilham avaliam apenas o restante do prompt.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        acquire: Callable[[], AbstractContextManager],
+        backend_factory: Callable[[Any], Any],
+        max_sequences: int = 4,
+        max_queue: int = 16,
+        context_per_sequence: int = 2048,
+        top_k: int = 40,
+        seed: Optional[int] = None,
+        prefix_cache: Optional[PrefixCache] = None
+    ):
+        self.name = name
+        self.max_sequences = max_sequences
+        self.max_queue = max_queue
+        self.context_per_sequence = context_per_sequence
+        self.top_k = top_k
+        self._acquire = acquire
+        self._backend_factory = backend_factory
+        self.prefix_cache = prefix_cache
+        # O backend (e o KV cache com os prefixos) sobrevive entre rajadas até o modelo ser descarregado
+        self._backend: Optional[Any] = None
+        self._backend_model: Optional["weakref.ref[Any]"] = None
+        # Protege o backend de `release`, chamado pela thread que descarrega o modelo
+        self._backend_lock = threading.Lock()
+        self._serving = False
+        self._release_pending = False
+        self._rng = np.random.default_rng(seed)
+        self._queue: "deque[GenerationRequest]" = deque()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._active = 0
+        # Duração média de uma geração (EMA), usada para estimar o Retry-After
+        self._average_seconds = 1.0
+        self._stats = {
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "expired": 0,
+            "cancelled": 0,
+            "prompt_tokens": 0,
+            "generated_tokens": 0,
+            "batches": 0,
+            "batch_tokens": 0,
+            "busy_seconds": 0.0
+        }
+
+    def submit(self, request: GenerationRequest) -> "Future[Dict[str, Any]]":
+        """Enfileira a requisição; lança SchedulerSaturated se a fila estiver cheia"""
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError(f"Scheduler do modelo {self.name} encerrado")
+            if len(self._queue) >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise SchedulerSaturated(f"Fila do modelo {self.name} cheia ({self.max_queue} requisições)", self._retry_after())
+            self._queue.append(request)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"scheduler-{self.name}", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return request.future
+
+    def _retry_after(self) -> int:
+        waves = (len(self._queue) + self._active) / self.max_sequences
+        return max(1, math.ceil(waves * self._average_seconds))
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            pending = list(self._queue)
+            self._queue.clear()
+            self._condition.notify_all()
+        for request in pending:
+            self._fail(request, RuntimeError(f"Scheduler do modelo {self.name} encerrado"))
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+            try:
+                self._burst()
+            except Exception as e:
+                # Falha ao carregar o modelo ou no llama.cpp: todas as requisições na fila falham
+                with self._condition:
+                    pending = list(self._queue)
+                    self._queue.clear()
+                for request in pending:
+                    self._fail(request, e)
+
+    def _burst(self) -> None:
+        """Serve a fila com o modelo adquirido; ao retornar, a thread ociosa não guarda referência a ele"""
+        with self._acquire() as model:
+            backend = self._backend_for(model)
+            try:
+                self._serve(backend)
+            except Exception:
+                # O estado do KV cache é desconhecido após uma falha
+                self._release_pending = True
+                raise
+            finally:
+                self._end_serving()
+
+    def _backend_for(self, model: Any) -> Any:
+        with self._backend_lock:
+            self._serving = True
+            if self._backend is not None and self._backend_model() is model:
+                return self._backend
+            # Modelo novo ou recarregado: o KV cache antigo não existe mais
+            self._reset_backend()
+            self._backend = self._backend_factory(model)
+            self._backend_model = weakref.ref(model)
+            return self._backend
+
+    def _end_serving(self) -> None:
+        with self._backend_lock:
+            self._serving = False
+            if self._release_pending:
+                self._release_pending = False
+                self._reset_backend()
+
+    def release(self, model: Any) -> None:
+        """
+        Fecha o backend (e descarta os prefixos em cache) se ele pertence a `model`.
+
+        Chamado pelo gerenciador de memória ao descarregar o modelo: o backend
+        mantém uma referência ao Llama, que só é liberado depois disto. Se o
+        modelo ainda estiver em uso, o backend é fechado ao fim da rajada.
+        """
+        with self._backend_lock:
+            if self._backend is None or self._backend_model() is not model:
+                return
+            if self._serving:
+                self._release_pending = True
+            else:
+                self._reset_backend()
+
+    def _reset_backend(self) -> None:
+        """Chamado com `_backend_lock`"""
+        if self.prefix_cache is not None:
+            self.prefix_cache.clear()
+        if self._backend is not None:
+            self._backend.close()
+        self._backend = None
+        self._backend_model = None
+
+    def _serve(self, backend: Any) -> None:
+        """Decodifica até a fila e as sequências ativas se esgotarem"""
+        active: Dict[int, _Sequence] = {}
+        free_ids = list(range(self.max_sequences))
+        try:
+            while True:
+                self._admit(backend, active, free_ids)
+                with self._condition:
+                    self._active = len(active)
+                if not active:
+                    return
+                started = time.monotonic()
+                self._step(backend, active, free_ids)
+                self._stats["busy_seconds"] += time.monotonic() - started
+        except Exception as e:
+            for sequence in list(active.values()):
+                self._fail(sequence.request, e)
+            raise
+        finally:
+            with self._condition:
+                self._active = 0
+
+    def _admit(self, backend: Any, active: Dict[int, _Sequence], free_ids: List[int]) -> None:
+        while free_ids:
+            with self._condition:
+                if not self._queue or self._stopped:
+                    return
+                request = self._queue.popleft()
+            if request.cancelled:
+                self._stats["cancelled"] += 1
+                self._finish_request(request, TimeoutError("Requisição cancelada"), close_only=True)
+                continue
+            if time.monotonic() >= request.deadline:
+                self._stats["expired"] += 1
+                self._finish_request(request, TimeoutError("Prazo expirou antes do início da geração"))
+                continue
+            try:
+                prompt_tokens = backend.tokenize(request.prompt)
+                if len(prompt_tokens) + request.max_tokens > self.context_per_sequence:
+                    raise ValueError(
+                        f"Prompt ({len(prompt_tokens)} tokens) + max_tokens ({request.max_tokens}) "
+                        f"excede o contexto por sequência ({self.context_per_sequence})"
+                    )
+            except Exception as e:
+                self._fail(request, e)
+                continue
+            seq_id = free_ids.pop(0)
+            sequence = _Sequence(request, seq_id, prompt_tokens)
+            hit = self.prefix_cache.lookup(prompt_tokens) if self.prefix_cache is not None else None
+            if hit is not None:
+                cached_seq_id, length = hit
+                backend.copy(cached_seq_id, seq_id, length)
+                sequence.pos = sequence.cached_tokens = length
+                del sequence.pending[:length]
+            active[seq_id] = sequence
+
+    def _step(self, backend: Any, active: Dict[int, _Sequence], free_ids: List[int]) -> None:
+        entries: List[BatchEntry] = []
+        sampled: List[_Sequence] = []
+
+        # Sequências em decodificação primeiro (um token cada), para que prompts longos não as atrasem
+        decoding = [s for s in active.values() if s.generated]
+        prefilling = [s for s in active.values() if not s.generated]
+        for sequence in decoding + prefilling:
+            budget = backend.n_batch - len(entries)
+            if budget <= 0:
+                break
+            chunk = sequence.pending[:budget]
+            for offset, token in enumerate(chunk):
+                last = offset == len(chunk) - 1 and len(chunk) == len(sequence.pending)
+                entries.append((token, sequence.pos + offset, sequence.seq_id, last))
+            sequence.pos += len(chunk)
+            del sequence.pending[:len(chunk)]
+            if not sequence.pending:
+                sampled.append(sequence)
+
+        started = time.perf_counter()
+        logits = backend.decode(entries)
+        BATCH_DURATION.observe(time.perf_counter() - started, model=self.name)
+        BATCH_SIZE.observe(len({entry[2] for entry in entries}), model=self.name)
+        BATCH_TOKENS.observe(len(entries), model=self.name)
+        self._stats["batches"] += 1
+        self._stats["batch_tokens"] += len(entries)
+
+        if self.prefix_cache is not None:
+            for sequence in sampled:
+                if not sequence.generated:
+                    self._cache_prefix(backend, sequence)
+
+        now = time.monotonic()
+        for sequence, row in zip(sampled, logits):
+            token = self._sample(row, sequence.request.temperature)
+            finish_reason = None
+            if token == backend.eos:
+                finish_reason = "stop"
+            else:
+                if not sequence.generated:
+                    STAGE_DURATION.observe(now - sequence.request.submitted, graph=self.name, stage="first_token", status="ok")
+                sequence.generated.append(token)
+                self._emit(sequence, sequence.decoder.decode(backend.detokenize([token])))
+                if len(sequence.generated) >= sequence.request.max_tokens:
+                    finish_reason = "length"
+                else:
+                    sequence.pending.append(token)
+            if finish_reason is None and sequence.request.cancelled:
+                finish_reason = "cancelled"
+            if finish_reason is None and now >= sequence.request.deadline:
+                finish_reason = "deadline"
+            if finish_reason is not None:
+                self._complete(backend, sequence, finish_reason, active, free_ids)
+
+        # Sequências ainda no prompt também respeitam cancelamento e prazo
+        for sequence in list(active.values()):
+            if sequence.generated:
+                continue
+            if sequence.request.cancelled:
+                self._complete(backend, sequence, "cancelled", active, free_ids)
+            elif now >= sequence.request.deadline:
+                self._complete(backend, sequence, "deadline", active, free_ids)
+
+    def _cache_prefix(self, backend: Any, sequence: _Sequence) -> None:
+        """Guarda o prefixo do prompt recém-avaliado no cache"""
+        cache_seq_id, length, evicted = self.prefix_cache.insert(sequence.prompt_tokens)
+        for seq_id in evicted:
+            backend.clear(seq_id)
+        if cache_seq_id is not None:
+            backend.copy(sequence.seq_id, cache_seq_id, length)
+
+    def _sample(self, logits: np.ndarray, temperature: float) -> int:
+        if temperature <= 0:
+            return int(np.argmax(logits))
+        k = min(self.top_k, logits.shape[0])
+        top = np.argpartition(logits, -k)[-k:]
+        scaled = logits[top] / temperature
+        probabilities = np.exp(scaled - scaled.max())
+        probabilities /= probabilities.sum()
+        return int(top[self._rng.choice(k, p=probabilities)])
+
+    @staticmethod
+    def _emit(sequence: _Sequence, text: str) -> None:
+        if not text:
+            return
+        sequence.text.append(text)
+        if sequence.request.sink is not None:
+            sequence.request.sink.push(text)
+
+    def _complete(
+        self,
+        backend: Any,
+        sequence: _Sequence,
+        finish_reason: str,
+        active: Dict[int, _Sequence],
+        free_ids: List[int]
+    ) -> None:
+        del active[sequence.seq_id]
+        backend.clear(sequence.seq_id)
+        free_ids.append(sequence.seq_id)
+        self._emit(sequence, sequence.decoder.decode(b"", final=True))
+
+        seconds = time.monotonic() - sequence.started
+        self._average_seconds = 0.8 * self._average_seconds + 0.2 * seconds
+        # O status da geração é o motivo do término: stop, length, cancelled ou deadline
+        STAGE_DURATION.observe(sequence.started - sequence.request.submitted, graph=self.name, stage="queue", status="ok")
+        STAGE_DURATION.observe(seconds, graph=self.name, stage="generation", status=finish_reason)
+        self._stats["prompt_tokens"] += len(sequence.prompt_tokens)
+        self._stats["generated_tokens"] += len(sequence.generated)
+        self._stats["cancelled" if finish_reason == "cancelled" else "completed"] += 1
+
+        self._finish_request(sequence.request, {
+            "text": "".join(sequence.text),
+            "prompt_tokens": len(sequence.prompt_tokens),
+            "completion_tokens": len(sequence.generated),
+            "cached_prompt_tokens": sequence.cached_tokens,
+            "finish_reason": finish_reason,
+            "queue_ms": round((sequence.started - sequence.request.submitted) * 1000, 2)
+        })
+
+    def _fail(self, request: GenerationRequest, error: Exception) -> None:
+        self._stats["failed"] += 1
+        self._finish_request(request, error)
+
+    @staticmethod
+    def _finish_request(request: GenerationRequest, outcome: Any, close_only: bool = False) -> None:
+        if request.sink is not None:
+            request.sink.close()
+        if request.future.done():
+            return
+        if close_only:
+            request.future.cancel()
+        elif isinstance(outcome, Exception):
+            request.future.set_exception(outcome)
+        else:
+            request.future.set_result(outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update({
+                "queued": len(self._queue),
+                "active": self._active,
+                "max_sequences": self.max_sequences,
+                "max_queue": self.max_queue
+            })
+        busy = stats["busy_seconds"]
+        stats["tokens_per_second"] = round(stats["generated_tokens"] / busy, 2) if busy else 0.0
+        stats["average_batch_tokens"] = round(stats["batch_tokens"] / stats["batches"], 2) if stats["batches"] else 0.0
+        if self.prefix_cache is not None:
+            stats["prefix_cache"] = self.prefix_cache.stats()
+        return stats
+
+def create_scheduler_from_env(name: str, acquire: Callable[[], AbstractContextManager]) -> BatchScheduler:
+    """Cria o scheduler de um modelo a partir das variáveis de ambiente"""
+    n_batch = int(os.getenv("LLAMA_BATCH_SIZE", "512"))
+    max_sequences = int(os.getenv("LLAMA_PARALLEL_SEQUENCES", "4"))
+    return BatchScheduler(
+        name,
+        acquire,
+        lambda model: LlamaBatchBackend(model, n_batch),
+        max_sequences=max_sequences,
+        max_queue=int(os.getenv("LLAMA_MAX_QUEUE", "16")),
+        context_per_sequence=int(os.getenv("LLAMA_CONTEXT_PER_SEQUENCE", "2048")),
+        # Os seq_id dos prefixos em cache vêm depois das vagas de geração
+        prefix_cache=create_prefix_cache_from_env(first_seq_id=max_sequences)
+    )
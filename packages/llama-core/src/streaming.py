@@ -0,0 +1,91 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+_END = object()
+
+class TokenStream:
+    """
+    Ponte entre a thread que gera tokens e a resposta no event loop.
+
+    A thread publica cada trecho com `push` e encerra com `close`; o event loop
+    consome os trechos de forma assíncrona. `cancel` sinaliza à thread que o
+    cliente desistiu, e a geração é interrompida no próximo token.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def push(self, text: str) -> None:
+        """Publica um trecho gerado (chamado pela thread de geração)"""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, text)
+
+    def close(self) -> None:
+        """Marca o fim da geração (chamado pela thread de geração)"""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, _END)
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Aguarda o próximo trecho; retorna None quando a geração termina"""
+        item = await asyncio.wait_for(self._queue.get(), timeout)
+        return None if item is _END else item
+
+def frame(data: Dict[str, Any]) -> bytes:
+    """Serializa um quadro NDJSON"""
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+
+async def stream_frames(
+    stream: TokenStream,
+    generation: "asyncio.Future[Dict[str, int]]",
+    timeout_seconds: float
+) -> AsyncIterator[bytes]:
+    """
+    Converte os trechos gerados em quadros NDJSON.
+
+    Cada token vira `{"type": "token", "text": ...}`; o último quadro é
+    `{"type": "done", ...}` com tokens usados, tempo até o primeiro token e
+    tokens por segundo, ou `{"type": "error", ...}` em caso de falha. Se o
+    cliente desconectar, o gerador é cancelado e a geração é interrompida.
+    """
+    started = time.perf_counter()
+    deadline = started + timeout_seconds
+    first_token_at = None
+    try:
+        while True:
+            text = await stream.next(max(deadline - time.perf_counter(), 0))
+            if text is None:
+                break
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            yield frame({"type": "token", "text": text})
+
+        usage = await generation
+        finished = time.perf_counter()
+        decode_seconds = finished - first_token_at if first_token_at is not None else 0.0
+        yield frame({
+            "type": "done",
+            "tokens_used": usage["prompt_tokens"] + usage["completion_tokens"],
+            "prompt_tokens": usage["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"],
+            "finish_reason": usage.get("finish_reason"),
+            "time_to_first_token_ms": round((first_token_at - started) * 1000, 2) if first_token_at is not None else None,
+            "tokens_per_second": round(usage["completion_tokens"] / decode_seconds, 2) if decode_seconds > 0 else None,
+            "total_ms": round((finished - started) * 1000, 2)
+        })
+    except asyncio.TimeoutError:
+        yield frame({"type": "error", "error": "Tempo limite de geração excedido"})
+    except Exception as e:
+        yield frame({"type": "error", "error": str(e)})
+    finally:
+        # Desconexão, timeout ou erro: a thread para no próximo token
+        stream.cancel()
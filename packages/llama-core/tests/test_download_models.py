@@ -0,0 +1,100 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from scripts import download_models
+from scripts.download_models import DownloadError, download_file
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Servidor local que atende Range e, opcionalmente, derruba a conexão no meio"""
+    drop_after = None
+    segment_size = 1024 * 1024
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+    def do_GET(self):
+        start, end = 0, len(PAYLOAD) - 1
+        header = self.headers.get("Range")
+        if header:
+            first, last = header.split("=")[1].split("-")
+            start, end = int(first), int(last)
+        type(self).requests.append((start, end))
+        body = PAYLOAD[start:end + 1]
+        self.send_response(206 if header else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.drop_after is not None and start % self.segment_size == 0:
+            # Primeira tentativa de cada segmento: envia só parte do corpo e encerra a conexão
+            self.wfile.write(body[:self.drop_after])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+@pytest.fixture
+def server():
+    RangeHandler.requests = []
+    RangeHandler.drop_after = None
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/model.gguf"
+    httpd.shutdown()
+
+def expected_digests():
+    return {"md5": hashlib.md5(PAYLOAD).hexdigest(), "sha256": hashlib.sha256(PAYLOAD).hexdigest()}
+
+def test_parallel_ranged_download_is_verified(server, tmp_path):
+    """Segmentos paralelos formam o arquivo completo, verificado por MD5 e SHA-256"""
+    destination = tmp_path / "model.gguf"
+    digests = download_file(server, destination, expected_digests(), connections=4, segment_size=512 * 1024, buffer_size=128 * 1024)
+    assert digests == expected_digests()
+    assert destination.read_bytes() == PAYLOAD
+    assert len(RangeHandler.requests) == 7
+    assert not (tmp_path / "model.gguf.part").exists()
+    assert not (tmp_path / "model.gguf.part.json").exists()
+
+def test_interrupted_segments_resume_with_range(server, tmp_path):
+    """Conexões derrubadas no meio retomam a partir do último byte gravado"""
+    RangeHandler.drop_after = 100 * 1024
+    destination = tmp_path / "model.gguf"
+    digests = download_file(
+        server, destination, expected_digests(),
+        connections=2, segment_size=1024 * 1024, buffer_size=64 * 1024, retries=3
+    )
+    assert digests == expected_digests()
+    # As retomadas pedem apenas o que faltava de cada segmento
+    assert any(start % (1024 * 1024) != 0 for start, _ in RangeHandler.requests)
+
+def test_hash_mismatch_discards_partial_file(server, tmp_path):
+    """Um hash divergente falha e não deixa arquivo corrompido para trás"""
+    destination = tmp_path / "model.gguf"
+    with pytest.raises(DownloadError):
+        download_file(server, destination, {"sha256": "0" * 64}, segment_size=1024 * 1024)
+    assert not destination.exists()
+    assert not (tmp_path / "model.gguf.part").exists()
+
+def test_only_selects_models(server, tmp_path, monkeypatch):
+    """--only baixa apenas os modelos pedidos e reaproveita arquivos já verificados"""
+    monkeypatch.setattr(download_models, "MODELS", {
+        "7B": {"url": server, "md5": expected_digests()["md5"]},
+        "13B": {"url": server + "?13b", "md5": "inexistente"}
+    })
+    argv = ["--only", "7B", "--models-dir", str(tmp_path), "--segment-size-mb", "1"]
+    assert download_models.main(argv) == 0
+    assert (tmp_path / "llama-2-7b-chat.gguf").read_bytes() == PAYLOAD
+    assert not (tmp_path / "llama-2-13b-chat.gguf").exists()
+
+    requests_before = len(RangeHandler.requests)
+    assert download_models.main(argv) == 0
+    assert len(RangeHandler.requests) == requests_before
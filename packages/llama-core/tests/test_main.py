@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from src.main import app
@@ -11,6 +12,8 @@ def test_health_check():
     data = response.json()
     assert "status" in data
     assert "models_loaded" in data
+    assert data["memory"]["model_bytes"] <= data["memory"]["budget_bytes"]
+    assert "schedulers" in data
 
 def test_generate_text():
     """Testa a geração de texto"""
@@ -29,6 +32,27 @@ def test_generate_text():
     assert isinstance(data["text"], str)
     assert isinstance(data["tokens_used"], int)
 
+def test_generate_text_stream():
+    """Testa a geração em streaming (NDJSON)"""
+    request_data = {
+        "prompt": "Qual é a importância da saúde mental?",
+        "max_tokens": 20,
+        "model_size": "7B"
+    }
+    
+    with client.stream("POST", "/generate/stream", json=request_data) as response:
+        assert response.status_code == 200
+        frames = [json.loads(line) for line in response.iter_lines() if line]
+    
+    assert all(frame["type"] == "token" for frame in frames[:-1])
+    final = frames[-1]
+    assert final["type"] == "done"
+    # Tokens com bytes UTF-8 parciais são agrupados ao próximo quadro
+    assert final["completion_tokens"] >= len(frames) - 1
+    assert final["tokens_used"] == final["prompt_tokens"] + final["completion_tokens"]
+    assert "time_to_first_token_ms" in final
+    assert "tokens_per_second" in final
+
 def test_invalid_model_size():
     """Testa erro com tamanho de modelo inválido"""
     request_data = {
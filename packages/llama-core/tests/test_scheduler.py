@@ -0,0 +1,194 @@
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+import numpy as np
+import pytest
+from sanara_common import metrics
+from src.model_manager import ModelManager
+from src.prefix_cache import PrefixCache
+from src.scheduler import BatchScheduler, GenerationRequest, SchedulerSaturated
+
+class FakeBackend:
+    """Backend determinístico: o próximo token é sempre o anterior + 1; o token 0 é EOS"""
+    n_vocab = 64
+    eos = 0
+
+    def __init__(self, n_batch: int = 8):
+        self.n_batch = n_batch
+        self.batches = []
+        self.copies = []
+
+    def tokenize(self, text):
+        return [int(word) for word in text.split()]
+
+    def detokenize(self, tokens):
+        return "".join(f" {token}" for token in tokens).encode("utf-8")
+
+    def decode(self, entries):
+        self.batches.append(entries)
+        rows = []
+        for token, _, _, logits in entries:
+            if logits:
+                row = np.zeros(self.n_vocab, dtype=np.float32)
+                row[(token + 1) % self.n_vocab] = 1.0
+                rows.append(row)
+        return rows
+
+    def copy(self, source, target, length):
+        self.copies.append((source, target, length))
+
+    def clear(self, seq_id):
+        pass
+
+    def close(self):
+        pass
+
+class FakeModel:
+    pass
+
+def make_scheduler(backend, **kwargs):
+    model = FakeModel()
+
+    @contextmanager
+    def acquire():
+        yield model
+    return BatchScheduler(kwargs.pop("name", "test"), acquire, lambda model: backend, **kwargs)
+
+def generate(scheduler, prompt, max_tokens=5, timeout=5.0):
+    request = GenerationRequest(prompt, max_tokens, 0.0, deadline=time.monotonic() + timeout)
+    return scheduler.submit(request)
+
+def test_interleaves_sequences_in_shared_batches():
+    """Várias gerações simultâneas compartilham os batches de decodificação"""
+    backend = FakeBackend()
+    scheduler = make_scheduler(backend, max_sequences=3)
+    futures = [generate(scheduler, "1 2 3"), generate(scheduler, "10 11"), generate(scheduler, "60 61", max_tokens=10)]
+    results = [future.result(timeout=5) for future in futures]
+    scheduler.stop()
+
+    assert results[0]["text"] == " 4 5 6 7 8"
+    assert results[0]["finish_reason"] == "length"
+    assert results[1]["completion_tokens"] == 5
+    # 62, 63 e então o EOS (0)
+    assert results[2]["text"] == " 62 63"
+    assert results[2]["finish_reason"] == "stop"
+    assert max(len({seq for _, _, seq, _ in batch}) for batch in backend.batches) > 1
+    assert scheduler.stats()["completed"] == 3
+
+def test_records_batch_and_stage_metrics():
+    """Cada passo de decodificação e cada geração concluída aparecem em /metrics"""
+    backend = FakeBackend()
+    scheduler = make_scheduler(backend, max_sequences=2, name="metrics-test")
+    for future in [generate(scheduler, "1 2 3"), generate(scheduler, "10 11")]:
+        future.result(timeout=5)
+    scheduler.stop()
+
+    lines = metrics.registry.render().splitlines()
+    assert f'inference_batch_size_count{{model="metrics-test"}} {len(backend.batches)}' in lines
+    assert f'inference_batch_tokens_sum{{model="metrics-test"}} {sum(map(len, backend.batches))}' in lines
+    assert 'stage_duration_seconds_count{graph="metrics-test",stage="queue",status="ok"} 2' in lines
+    assert 'stage_duration_seconds_count{graph="metrics-test",stage="first_token",status="ok"} 2' in lines
+    assert 'stage_duration_seconds_count{graph="metrics-test",stage="generation",status="length"} 2' in lines
+
+def test_rejects_when_queue_is_full():
+    """Com a fila cheia, novas requisições são rejeitadas com Retry-After"""
+    release = threading.Event()
+
+    @contextmanager
+    def acquire():
+        release.wait()
+        yield FakeModel()
+
+    scheduler = BatchScheduler("test", acquire, lambda model: FakeBackend(), max_queue=1)
+    first = generate(scheduler, "1")
+    with pytest.raises(SchedulerSaturated) as exc:
+        generate(scheduler, "2")
+    assert exc.value.retry_after >= 1
+    release.set()
+    assert first.result(timeout=5)["completion_tokens"] == 5
+    scheduler.stop()
+
+def test_expired_requests_are_not_started():
+    """Requisições cujo prazo expirou na fila falham sem gerar"""
+    scheduler = make_scheduler(FakeBackend())
+    future = generate(scheduler, "1", timeout=-1)
+    with pytest.raises(TimeoutError):
+        future.result(timeout=5)
+    scheduler.stop()
+
+def test_prefix_cache_matches_block_aligned_prefixes():
+    """Prompts que compartilham só o começo reaproveitam o prefixo em cache"""
+    cache = PrefixCache(first_seq_id=4, max_entries=2, max_tokens=16, block_size=4)
+    preamble = list(range(1, 9))
+    assert cache.lookup(preamble + [20, 21]) is None
+    assert cache.insert(preamble + [20, 21]) == (4, 8, [])
+    assert cache.lookup(preamble + [30, 31, 32]) == (4, 8)
+    assert cache.lookup(preamble[:5] + [40]) == (4, 4)
+    # O prefixo idêntico já está em cache
+    assert cache.insert(preamble + [50]) == (None, 0, [])
+
+    # Sem espaço, a entrada menos usada é descartada
+    assert cache.insert(list(range(100, 112))) == (5, 12, [4])
+    assert cache.lookup(preamble + [20, 21]) is None
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["saved_prompt_tokens"] == 12
+    assert stats["cached_tokens"] == 12
+
+def test_scheduler_skips_cached_prompt_prefix():
+    """A segunda geração com o mesmo preâmbulo avalia só o sufixo"""
+    backend = FakeBackend()
+    cache = PrefixCache(first_seq_id=2, max_entries=2, max_tokens=64, block_size=4)
+    scheduler = make_scheduler(backend, max_sequences=2, prefix_cache=cache)
+    preamble = " ".join(str(n) for n in range(1, 9))
+    first = generate(scheduler, preamble + " 20").result(timeout=5)
+    second = generate(scheduler, preamble + " 30").result(timeout=5)
+    scheduler.stop()
+
+    assert first["cached_prompt_tokens"] == 0
+    assert second["cached_prompt_tokens"] == 8
+    assert second["text"] == " 31 32 33 34 35"
+    assert (0, 2, 8) in backend.copies
+    assert (2, 0, 8) in backend.copies
+    assert scheduler.stats()["prefix_cache"]["hits"] == 1
+
+class ModelBackend(FakeBackend):
+    """Como o LlamaBatchBackend, guarda uma referência ao modelo até ser fechado"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def close(self):
+        self.model = None
+
+def test_evicted_model_is_released_by_the_idle_scheduler(tmp_path):
+    """O backend mantido entre rajadas não impede o descarregamento do modelo"""
+    paths = {}
+    for size in ("7B", "13B"):
+        paths[size] = str(tmp_path / f"{size}.gguf")
+        with open(paths[size], "wb") as f:
+            f.write(b"\0" * 10)
+    manager = ModelManager(paths, budget_bytes=15, loader=lambda path: FakeModel())
+    cache = PrefixCache(first_seq_id=2, max_entries=2, max_tokens=64, block_size=4)
+    scheduler = BatchScheduler("7B", lambda: manager.use("7B"), ModelBackend, max_sequences=2, prefix_cache=cache)
+    manager.on_evict(scheduler.release)
+
+    generate(scheduler, "1 2 3 4 5").result(timeout=5)
+    deadline = time.monotonic() + 5
+    while manager.stats()["models"]["7B"]["in_use"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with manager.use("7B") as model:
+        evicted = weakref.ref(model)
+    del model
+    assert cache.stats()["cached_tokens"] == 4
+
+    # O 13B não cabe no orçamento junto com o 7B ocioso
+    with manager.use("13B"):
+        pass
+    scheduler.stop()
+
+    assert manager.loaded() == ["13B"]
+    assert evicted() is None
+    assert cache.stats()["cached_tokens"] == 0
@@ -0,0 +1,7 @@
+"""
+Runtime pieces shared by the Sanara Python services.
+
+Each service installs this package from ``packages/python-common`` (see its
+requirements.txt), so a fix here reaches services/ai, services/ai-service and
+packages/llama-core at once.
+"""
@@ -0,0 +1,326 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from .process import current_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+PYTORCH = "pytorch"
+ONNX = "onnx"
+ONNX_INT8 = "onnx-int8"
+ENGINES = (PYTORCH, ONNX, ONNX_INT8)
+
+# ONNX Runtime (optimum) and PyTorch (transformers) model classes able to serve each pipeline task
+MODEL_CLASSES = {
+    "sentiment-analysis": ("ORTModelForSequenceClassification", "AutoModelForSequenceClassification"),
+    "text-classification": ("ORTModelForSequenceClassification", "AutoModelForSequenceClassification"),
+    "zero-shot-classification": ("ORTModelForSequenceClassification", "AutoModelForSequenceClassification"),
+    "ner": ("ORTModelForTokenClassification", "AutoModelForTokenClassification"),
+    "token-classification": ("ORTModelForTokenClassification", "AutoModelForTokenClassification"),
+    "summarization": ("ORTModelForSeq2SeqLM", "AutoModelForSeq2SeqLM"),
+    "feature-extraction": ("ORTModelForFeatureExtraction", "AutoModel"),
+}
+
+DEFAULT_CACHE_DIR = "./onnx_models"
+
+def resolve_engine(engine: Optional[str], default: str = PYTORCH) -> str:
+    """
+    Return the engine to use, falling back to ``default`` when unset.
+    """
+    resolved = (engine or default).strip().lower()
+    if resolved not in ENGINES:
+        raise ValueError(f"Unknown inference engine '{resolved}', expected one of {', '.join(ENGINES)}")
+    return resolved
+
+def onnx_model_dir(model: str, engine: str, cache_dir: Optional[str] = None) -> Path:
+    """
+    Return the directory holding the exported graph of ``model`` for ``engine``.
+    """
+    return Path(cache_dir or DEFAULT_CACHE_DIR) / model.replace("/", "--") / engine
+
+def _model_class(task: str, engine: str):
+    if task not in MODEL_CLASSES:
+        raise ValueError(f"Task '{task}' has no registered model class")
+    ort_name, torch_name = MODEL_CLASSES[task]
+    if engine == PYTORCH:
+        import transformers
+        return getattr(transformers, torch_name)
+    import optimum.onnxruntime
+    return getattr(optimum.onnxruntime, ort_name)
+
+def _quantization_config():
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    # Dynamic quantization: int8 weights, activation ranges computed per batch
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    return AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+
+def _is_complete(export_dir: Path) -> bool:
+    return (export_dir / "config.json").exists()
+
+def publish_export(target: Path, build: Callable[[Path], None]) -> Path:
+    """
+    Run ``build`` on a temporary directory next to ``target`` and move the
+    result into place with a single rename.
+
+    A crash mid-export leaves only the temporary directory behind, and of two
+    workers exporting at once, the first to finish wins while the other drops
+    its copy. ``target`` therefore only ever holds a complete export.
+    """
+    if _is_complete(target):
+        return target
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{target.name}-", dir=target.parent))
+    try:
+        build(staging)
+        if target.exists() and not _is_complete(target):
+            # Leftover of an export written in place by an older version
+            shutil.rmtree(target, ignore_errors=True)
+        try:
+            os.replace(staging, target)
+        except OSError:
+            if not _is_complete(target):
+                raise
+            logger.info("Another worker exported %s first, keeping its copy", target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+def export_onnx(task: str, model: str, engine: str, cache_dir: Optional[str] = None) -> Path:
+    """
+    Export ``model`` to ONNX (and quantize it for ``onnx-int8``) unless a
+    previous export is already cached, and return the export directory.
+    """
+    fp32_dir = onnx_model_dir(model, ONNX, cache_dir)
+
+    def export(staging: Path) -> None:
+        from transformers import AutoTokenizer
+        logger.info("Exporting '%s' to ONNX in %s", model, fp32_dir)
+        _model_class(task, ONNX).from_pretrained(model, export=True).save_pretrained(staging)
+        AutoTokenizer.from_pretrained(model).save_pretrained(staging)
+
+    publish_export(fp32_dir, export)
+    if engine == ONNX:
+        return fp32_dir
+
+    int8_dir = onnx_model_dir(model, ONNX_INT8, cache_dir)
+
+    def quantize(staging: Path) -> None:
+        from optimum.onnxruntime import ORTQuantizer
+        logger.info("Quantizing '%s' to dynamic int8 in %s", model, int8_dir)
+        config = _quantization_config()
+        # Seq2seq exports are split into encoder/decoder graphs, each quantized on its own
+        for graph in sorted(fp32_dir.glob("*.onnx")):
+            quantizer = ORTQuantizer.from_pretrained(fp32_dir, file_name=graph.name)
+            quantizer.quantize(save_dir=staging, quantization_config=config, file_suffix="")
+        # Tokenizer, config and generation files are shared with the fp32 export
+        for path in fp32_dir.iterdir():
+            if path.suffix != ".onnx" and not (staging / path.name).exists():
+                shutil.copy2(path, staging / path.name)
+
+    return publish_export(int8_dir, quantize)
+
+def load_model(
+    task: str,
+    model: str,
+    engine: str,
+    device: int = -1,
+    cache_dir: Optional[str] = None,
+    intra_op_threads: int = 0
+) -> Tuple[Any, Any]:
+    """
+    Load the tokenizer and model for ``task`` on the requested engine.
+
+    ONNX Runtime models always run on CPU (onnxruntime without CUDA); PyTorch
+    models move to GPU ``device`` when one is given. Architectures that cannot
+    be exported for the task fall back to PyTorch.
+    """
+    from transformers import AutoTokenizer
+
+    if engine == PYTORCH:
+        loaded = _model_class(task, engine).from_pretrained(model)
+        if device >= 0:
+            loaded = loaded.to(f"cuda:{device}")
+        return AutoTokenizer.from_pretrained(model), loaded
+
+    import onnxruntime
+    try:
+        path = export_onnx(task, model, engine, cache_dir)
+    except ValueError as e:
+        logger.warning("Cannot export '%s' for %s (%s); falling back to %s", model, task, e, PYTORCH)
+        return load_model(task, model, PYTORCH, device)
+    if device >= 0:
+        logger.warning("Engine %s runs '%s' on CPU even though a GPU is available", engine, model)
+    options = onnxruntime.SessionOptions()
+    if intra_op_threads > 0:
+        options.intra_op_num_threads = intra_op_threads
+    loaded = _model_class(task, engine).from_pretrained(path, session_options=options)
+    return AutoTokenizer.from_pretrained(path), loaded
+
+def load_pipeline(
+    task: str,
+    model: str,
+    engine: str,
+    device: int = -1,
+    cache_dir: Optional[str] = None,
+    intra_op_threads: int = 0
+) -> Any:
+    """
+    Build a transformers pipeline for ``task`` backed by the requested engine.
+
+    Every engine returns a regular pipeline object, so callers keep passing
+    the same inputs and receive the same output structure.
+    """
+    from transformers import pipeline
+
+    if engine == PYTORCH:
+        return pipeline(task, model=model, device=device)
+    tokenizer, loaded = load_model(task, model, engine, device, cache_dir, intra_op_threads)
+    import torch
+    if isinstance(loaded, torch.nn.Module):
+        # Fell back to PyTorch: keep the requested device
+        return pipeline(task, model=loaded, tokenizer=tokenizer, device=device)
+    return pipeline(task, model=loaded, tokenizer=tokenizer)
+
+@dataclass
+class ParityReport:
+    task: str
+    model: str
+    engine: str
+    samples: int
+    agreement: float
+    max_score_drift: float
+    mean_score_drift: float
+    baseline_ms_per_item: float
+    engine_ms_per_item: float
+    baseline_resident_bytes: int
+    engine_resident_bytes: int
+
+def _entity_key(entity: Dict[str, Any]) -> tuple:
+    return (entity.get("entity_group") or entity.get("entity"), entity.get("start"), entity.get("end"))
+
+def _unwrap(output: Any) -> Any:
+    # Single-input classification and generation pipelines wrap their result in a one-element list
+    if isinstance(output, list) and len(output) == 1 and isinstance(output[0], dict) and "start" not in output[0]:
+        return output[0]
+    return output
+
+def compare_outputs(baseline: Sequence[Any], candidate: Sequence[Any]) -> Dict[str, float]:
+    """
+    Compare pipeline outputs item by item.
+
+    An item agrees when it carries the same label, the same entity spans or
+    the same generated text. Score drift is the absolute score difference of
+    agreeing labels and entities.
+    """
+    agreed = 0
+    drifts: List[float] = []
+    for expected, actual in zip(baseline, candidate):
+        expected, actual = _unwrap(expected), _unwrap(actual)
+        if isinstance(expected, dict) and "label" in expected:
+            if expected["label"] == actual["label"]:
+                agreed += 1
+                drifts.append(abs(float(expected["score"]) - float(actual["score"])))
+        elif isinstance(expected, dict):
+            # Generation tasks: summary_text, generated_text, ...
+            agreed += int(expected == actual)
+        else:
+            expected_entities = {_entity_key(e): e for e in expected}
+            actual_entities = {_entity_key(e): e for e in actual}
+            agreed += int(expected_entities.keys() == actual_entities.keys())
+            for key in expected_entities.keys() & actual_entities.keys():
+                drifts.append(abs(float(expected_entities[key]["score"]) - float(actual_entities[key]["score"])))
+    total = min(len(baseline), len(candidate))
+    return {
+        "agreement": agreed / total if total else 1.0,
+        "max_score_drift": max(drifts, default=0.0),
+        "mean_score_drift": sum(drifts) / len(drifts) if drifts else 0.0,
+    }
+
+def _timed_run(pipe: Any, texts: List[str]) -> tuple:
+    pipe(texts[0])  # warm-up: first call allocates buffers and compiles kernels
+    started = time.perf_counter()
+    outputs = [pipe(text) for text in texts]
+    return outputs, (time.perf_counter() - started) * 1000 / len(texts)
+
+def check_parity(
+    task: str,
+    model: str,
+    engine: str,
+    texts: List[str],
+    cache_dir: Optional[str] = None,
+    intra_op_threads: int = 0
+) -> ParityReport:
+    """
+    Run ``texts`` through the PyTorch baseline and through ``engine`` and
+    report accuracy drift, latency and the resident memory each one added.
+    """
+    # Import the runtimes up front so the memory figures cover the models only
+    import onnxruntime  # noqa: F401
+    import transformers.pipelines  # noqa: F401
+
+    engine = resolve_engine(engine)
+    before = current_rss_bytes()
+    baseline = load_pipeline(task, model, PYTORCH)
+    baseline_bytes = max(current_rss_bytes() - before, 0)
+    baseline_outputs, baseline_ms = _timed_run(baseline, texts)
+    del baseline
+
+    # Export before measuring, so the memory of the one-off export is not counted
+    export_onnx(task, model, engine, cache_dir)
+    before = current_rss_bytes()
+    candidate = load_pipeline(task, model, engine, cache_dir=cache_dir, intra_op_threads=intra_op_threads)
+    engine_bytes = max(current_rss_bytes() - before, 0)
+    engine_outputs, engine_ms = _timed_run(candidate, texts)
+
+    return ParityReport(
+        task=task,
+        model=model,
+        engine=engine,
+        samples=len(texts),
+        baseline_ms_per_item=round(baseline_ms, 3),
+        engine_ms_per_item=round(engine_ms, 3),
+        baseline_resident_bytes=baseline_bytes,
+        engine_resident_bytes=engine_bytes,
+        **compare_outputs(baseline_outputs, engine_outputs)
+    )
+
+DEFAULT_PARITY_TEXTS = [
+    "O atendimento foi excelente e o médico explicou tudo com muita calma.",
+    "Estou com dor de cabeça forte e febre desde ontem à noite.",
+    "A consulta atrasou duas horas e ninguém deu explicação.",
+    "Paciente relata tosse seca, cansaço e perda de olfato há cinco dias.",
+    "Tomei o remédio receitado pela Dra. Ana Souza no Hospital São Lucas e melhorei.",
+    "Não consigo dormir direito e me sinto ansioso o tempo todo.",
+]
+
+def main(argv: Optional[List[str]] = None, cache_dir: Optional[str] = None, intra_op_threads: int = 0) -> int:
+    """
+    Command-line parity check; services call it with their own cache directory and thread settings.
+    """
+    parser = argparse.ArgumentParser(description="Compare an inference engine against the PyTorch baseline")
+    parser.add_argument("--task", default="sentiment-analysis", choices=sorted(MODEL_CLASSES))
+    parser.add_argument("--model", required=True, help="model name or path")
+    parser.add_argument("--engine", default=ONNX_INT8, choices=[ONNX, ONNX_INT8])
+    parser.add_argument("--texts", help="file with one sample text per line")
+    parser.add_argument("--min-agreement", type=float, default=0.95, help="fail below this agreement ratio")
+    args = parser.parse_args(argv)
+
+    texts = DEFAULT_PARITY_TEXTS
+    if args.texts:
+        texts = [line.strip() for line in Path(args.texts).read_text(encoding="utf-8").splitlines() if line.strip()]
+    report = check_parity(args.task, args.model, args.engine, texts, cache_dir, intra_op_threads)
+    print(json.dumps(asdict(report), indent=2))
+    return 0 if report.agreement >= args.min_agreement else 1
+
+if __name__ == "__main__":
+    sys.exit(main(cache_dir=os.getenv("ONNX_CACHE_DIR"), intra_op_threads=int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))))
@@ -0,0 +1,141 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class InferenceRejected(Exception):
+    """
+    Raised when the executor already holds its maximum number of pending calls.
+    """
+
+class InferenceExecutor:
+    """
+    Runs blocking model inference off the event loop.
+
+    Torch pipelines release the GIL during forward passes, so they run on a
+    bounded thread pool. Work that holds the GIL (e.g. spaCy parsing) can run
+    on an optional process pool of ``process_workers``, each set up once by
+    ``process_initializer``. Admission control rejects new calls once
+    ``max_pending`` calls are queued or running, and every call is bounded by
+    a timeout.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_pending: int = 64,
+        timeout_seconds: float = 30.0,
+        process_workers: int = 0,
+        process_initializer: Optional[Callable[..., None]] = None,
+        process_initargs: Tuple = ()
+    ):
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._processes: Optional[ProcessPoolExecutor] = None
+        if process_workers > 0:
+            self._processes = ProcessPoolExecutor(
+                max_workers=process_workers,
+                initializer=process_initializer,
+                initargs=process_initargs
+            )
+        self._max_workers = max_workers
+        self._process_workers = process_workers
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._total_seconds = 0.0
+
+    @property
+    def has_process_pool(self) -> bool:
+        return self._processes is not None
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` on the thread pool.
+        """
+        return await self._submit(self._threads, fn, args, kwargs, timeout)
+
+    async def run_in_process(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        timeout: Optional[float] = None,
+        **kwargs: Any
+    ) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` on the process pool, or on the thread pool if
+        none is configured. ``fn`` and its arguments must be picklable.
+        """
+        return await self._submit(self._processes or self._threads, fn, args, kwargs, timeout)
+
+    async def _submit(
+        self,
+        pool: Executor,
+        fn: Callable[..., Any],
+        args: Tuple,
+        kwargs: Dict[str, Any],
+        timeout: Optional[float]
+    ) -> Any:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise InferenceRejected(f"Inference queue is full ({self.max_pending} pending calls)")
+            self._pending += 1
+
+        started = time.perf_counter()
+        try:
+            if pool is self._threads:
+                # Keep the request id (and other context) in logs written by the worker thread
+                future = pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+            else:
+                future = pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is only freed when the work really finishes; a timed-out
+        # call keeps its worker busy until the model returns.
+        future.add_done_callback(lambda f: self._release(time.perf_counter() - started))
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout if timeout is not None else self.timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            logger.warning("Inference call %s timed out", getattr(fn, "__name__", fn))
+            raise
+
+    def _release(self, seconds: Optional[float]) -> None:
+        with self._lock:
+            self._pending -= 1
+            if seconds is not None:
+                self._completed += 1
+                self._total_seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "threads": self._max_workers,
+                "process_workers": self._process_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "average_seconds": self._total_seconds / self._completed if self._completed else 0.0
+            }
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import os
+import stat
+import struct
+import time
+from datetime import datetime
+from typing import Any, Dict, Mapping, Optional, Tuple, Type
+import msgpack
+from .inference_executor import InferenceRejected
+
+logger = logging.getLogger(__name__)
+
+# HTTP workers talk to the process owning the models over a Unix-domain socket. Every frame:
+# request id, frame kind and payload length, followed by a msgpack payload
+HEADER = struct.Struct("!IBI")
+REQUEST = 1
+RESPONSE = 2
+ERROR = 3
+DEFAULT_MAX_FRAME_BYTES = 64 * 2**20
+
+# Exceptions that cross the socket with their type, checked in order; anything else becomes ModelServerError
+ERROR_KINDS: Mapping[str, Type[BaseException]] = {
+    "rejected": InferenceRejected,
+    "timeout": asyncio.TimeoutError,
+}
+
+class ModelServerError(Exception):
+    """
+    Raised on the client for inference errors reported by the model server.
+    """
+
+class ModelServerUnavailable(InferenceRejected):
+    """
+    Raised when the model server cannot be reached; callers answer 503 as for a full queue.
+    """
+
+def _encode_default(obj: Any) -> Any:
+    # numpy scalars and arrays (pipeline scores) and the datetimes in stats
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Cannot encode {type(obj).__name__} in a model server frame")
+
+def encode_frame(request_id: int, kind: int, payload: Any, max_bytes: int = DEFAULT_MAX_FRAME_BYTES) -> bytes:
+    """
+    Serialize one frame.
+    """
+    body = msgpack.packb(payload, default=_encode_default, use_bin_type=True)
+    if len(body) > max_bytes:
+        raise ValueError(f"Frame of {len(body)} bytes exceeds the {max_bytes} bytes limit")
+    return HEADER.pack(request_id, kind, len(body)) + body
+
+async def read_frame(reader: asyncio.StreamReader, max_bytes: int = DEFAULT_MAX_FRAME_BYTES) -> Tuple[int, int, Any]:
+    """
+    Read one frame. Raises ``asyncio.IncompleteReadError`` when the peer closes the connection.
+    """
+    request_id, kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > max_bytes:
+        raise ValueError(f"Frame of {length} bytes exceeds the {max_bytes} bytes limit")
+    return request_id, kind, msgpack.unpackb(await reader.readexactly(length), raw=False)
+
+def error_payload(error: BaseException, kinds: Mapping[str, Type[BaseException]] = ERROR_KINDS) -> Dict[str, str]:
+    """
+    Encode an exception so the client can raise the matching type.
+    """
+    kind = next((name for name, error_type in kinds.items() if isinstance(error, error_type)), "error")
+    return {"kind": kind, "message": str(error)}
+
+def raise_error(payload: Dict[str, str], kinds: Mapping[str, Type[BaseException]] = ERROR_KINDS) -> None:
+    """
+    Raise the exception described by an error frame.
+    """
+    raise kinds.get(payload.get("kind"), ModelServerError)(payload.get("message", ""))
+
+class FrameServer:
+    """
+    Accepts connections on a Unix-domain socket and answers their requests.
+
+    Requests of a connection are handled concurrently and answered as they
+    complete. Subclasses implement ``dispatch``.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+        error_kinds: Mapping[str, Type[BaseException]] = ERROR_KINDS
+    ):
+        self.path = path
+        self.max_frame_bytes = max_frame_bytes
+        self.error_kinds = error_kinds
+        self.started_at = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def connections(self) -> int:
+        return len(self._connections)
+
+    async def start(self) -> None:
+        """
+        Start listening, replacing a socket file left by a previous run.
+        """
+        if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        # Only processes of the same user may talk to the server
+        os.chmod(self.path, 0o600)
+        logger.info("Model server listening on %s", self.path)
+
+    async def close(self) -> None:
+        """
+        Stop accepting connections and close the open ones.
+        """
+        if self._server is not None:
+            self._server.close()
+            # Closing the writers ends each handler's read loop without cancelling it
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*self._connections.values(), return_exceptions=True)
+            await self._server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections[writer] = asyncio.current_task()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    request_id, kind, payload = await read_frame(reader, self.max_frame_bytes)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if kind != REQUEST:
+                    continue
+                task = asyncio.ensure_future(self._respond(writer, request_id, payload))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except Exception as e:
+            logger.error("Model server connection failed: %s", e, exc_info=True)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, request_id: int, payload: Dict[str, Any]) -> None:
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            frame = encode_frame(request_id, RESPONSE, await self.dispatch(payload), self.max_frame_bytes)
+        except Exception as e:
+            self.errors += 1
+            frame = encode_frame(request_id, ERROR, error_payload(e, self.error_kinds), self.max_frame_bytes)
+        finally:
+            self.in_flight -= 1
+        if not writer.is_closing():
+            writer.write(frame)
+            await writer.drain()
+
+    async def dispatch(self, payload: Dict[str, Any]) -> Any:
+        """
+        Run one request and return its response payload.
+        """
+        raise NotImplementedError
+
+    def server_stats(self) -> Dict[str, Any]:
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "connections": self.connections,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+        }
+
+class ModelServerClient:
+    """
+    Connection from an HTTP worker to the model server.
+
+    A single connection is shared by every concurrent request of the worker:
+    requests are written as they come and their responses matched by request
+    id. A dropped connection fails the requests in flight and is reopened by
+    the next call.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        timeout_seconds: float = 30.0,
+        max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+        error_kinds: Mapping[str, Type[BaseException]] = ERROR_KINDS
+    ):
+        self.path = path
+        self.timeout_seconds = timeout_seconds
+        self.max_frame_bytes = max_frame_bytes
+        self.error_kinds = error_kinds
+        # Answer of the last ``hello``; cleared when the connection drops
+        self.server_info: Dict[str, Any] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._receiver: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self.requests = 0
+        self.errors = 0
+        self.connections_opened = 0
+        self.total_seconds = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _connect(self) -> None:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self.connected:
+                return
+            try:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                raise ModelServerUnavailable(f"Model server unavailable at {self.path}: {e}")
+            self.connections_opened += 1
+            self._receiver = asyncio.create_task(self._receive(self._reader))
+
+    async def _receive(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                request_id, kind, payload = await read_frame(reader, self.max_frame_bytes)
+                future = self._pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if kind == ERROR:
+                    try:
+                        raise_error(payload, self.error_kinds)
+                    except Exception as e:
+                        future.set_exception(e)
+                else:
+                    future.set_result(payload)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.warning("Lost connection to the model server: %r", e)
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+            self.server_info = {}
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ModelServerUnavailable("Connection to the model server was lost"))
+            self._pending.clear()
+
+    async def call(self, op: str, **payload: Any) -> Any:
+        """
+        Send one request and wait for its response.
+        """
+        if not self.connected:
+            await self._connect()
+        self._next_id = (self._next_id + 1) % 2**32
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.requests += 1
+        started = time.perf_counter()
+        try:
+            self._writer.write(encode_frame(request_id, REQUEST, {"op": op, **payload}, self.max_frame_bytes))
+            await self._writer.drain()
+            return await asyncio.wait_for(future, self.timeout_seconds)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+            self.total_seconds += time.perf_counter() - started
+
+    async def infer(self, model: str, items: list, options: Optional[Dict[str, Any]] = None) -> list:
+        """
+        Run ``model`` on ``items`` with shared call options, one result per item.
+        """
+        return (await self.call("infer", model=model, items=items, options=options or {}))["results"]
+
+    async def hello(self) -> Dict[str, Any]:
+        self.server_info = await self.call("hello")
+        return self.server_info
+
+    async def health(self) -> Dict[str, Any]:
+        return await self.call("health")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "socket": self.path,
+            "connected": self.connected,
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections_opened": self.connections_opened,
+            "in_flight": len(self._pending),
+            "average_ms": round(self.total_seconds * 1000 / self.requests, 3) if self.requests else 0.0
+        }
+
+    async def close(self) -> None:
+        if self._receiver is not None:
+            self._receiver.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
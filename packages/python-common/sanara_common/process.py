@@ -0,0 +1,15 @@
+import os
+import sys
+
+def current_rss_bytes() -> int:
+    """
+    Return the resident set size of the current process in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Non-Linux hosts: fall back to the peak RSS reported by getrusage
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
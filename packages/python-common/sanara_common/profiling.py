@@ -0,0 +1,113 @@
+import asyncio
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List
+
+PROFILE_MODES = ("cprofile", "sample", "tracemalloc")
+
+class ProfilerBusy(Exception):
+    """
+    Raised when a profile is requested while another one is still running.
+    """
+
+_running = False
+
+async def capture_profile(mode: str, seconds: float, limit: int = 50, interval_ms: float = 5.0) -> str:
+    """
+    Profile this worker for ``seconds`` while it keeps serving traffic and
+    return a plain-text report.
+
+    - ``cprofile``: deterministic profile of the event loop thread (handlers,
+      serialization, stage orchestration), top ``limit`` functions by
+      cumulative time. Adds noticeable overhead while it runs.
+    - ``sample``: statistical profile of every thread, inference threads
+      included, sampled every ``interval_ms``. One folded stack per line
+      with its sample count, the input format of flamegraph.pl and speedscope.
+    - ``tracemalloc``: the ``limit`` source lines whose allocations grew the
+      most over the window.
+
+    Only one profile runs at a time per process.
+    """
+    global _running
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}', expected one of {', '.join(PROFILE_MODES)}")
+    if _running:
+        raise ProfilerBusy("A profile is already running in this worker")
+    _running = True
+    try:
+        if mode == "cprofile":
+            return await _cprofile(seconds, limit)
+        if mode == "sample":
+            return await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+        return await _tracemalloc(seconds, limit)
+    finally:
+        _running = False
+
+async def _cprofile(seconds: float, limit: int) -> str:
+    # cProfile hooks only the thread that enables it: here, the event loop thread
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return output.getvalue()
+
+def _thread_names() -> Dict[int, str]:
+    return {thread.ident: thread.name for thread in threading.enumerate()}
+
+def sample_stacks(seconds: float, interval: float) -> str:
+    """
+    Sample the stacks of every other thread for ``seconds`` and return them
+    folded (``thread;outer;...;inner count``), most frequent first.
+    """
+    own = threading.get_ident()
+    counts: Counter = Counter()
+    names = _thread_names()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if ident not in names:
+                names = _thread_names()
+            stack.append(names.get(ident, f"thread-{ident}"))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+async def _tracemalloc(seconds: float, limit: int) -> str:
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(25)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+    # Allocations made by tracemalloc itself are not the application's
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    differences = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "lineno")
+    lines = [
+        f"Traced memory: current {current / 2 ** 20:.1f} MiB, peak {peak / 2 ** 20:.1f} MiB",
+        f"Top {limit} allocation sites by growth over {seconds:g}s:"
+    ]
+    lines.extend(str(difference) for difference in differences[:limit])
+    return "\n".join(lines) + "\n"
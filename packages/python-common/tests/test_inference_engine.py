@@ -0,0 +1,86 @@
+import pytest
+from sanara_common.inference_engine import compare_outputs, onnx_model_dir, publish_export, resolve_engine
+
+def write_export(path, marker="new"):
+    (path / "model.onnx").write_text(marker)
+    (path / "config.json").write_text("{}")
+
+def test_resolve_engine_falls_back_to_default():
+    assert resolve_engine("", default="onnx") == "onnx"
+    assert resolve_engine(" ONNX-int8 ") == "onnx-int8"
+    with pytest.raises(ValueError):
+        resolve_engine("tensorrt")
+
+def test_onnx_exports_are_cached_per_model_and_engine(tmp_path):
+    path = onnx_model_dir("facebook/bart-large-cnn", "onnx-int8", str(tmp_path))
+    assert path == tmp_path / "facebook--bart-large-cnn" / "onnx-int8"
+
+def test_export_is_moved_into_place_when_complete(tmp_path):
+    target = tmp_path / "model" / "onnx"
+    assert publish_export(target, write_export) == target
+    assert (target / "model.onnx").read_text() == "new"
+    assert list(target.parent.iterdir()) == [target]
+
+def test_failed_export_leaves_nothing_that_looks_cached(tmp_path):
+    """A crash mid-export must not leave a directory the next start would reuse"""
+    target = tmp_path / "model" / "onnx"
+
+    def crash(staging):
+        (staging / "model.onnx").write_text("partial")
+        raise RuntimeError("exporter died")
+
+    with pytest.raises(RuntimeError):
+        publish_export(target, crash)
+    assert not target.exists()
+    assert list(target.parent.iterdir()) == []
+
+def test_cached_export_is_reused(tmp_path):
+    target = tmp_path / "onnx"
+    target.mkdir()
+    write_export(target, "cached")
+
+    def fail(staging):
+        raise AssertionError("should not export again")
+
+    publish_export(target, fail)
+    assert (target / "model.onnx").read_text() == "cached"
+
+def test_concurrent_export_keeps_the_first_one_published(tmp_path):
+    """Another worker finishing first wins; the late copy is dropped"""
+    target = tmp_path / "onnx"
+
+    def race(staging):
+        target.mkdir()
+        write_export(target, "winner")
+        write_export(staging, "loser")
+
+    publish_export(target, race)
+    assert (target / "model.onnx").read_text() == "winner"
+    assert list(tmp_path.iterdir()) == [target]
+
+def test_partial_export_left_in_place_is_replaced(tmp_path):
+    target = tmp_path / "onnx"
+    target.mkdir()
+    (target / "model.onnx").write_text("partial")
+    publish_export(target, write_export)
+    assert (target / "model.onnx").read_text() == "new"
+    assert (target / "config.json").exists()
+
+def test_compare_outputs_reports_agreement_and_drift():
+    """Labels, entity spans and generated text are compared item by item"""
+    baseline = [
+        [{"label": "POSITIVE", "score": 0.9}],
+        {"label": "NEGATIVE", "score": 0.8},
+        [{"entity_group": "PER", "start": 0, "end": 3, "score": 0.99}],
+        [{"summary_text": "Resumo."}],
+    ]
+    candidate = [
+        [{"label": "POSITIVE", "score": 0.85}],
+        {"label": "POSITIVE", "score": 0.6},
+        [{"entity_group": "PER", "start": 0, "end": 3, "score": 0.97}],
+        [{"summary_text": "Resumo."}],
+    ]
+    report = compare_outputs(baseline, candidate)
+    assert report["agreement"] == 0.75
+    assert report["max_score_drift"] == pytest.approx(0.05)
+    assert report["mean_score_drift"] == pytest.approx(0.035)
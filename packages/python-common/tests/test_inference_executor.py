@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import pytest
+from sanara_common.inference_executor import InferenceExecutor, InferenceRejected
+
+def test_rejects_calls_beyond_max_pending():
+    """Calls beyond max_pending are rejected instead of queued"""
+    release = threading.Event()
+
+    async def scenario():
+        executor = InferenceExecutor(max_workers=1, max_pending=2, timeout_seconds=5)
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(InferenceRejected):
+            await executor.run(release.wait)
+        release.set()
+        await asyncio.gather(*running)
+        stats = executor.stats()
+        executor.shutdown()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["pending"] == 0
+
+def test_times_out_slow_calls():
+    """A call exceeding the timeout raises TimeoutError in the caller"""
+    release = threading.Event()
+
+    async def scenario():
+        executor = InferenceExecutor(max_workers=1, timeout_seconds=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run(release.wait)
+        release.set()
+        stats = executor.stats()
+        executor.shutdown()
+        return stats
+
+    assert asyncio.run(scenario())["timeouts"] == 1
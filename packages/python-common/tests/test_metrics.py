@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sanara_common import profiling
+from sanara_common.metrics import MetricFamily, MetricsMiddleware, MetricsRegistry, REQUEST_DURATION, STAGE_DURATION, timed_stage
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("batch_size", "Items per batch", ("model",), buckets=(1, 4, 16))
+    for size in (1, 3, 4, 20):
+        histogram.observe(size, model="ner")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE batch_size histogram" in lines
+    assert 'batch_size_bucket{model="ner",le="1"} 1' in lines
+    assert 'batch_size_bucket{model="ner",le="4"} 3' in lines
+    assert 'batch_size_bucket{model="ner",le="16"} 3' in lines
+    assert 'batch_size_bucket{model="ner",le="+Inf"} 4' in lines
+    assert 'batch_size_sum{model="ner"} 28' in lines
+    assert 'batch_size_count{model="ner"} 4' in lines
+
+def test_metrics_reject_unexpected_labels_and_conflicting_registrations():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests", ("route",))
+    with pytest.raises(ValueError):
+        counter.inc(status="200")
+    assert registry.counter("requests_total", "Requests", ("route",)) is counter
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests", ("route",))
+
+def test_failing_collector_does_not_hide_other_metrics():
+    registry = MetricsRegistry()
+    registry.counter("ok_total", "Counted").inc()
+
+    def broken():
+        raise RuntimeError("stats unavailable")
+
+    registry.register_collector(broken)
+    registry.register_collector(lambda: [MetricFamily("depth", "gauge", "Depth").add(3, queue='say "hi"')])
+    text = registry.render()
+    assert "ok_total 1" in text
+    assert 'depth{queue="say \\"hi\\""} 3' in text
+
+def test_timed_stage_records_failures():
+    before = STAGE_DURATION.count(graph="test", stage="parse", status="failed")
+    with timed_stage("test", "parse"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timed_stage("test", "parse"):
+            raise RuntimeError("boom")
+    assert STAGE_DURATION.count(graph="test", stage="parse", status="ok") >= 1
+    assert STAGE_DURATION.count(graph="test", stage="parse", status="failed") == before + 1
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    before = REQUEST_DURATION.count(method="GET", route="/items/{item_id}", status="200")
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+    assert REQUEST_DURATION.count(method="GET", route="/items/{item_id}", status="200") == before + 2
+    assert REQUEST_DURATION.count(method="GET", route="unmatched", status="404") >= 1
+
+def test_sampling_profile_sees_other_threads_and_runs_one_at_a_time():
+    stop = threading.Event()
+
+    def busy_inference():
+        while not stop.is_set():
+            time.sleep(0.001)
+
+    worker = threading.Thread(target=busy_inference, name="inference-test")
+    worker.start()
+
+    async def scenario():
+        first = asyncio.create_task(profiling.capture_profile("sample", 0.2, interval_ms=2))
+        await asyncio.sleep(0.05)
+        with pytest.raises(profiling.ProfilerBusy):
+            await profiling.capture_profile("tracemalloc", 0.1)
+        return await first
+
+    try:
+        report = asyncio.run(scenario())
+    finally:
+        stop.set()
+        worker.join()
+    assert any(line.startswith("inference-test;") and "busy_inference" in line for line in report.splitlines())
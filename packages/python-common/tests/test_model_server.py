@@ -0,0 +1,97 @@
+import asyncio
+import numpy as np
+import pytest
+from sanara_common.inference_executor import InferenceRejected
+from sanara_common.model_server import (
+    ERROR_KINDS,
+    REQUEST,
+    FrameServer,
+    ModelServerClient,
+    ModelServerError,
+    ModelServerUnavailable,
+    encode_frame,
+    error_payload,
+    raise_error,
+    read_frame,
+)
+
+class Busy(Exception):
+    pass
+
+class EchoServer(FrameServer):
+    """Answers ``echo`` with its payload and raises the error named by ``fail``"""
+
+    async def dispatch(self, payload):
+        if payload["op"] == "fail":
+            raise {"rejected": InferenceRejected("full"), "busy": Busy("busy")}.get(payload["error"], KeyError("bad"))
+        if payload["op"] == "sleep":
+            await asyncio.sleep(payload["seconds"])
+        return payload
+
+def test_frames_round_trip_numpy_values():
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(encode_frame(7, REQUEST, {"score": np.float32(0.25), "ids": np.arange(3)}))
+        return await read_frame(reader)
+
+    assert asyncio.run(scenario()) == (7, REQUEST, {"score": 0.25, "ids": [0, 1, 2]})
+
+def test_oversized_frames_are_refused_on_both_ends():
+    with pytest.raises(ValueError):
+        encode_frame(1, REQUEST, {"text": "x" * 64}, max_bytes=32)
+
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(encode_frame(1, REQUEST, {"text": "x" * 64}))
+        return await read_frame(reader, max_bytes=32)
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
+
+def test_errors_keep_their_type_across_the_socket():
+    kinds = {**ERROR_KINDS, "busy": Busy}
+    with pytest.raises(InferenceRejected, match="full"):
+        raise_error(error_payload(InferenceRejected("full")))
+    with pytest.raises(Busy):
+        raise_error(error_payload(Busy("busy"), kinds), kinds)
+    # Without the extra kind on both ends the error is reported generically
+    with pytest.raises(ModelServerError):
+        raise_error(error_payload(Busy("busy")), kinds)
+
+def test_client_matches_concurrent_responses_to_their_requests(tmp_path):
+    async def scenario():
+        server = EchoServer(str(tmp_path / "echo.sock"))
+        await server.start()
+        client = ModelServerClient(server.path)
+        try:
+            slow = asyncio.ensure_future(client.call("sleep", seconds=0.05, tag="slow"))
+            fast = await client.call("echo", tag="fast")
+            with pytest.raises(InferenceRejected):
+                await client.call("fail", error="rejected")
+            with pytest.raises(ModelServerError):
+                await client.call("fail", error="other")
+            return fast, await slow, server.server_stats(), client.stats()
+        finally:
+            await client.close()
+            await server.close()
+
+    fast, slow, server_stats, client_stats = asyncio.run(scenario())
+    assert fast["tag"] == "fast" and slow["tag"] == "slow"
+    assert server_stats["requests"] == 4 and server_stats["errors"] == 2
+    assert client_stats["connections_opened"] == 1 and client_stats["in_flight"] == 0
+
+def test_closed_server_fails_calls_in_flight_and_missing_server_is_unavailable(tmp_path):
+    async def scenario():
+        server = EchoServer(str(tmp_path / "echo.sock"))
+        await server.start()
+        client = ModelServerClient(server.path)
+        waiting = asyncio.ensure_future(client.call("sleep", seconds=5))
+        await asyncio.sleep(0.05)
+        await server.close()
+        with pytest.raises(ModelServerUnavailable):
+            await waiting
+        with pytest.raises(ModelServerUnavailable):
+            await client.call("echo")
+        await client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Type
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, ValidationError
+from sanara_common.inference_executor import InferenceRejected
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "256"))
+# Itens por chamada ao pipeline; cada chamada respeita o timeout do executor
+BATCH_INFERENCE_SIZE = int(os.getenv("BATCH_INFERENCE_SIZE", "16"))
+# Corpo NDJSON acima disso vai para disco enquanto é processado
+BATCH_STREAM_SPOOL_BYTES = int(os.getenv("BATCH_STREAM_SPOOL_BYTES", str(1024 * 1024)))
+
+# Recebe entradas já validadas e devolve uma resposta por entrada, na mesma ordem
+BatchHandler = Callable[[List[Any]], Awaitable[List[BaseModel]]]
+
+class BatchRequest(BaseModel):
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class BatchItemResult(BaseModel):
+    index: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[Dict[str, Any]] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
+def _error(status_code: int, detail: Any) -> Dict[str, Any]:
+    return {"status_code": status_code, "detail": detail}
+
+async def _run_isolated(handler: BatchHandler, inputs: List[Any]) -> List[Any]:
+    """
+    Executa `handler` sobre todo o lote e, se ele falhar, item a item.
+
+    Falhas de admissão ou timeout valem para o lote inteiro e são propagadas;
+    qualquer outro erro é atribuído apenas aos itens que o provocam.
+    """
+    try:
+        return await handler(inputs)
+    except (InferenceRejected, asyncio.TimeoutError):
+        raise
+    except Exception as e:
+        if len(inputs) == 1:
+            return [e]
+        logger.warning("Batch of %d items failed (%s), retrying item by item", len(inputs), e)
+    outcomes: List[Any] = []
+    for item in inputs:
+        try:
+            outcomes.extend(await handler([item]))
+        except (InferenceRejected, asyncio.TimeoutError):
+            raise
+        except Exception as e:
+            outcomes.append(e)
+    return outcomes
+
+async def run_batch(
+    raw_items: List[Any],
+    parse: Callable[[Any], BaseModel],
+    handler: BatchHandler,
+    offset: int = 0
+) -> List[BatchItemResult]:
+    """Valida e processa `raw_items`, retornando um resultado por item, em ordem"""
+    results: List[Optional[BatchItemResult]] = [None] * len(raw_items)
+    valid = []
+    for position, raw in enumerate(raw_items):
+        try:
+            valid.append((position, parse(raw)))
+        except ValidationError as e:
+            detail = e.errors(include_url=False, include_context=False, include_input=False)
+            results[position] = BatchItemResult(index=offset + position, error=_error(422, detail))
+
+    for start in range(0, len(valid), BATCH_INFERENCE_SIZE):
+        chunk = valid[start:start + BATCH_INFERENCE_SIZE]
+        outcomes = await _run_isolated(handler, [item for _, item in chunk])
+        for (position, _), outcome in zip(chunk, outcomes):
+            if isinstance(outcome, Exception):
+                item_result = BatchItemResult(index=offset + position, error=_error(500, str(outcome)))
+            else:
+                item_result = BatchItemResult(index=offset + position, result=jsonable_encoder(outcome))
+            results[position] = item_result
+    return results
+
+def batch_response(results: List[BatchItemResult]) -> BatchResponse:
+    failed = sum(1 for r in results if r.error is not None)
+    return BatchResponse(results=results, succeeded=len(results) - failed, failed=failed)
+
+async def spool_request_body(request: Request) -> tempfile.SpooledTemporaryFile:
+    """
+    Copia o corpo da requisição para um arquivo temporário.
+
+    Só uma parte limitada fica em memória; o restante vai para disco, então
+    jobs grandes não crescem o processo. O corpo precisa ser lido inteiro
+    antes da resposta começar, porque o Starlette consome o canal de entrada
+    para detectar desconexões durante um StreamingResponse.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=BATCH_STREAM_SPOOL_BYTES, mode="w+b")
+    async for chunk in request.stream():
+        # Passado o limite a escrita vai para disco, então sai do event loop
+        await asyncio.to_thread(spool.write, chunk)
+    spool.seek(0)
+    return spool
+
+def _read_lines(spool: tempfile.SpooledTemporaryFile, count: int) -> List[bytes]:
+    """Até `count` linhas não vazias do spool; lista vazia no fim do arquivo"""
+    lines: List[bytes] = []
+    while len(lines) < count:
+        line = spool.readline()
+        if not line:
+            break
+        if line.strip():
+            lines.append(line)
+    return lines
+
+async def stream_batch(
+    spool: tempfile.SpooledTemporaryFile,
+    model: Type[BaseModel],
+    handler: BatchHandler
+) -> AsyncIterator[str]:
+    """Processa um corpo NDJSON em blocos, emitindo uma linha de resultado por linha de entrada"""
+    offset = 0
+    try:
+        while True:
+            # O spool pode estar em disco: a leitura bloqueante roda numa thread
+            lines = await asyncio.to_thread(_read_lines, spool, BATCH_INFERENCE_SIZE)
+            if not lines:
+                break
+            try:
+                results = await run_batch(lines, model.model_validate_json, handler, offset)
+            except (InferenceRejected, asyncio.TimeoutError) as e:
+                # Sem capacidade para seguir: os itens restantes ficam sem resposta
+                if isinstance(e, InferenceRejected):
+                    error = _error(503, str(e))
+                else:
+                    error = _error(504, "Tempo limite de inferência excedido")
+                yield json.dumps({"index": offset, "error": error, "aborted": True}) + "\n"
+                return
+            for result in results:
+                yield result.model_dump_json() + "\n"
+            offset += len(lines)
+    finally:
+        spool.close()
@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from sanara_common import metrics
+
+from engines import engine_from_env, load_model
+
+if TYPE_CHECKING:
+    import torch
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class ConditionCatalogue:
+    """Conjunto versionado de condições candidatas"""
+    version: str
+    labels: Tuple[str, ...]
+    hypothesis_template: str = "This example is {}."
+    # Texto usado pelo pré-filtro por similaridade (descrição ou o próprio nome)
+    descriptions: Tuple[str, ...] = ()
+
+    @classmethod
+    def load(cls, path: str) -> "ConditionCatalogue":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        labels = data["labels"]
+        if not labels:
+            raise ValueError(f"Catálogo de condições vazio: {path}")
+        return cls(
+            version=str(data["version"]),
+            labels=tuple(label["name"] for label in labels),
+            hypothesis_template=data.get("hypothesis_template", cls.hypothesis_template),
+            descriptions=tuple(label.get("description") or label["name"] for label in labels)
+        )
+
+    def hypotheses(self) -> List[str]:
+        return [self.hypothesis_template.format(label) for label in self.labels]
+
+class LabelPrefilter:
+    """
+    Pré-filtro por similaridade de embeddings entre o texto e cada condição.
+
+    Os embeddings das condições são calculados uma vez; por requisição só o
+    texto passa pelo encoder (pequeno), e apenas as `top_k` condições mais
+    próximas seguem para o NLI.
+    """
+
+    def __init__(self, tokenizer: Any, model: Any, catalogue: ConditionCatalogue, top_k: int):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.top_k = top_k
+        self.label_embeddings = self.embed(list(catalogue.descriptions))
+
+    def embed(self, texts: List[str]) -> "torch.Tensor":
+        import torch
+
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=256, return_tensors="pt")
+        encoded = encoded.to(self.model.device)
+        with torch.inference_mode():
+            hidden = self.model(**encoded).last_hidden_state
+        # Mean pooling sobre os tokens reais, normalizado para similaridade de cosseno
+        mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        return torch.nn.functional.normalize(pooled, dim=-1)
+
+    def select(self, texts: List[str]) -> List[List[int]]:
+        """Índices das `top_k` condições mais próximas de cada texto"""
+        similarity = self.embed(texts) @ self.label_embeddings.T
+        k = min(self.top_k, similarity.shape[1])
+        return similarity.topk(k, dim=1).indices.tolist()
+
+class ConditionClassifier:
+    """
+    Classificador zero-shot (NLI) de condições de saúde.
+
+    Equivale ao pipeline `zero-shot-classification` com `multi_label=True`,
+    mas as hipóteses do catálogo são tokenizadas uma única vez e todos os
+    pares texto/condição de uma ou várias requisições vão para o modelo em um
+    único forward (em lotes de até `max_pairs_per_batch` pares).
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any,
+        model: Any,
+        catalogue: ConditionCatalogue,
+        prefilter: Optional[LabelPrefilter] = None,
+        max_pairs_per_batch: int = 64
+    ):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.catalogue = catalogue
+        self.prefilter = prefilter
+        self.max_pairs_per_batch = max_pairs_per_batch
+        self.max_length = min(tokenizer.model_max_length, 1024)
+        self.entailment_id, self.contradiction_id = self._nli_label_ids(model.config.label2id)
+        # Hipóteses tokenizadas uma vez, sem tokens especiais (adicionados ao montar cada par)
+        self.hypothesis_ids = tokenizer(catalogue.hypotheses(), add_special_tokens=False)["input_ids"]
+
+    @staticmethod
+    def _nli_label_ids(label2id: Dict[str, int]) -> Tuple[int, int]:
+        entailment = contradiction = None
+        for label, index in label2id.items():
+            if label.lower().startswith("entail"):
+                entailment = index
+            elif label.lower().startswith("contra"):
+                contradiction = index
+        if entailment is None or contradiction is None:
+            raise ValueError(f"O modelo não expõe rótulos NLI de entailment/contradiction: {label2id}")
+        return entailment, contradiction
+
+    def _pair(self, premise_ids: List[int], hypothesis_ids: List[int]) -> Dict[str, List[int]]:
+        # Trunca só a premissa, como o pipeline (truncation="only_first")
+        budget = self.max_length - len(hypothesis_ids) - self.tokenizer.num_special_tokens_to_add(pair=True)
+        premise_ids = premise_ids[:max(budget, 0)]
+        pair = {"input_ids": self.tokenizer.build_inputs_with_special_tokens(premise_ids, hypothesis_ids)}
+        # Modelos tipo BERT distinguem premissa e hipótese pelos token_type_ids
+        if "token_type_ids" in self.tokenizer.model_input_names:
+            pair["token_type_ids"] = self.tokenizer.create_token_type_ids_from_sequences(premise_ids, hypothesis_ids)
+        return pair
+
+    def _entailment_scores(self, pairs: List[Dict[str, List[int]]]) -> List[float]:
+        import torch
+
+        scores = [0.0] * len(pairs)
+        # Pares de comprimento parecido no mesmo lote reduzem o padding
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i]["input_ids"]))
+        for start in range(0, len(order), self.max_pairs_per_batch):
+            chunk = order[start:start + self.max_pairs_per_batch]
+            batch = self.tokenizer.pad([pairs[i] for i in chunk], return_tensors="pt").to(self.model.device)
+            with torch.inference_mode():
+                logits = self.model(**batch).logits
+            # multi_label: softmax entre contradiction e entailment de cada par
+            probabilities = logits[:, [self.contradiction_id, self.entailment_id]].softmax(dim=-1)[:, 1]
+            for i, probability in zip(chunk, probabilities.tolist()):
+                scores[i] = probability
+        return scores
+
+    def classify(self, texts: Sequence[str]) -> List[List[Dict[str, Any]]]:
+        """
+        Classifica `texts` contra o catálogo.
+
+        Retorna, para cada texto, as condições avaliadas com sua probabilidade,
+        em ordem decrescente. Com pré-filtro, só as `top_k` condições mais
+        próximas de cada texto são avaliadas.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        premise_ids = self.tokenizer(texts, add_special_tokens=False, truncation=True, max_length=self.max_length)["input_ids"]
+        if self.prefilter is not None:
+            selected = self.prefilter.select(texts)
+        else:
+            selected = [list(range(len(self.catalogue.labels)))] * len(texts)
+
+        pairs = []
+        owners = []
+        for text_index, label_indices in enumerate(selected):
+            for label_index in label_indices:
+                pairs.append(self._pair(premise_ids[text_index], self.hypothesis_ids[label_index]))
+                owners.append((text_index, label_index))
+
+        results: List[List[Dict[str, Any]]] = [[] for _ in texts]
+        for (text_index, label_index), score in zip(owners, self._entailment_scores(pairs)):
+            results[text_index].append({"condition": self.catalogue.labels[label_index], "probability": score})
+        for conditions in results:
+            conditions.sort(key=lambda x: x["probability"], reverse=True)
+        return results
+
+class ConditionBatcher:
+    """
+    Agrupa requisições concorrentes em uma única chamada a `classify`.
+
+    O primeiro texto que chega abre uma janela de `max_wait_ms`; tudo o que
+    chegar nesse intervalo (até `max_batch_texts`) é classificado no mesmo
+    forward. `run` executa a chamada bloqueante fora do event loop.
+    """
+
+    def __init__(
+        self,
+        classifier: ConditionClassifier,
+        run: Callable[..., Awaitable[Any]],
+        max_batch_texts: int = 8,
+        max_wait_ms: float = 5.0
+    ):
+        self.classifier = classifier
+        self.run = run
+        self.max_batch_texts = max_batch_texts
+        self.max_wait_seconds = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # O event loop só guarda referências fracas às tasks: sem esta, um lote em
+        # andamento poderia ser coletado e quem o aguarda ficaria preso para sempre
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.texts = 0
+
+    async def classify(self, text: str) -> List[Dict[str, Any]]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_texts:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._classify_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """Classifica o que ainda está na janela e espera os lotes em andamento"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _classify_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.texts += len(batch)
+        metrics.BATCH_SIZE.observe(len(batch), model="conditions")
+        started = time.perf_counter()
+        try:
+            results = await self.run(self.classifier.classify, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            metrics.BATCH_DURATION.observe(time.perf_counter() - started, model="conditions")
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "catalogue_version": self.classifier.catalogue.version,
+            "labels": len(self.classifier.catalogue.labels),
+            "prefilter_top_k": self.classifier.prefilter.top_k if self.classifier.prefilter else None,
+            "batches": self.batches,
+            "texts": self.texts,
+            "pending": self.pending,
+            "average_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0
+        }
+
+def create_condition_classifier_from_env(device: int = -1) -> ConditionClassifier:
+    """Cria o classificador a partir das variáveis de ambiente"""
+    catalogue_path = os.getenv(
+        "CONDITION_CATALOGUE",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "conditions.json")
+    )
+    catalogue = ConditionCatalogue.load(catalogue_path)
+    model_name = os.getenv("CONDITION_NLI_MODEL", "facebook/bart-large-mnli")
+
+    prefilter = None
+    prefilter_model = os.getenv("CONDITION_PREFILTER_MODEL", "")
+    if prefilter_model:
+        prefilter = LabelPrefilter(
+            *load_model("feature-extraction", prefilter_model, engine_from_env("CONDITION_PREFILTER_ENGINE"), device),
+            catalogue,
+            top_k=int(os.getenv("CONDITION_PREFILTER_TOP_K", "5"))
+        )
+
+    classifier = ConditionClassifier(
+        *load_model("zero-shot-classification", model_name, engine_from_env("CONDITION_ENGINE"), device),
+        catalogue,
+        prefilter=prefilter,
+        max_pairs_per_batch=int(os.getenv("CONDITION_MAX_PAIRS_PER_BATCH", "64"))
+    )
+    logger.info(
+        "Condition classifier ready: catalogue v%s with %d labels%s",
+        catalogue.version,
+        len(catalogue.labels),
+        f", prefilter top-{prefilter.top_k}" if prefilter else ""
+    )
+    return classifier
@@ -0,0 +1,61 @@
+import os
+import sys
+from pathlib import Path
+from typing import Any, Optional, Tuple
+from sanara_common import inference_engine as shared
+from sanara_common.inference_engine import ENGINES, ONNX, ONNX_INT8, PYTORCH  # noqa: F401
+
+def resolve_engine(engine: Optional[str] = None) -> str:
+    """Engine pedida ou, se vazia, a padrão de INFERENCE_ENGINE"""
+    return shared.resolve_engine(engine, os.getenv("INFERENCE_ENGINE", PYTORCH))
+
+def import_runtime() -> None:
+    """
+    Importa torch e transformers de uma vez.
+
+    Os módulos preguiçosos do transformers não são thread-safe no primeiro
+    import; carregar vários modelos em paralelo sem isso falha com ImportError.
+    """
+    import torch  # noqa: F401
+    from transformers import AutoModel, AutoTokenizer, pipeline  # noqa: F401
+
+def engine_from_env(variable: str) -> str:
+    """Engine de um modelo específico (ex.: SENTIMENT_ENGINE), com fallback para a padrão"""
+    return resolve_engine(os.getenv(variable, ""))
+
+def _cache_dir() -> str:
+    return os.getenv("ONNX_CACHE_DIR", shared.DEFAULT_CACHE_DIR)
+
+def _intra_op_threads() -> int:
+    return int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+
+def onnx_model_dir(model: str, engine: str) -> Path:
+    return shared.onnx_model_dir(model, engine, _cache_dir())
+
+def export_onnx(task: str, model: str, engine: str) -> Path:
+    """
+    Exporta `model` para ONNX (e quantiza em int8 dinâmico para `onnx-int8`).
+
+    As exportações ficam em ONNX_CACHE_DIR e são reaproveitadas nas próximas
+    inicializações.
+    """
+    return shared.export_onnx(task, model, engine, _cache_dir())
+
+def load_model(task: str, model: str, engine: str, device: int = -1) -> Tuple[Any, Any]:
+    """
+    Carrega tokenizer e modelo de `task` na engine pedida.
+
+    Os modelos ONNX Runtime rodam sempre em CPU (onnxruntime sem CUDA); com
+    PyTorch o modelo vai para a GPU `device` quando ela existe. Arquiteturas
+    sem exportação ONNX para a tarefa (ex.: BART em classificação) continuam
+    em PyTorch.
+    """
+    return shared.load_model(task, model, engine, device, _cache_dir(), _intra_op_threads())
+
+def load_pipeline(task: str, model: str, engine: str, device: int = -1) -> Any:
+    """Pipeline do transformers com o modelo carregado pela engine pedida"""
+    return shared.load_pipeline(task, model, engine, device, _cache_dir(), _intra_op_threads())
+
+if __name__ == "__main__":
+    # Mesmo relatório de paridade do services/ai (acordo, divergência de score, latência e memória)
+    sys.exit(shared.main(cache_dir=_cache_dir(), intra_op_threads=_intra_op_threads()))
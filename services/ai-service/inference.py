@@ -0,0 +1,11 @@
+import os
+
+from sanara_common.inference_executor import InferenceExecutor
+
+def create_executor_from_env() -> InferenceExecutor:
+    """Cria o executor a partir das variáveis de ambiente"""
+    return InferenceExecutor(
+        max_workers=int(os.getenv("INFERENCE_THREADS", "4")),
+        max_pending=int(os.getenv("INFERENCE_MAX_PENDING", "64")),
+        timeout_seconds=float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "30"))
+    )
@@ -0,0 +1,151 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# "json" (uma linha por registro) ou "text"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fração dos logs de debug de caminhos quentes que é mantida
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+# Id da requisição em atendimento, anexado a todo registro emitido durante ela
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Atributos de todo LogRecord; o resto veio de `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha; campos de `extra` viram chaves de primeiro nível"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class RequestIdFilter(logging.Filter):
+    """Marca o registro com o id da requisição ainda na thread que logou"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Entrega o registro à thread de escrita sem formatá-lo.
+
+    O QueueHandler padrão formata a mensagem na thread que chamou o log; como
+    a fila não sai do processo, a formatação fica para o listener. Com a fila
+    cheia o registro é descartado e contado, sem bloquear a requisição.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+def configure_logging() -> None:
+    """Logger raiz -> fila limitada -> thread em segundo plano escrevendo no stdout"""
+    global _handler, _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _handler.addFilter(RequestIdFilter())
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)
+    # Threads não sobrevivem ao fork dos workers (serve.py): cada filho ganha o seu listener
+    os.register_at_fork(after_in_child=_restart_listener)
+
+def _stop_listener() -> None:
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+def _restart_listener() -> None:
+    global _listener
+    _handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _listener = QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+def sampled(rate: Optional[float] = None) -> bool:
+    """Sorteia se um log de debug de caminho quente deve ser emitido"""
+    rate = LOG_DEBUG_SAMPLE_RATE if rate is None else rate
+    return rate >= 1.0 or random.random() < rate
+
+def logging_stats() -> Dict[str, int]:
+    if _handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
+
+class RequestIdMiddleware:
+    """
+    Middleware ASGI: usa o X-Request-ID recebido (ou gera um), associa-o aos
+    logs da requisição e o devolve na resposta.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).append((b"x-request-id", request_id.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
@@ -1,29 +1,146 @@
-from fastapi import FastAPI, HTTPException, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
-import uvicorn
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-from sklearn.feature_extraction.text import TfidfVectorizer
-import numpy as np
-import torch
+from typing import Any, List, Optional, Dict
+import asyncio
 from datetime import datetime
+import hmac
 import logging
-import json
+import os
+import sys
+from sanara_common import metrics
+from sanara_common.inference_executor import InferenceRejected
+from sanara_common.profiling import PROFILE_MODES, ProfilerBusy, capture_profile
+import logs
+# torch e transformers só são importados pelos loaders, durante o lifespan
+from inference import create_executor_from_env
+from batch import BatchRequest, BatchResponse, batch_response, run_batch, spool_request_body, stream_batch
+from engines import engine_from_env, import_runtime, load_pipeline
+from condition_classifier import ConditionBatcher, create_condition_classifier_from_env
+from startup import ModelLoader, ModelNotReady
+from model_server import MODEL_SERVER_SOCKET, ModelServerClient
+import serve
 
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logging estruturado em JSON, escrito por uma thread em segundo plano
+logs.configure_logging()
 logger = logging.getLogger(__name__)
 
+# Token dos endpoints /admin; vazio, eles não existem
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# Executor dedicado: a inferência roda fora do event loop, mantendo /health responsivo
+inference_executor = create_executor_from_env()
+
+def inference_device() -> int:
+    import torch
+    return 0 if torch.cuda.is_available() else -1
+
+# Modelos carregados e aquecidos em paralelo no lifespan
+model_loader = ModelLoader(max_workers=int(os.getenv("MODEL_LOAD_WORKERS", "3")), prepare=import_runtime)
+# Engine (pytorch, onnx ou onnx-int8) escolhida por modelo
+model_loader.register(
+    "sentiment",
+    lambda: load_pipeline(
+        "sentiment-analysis",
+        os.getenv("SENTIMENT_MODEL", "nlptown/bert-base-multilingual-uncased-sentiment"),
+        engine_from_env("SENTIMENT_ENGINE"),
+        device=inference_device()
+    ),
+    lambda pipe: pipe("Aquecimento do modelo")
+)
+model_loader.register(
+    "text_classifier",
+    lambda: load_pipeline(
+        "text-classification",
+        os.getenv("TEXT_CLASSIFIER_MODEL", "bert-base-multilingual-uncased"),
+        engine_from_env("TEXT_CLASSIFIER_ENGINE"),
+        device=inference_device()
+    ),
+    lambda pipe: pipe("Aquecimento do modelo")
+)
+# Hipóteses do catálogo de condições pré-tokenizadas, pares em lote
+model_loader.register(
+    "conditions",
+    lambda: create_condition_classifier_from_env(device=inference_device()),
+    lambda classifier: classifier.classify(["Symptoms: febre"])
+)
+
+# modelo -> inferência em lote, usada no próprio worker e pelo servidor de modelos
+MODEL_CALLS = {
+    "sentiment": lambda pipe, texts: pipe(texts, batch_size=len(texts)),
+    "text_classifier": lambda pipe, texts: pipe(texts, batch_size=len(texts)),
+    "conditions": lambda classifier, texts: classifier.classify(texts)
+}
+
+# Com MODEL_SERVER_SOCKET, os modelos ficam em model_server.py e este worker só encaminha
+model_client: Optional[ModelServerClient] = (
+    ModelServerClient(MODEL_SERVER_SOCKET, float(os.getenv("MODEL_SERVER_TIMEOUT_SECONDS", "30")))
+    if MODEL_SERVER_SOCKET else None
+)
+
+# Requisições de /analyze/health que chegam juntas dividem o mesmo forward
+condition_batcher: Optional[ConditionBatcher] = None
+
+def get_condition_batcher() -> ConditionBatcher:
+    global condition_batcher
+    if condition_batcher is None:
+        condition_batcher = ConditionBatcher(
+            model_loader.get("conditions"),
+            inference_executor.run,
+            max_batch_texts=int(os.getenv("CONDITION_MAX_BATCH_TEXTS", "8")),
+            max_wait_ms=float(os.getenv("CONDITION_BATCH_WAIT_MS", "5"))
+        )
+    return condition_batcher
+
+async def predict(name: str, texts: List[str]) -> List[Any]:
+    """Inferência de `name` em `texts`, no worker ou no servidor de modelos"""
+    with metrics.timed_stage("predict", name):
+        if model_client is not None:
+            return await model_client.infer(name, texts)
+        metrics.BATCH_SIZE.observe(len(texts), model=name)
+        return await inference_executor.run(MODEL_CALLS[name], model_loader.get(name), texts)
+
+def ensure_ready(name: str) -> None:
+    """Falha com ModelNotReady se o modelo local ainda não estiver pronto"""
+    # No modo cliente, quem responde pela prontidão é o servidor de modelos
+    if model_client is None:
+        model_loader.get(name)
+
+def catalogue_version() -> str:
+    if model_client is not None:
+        return model_client.server_info.get("catalogue_version", "")
+    return model_loader.get("conditions").catalogue.version
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if model_client is not None:
+        yield
+        await model_client.close()
+        return
+    # A carga roda em segundo plano: /live responde logo, /ready só após o aquecimento
+    loading = asyncio.create_task(model_loader.load_all())
+    yield
+    loading.cancel()
+    if condition_batcher is not None:
+        await condition_batcher.close()
+    inference_executor.shutdown()
+
 app = FastAPI(
     title="Healthcare AI Service API",
     description="API para serviços avançados de Inteligência Artificial em saúde",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# X-Request-ID em todos os logs da requisição
+app.add_middleware(logs.RequestIdMiddleware)
+
+# Por último, o mais externo: a latência medida inclui os outros middlewares
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Configuração CORS
 app.add_middleware(
     CORSMiddleware,
@@ -56,37 +173,20 @@ class TextClassificationResponse(BaseModel):
     timestamp: datetime
 
 class HealthAnalysisResponse(BaseModel):
-    possible_conditions: List[Dict[str, float]]
+    possible_conditions: List[Dict[str, Any]]
     risk_level: str
     recommendations: List[str]
     confidence_score: float
+    catalogue_version: str
     timestamp: datetime
 
-# Inicialização dos modelos
-class AIModels:
-    def __init__(self):
-        self.sentiment_analyzer = pipeline(
-            "sentiment-analysis",
-            model="nlptown/bert-base-multilingual-uncased-sentiment",
-            device=0 if torch.cuda.is_available() else -1
-        )
-        
-        self.text_classifier = pipeline(
-            "text-classification",
-            model="bert-base-multilingual-uncased",
-            device=0 if torch.cuda.is_available() else -1
-        )
-        
-        self.health_classifier = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli",
-            device=0 if torch.cuda.is_available() else -1
-        )
-
-        logger.info("AI models initialized successfully")
-
-# Instância global dos modelos
-ai_models = AIModels()
+def inference_error(e: Exception) -> HTTPException:
+    """Converte falhas do executor de inferência em respostas HTTP"""
+    if isinstance(e, (InferenceRejected, ModelNotReady)):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    if isinstance(e, asyncio.TimeoutError):
+        return HTTPException(status_code=504, detail="Tempo limite de inferência excedido")
+    return HTTPException(status_code=500, detail=str(e))
 
 # Dependency para rate limiting
 async def check_rate_limit():
@@ -102,24 +202,63 @@ async def root():
         "models_loaded": ["sentiment_analysis", "text_classification", "health_classification"]
     }
 
+def sentiment_response(result: Dict[str, Any], input_data: TextInput) -> SentimentResponse:
+    return SentimentResponse(
+        sentiment=result["label"],
+        score=float(result["score"]),
+        timestamp=datetime.now(),
+        language=input_data.language
+    )
+
+def classification_response(result: Dict[str, Any]) -> TextClassificationResponse:
+    return TextClassificationResponse(
+        label=result["label"],
+        score=float(result["score"]),
+        timestamp=datetime.now()
+    )
+
+def health_text(input_data: HealthAnalysisInput) -> str:
+    """Monta o texto analisado a partir dos sintomas e do histórico"""
+    symptoms_text = ", ".join(input_data.symptoms)
+    full_text = f"Symptoms: {symptoms_text}"
+    if input_data.patient_history:
+        full_text += f"\nHistory: {input_data.patient_history}"
+    return full_text
+
+def health_response(conditions: List[Dict[str, Any]]) -> HealthAnalysisResponse:
+    # Determinar nível de risco
+    max_prob = conditions[0]["probability"]
+    risk_level = "alto" if max_prob > 0.8 else "médio" if max_prob > 0.5 else "baixo"
+    
+    # Gerar recomendações básicas
+    recommendations = [
+        "Procure um médico para uma avaliação adequada",
+        "Mantenha-se hidratado",
+        "Descanse adequadamente",
+        "Monitore seus sintomas"
+    ]
+    
+    return HealthAnalysisResponse(
+        possible_conditions=conditions[:3],  # Top 3 condições mais prováveis
+        risk_level=risk_level,
+        recommendations=recommendations,
+        confidence_score=float(max_prob),
+        catalogue_version=catalogue_version(),
+        timestamp=datetime.now()
+    )
+
 @app.post("/analyze/sentiment", response_model=SentimentResponse)
 async def analyze_sentiment(
     input_data: TextInput,
     rate_limit: None = Depends(check_rate_limit)
 ):
     try:
-        logger.info(f"Processing sentiment analysis for text in {input_data.language}")
-        result = ai_models.sentiment_analyzer(input_data.text)[0]
-        
-        return SentimentResponse(
-            sentiment=result["label"],
-            score=float(result["score"]),
-            timestamp=datetime.now(),
-            language=input_data.language
-        )
+        logger.info("Processing sentiment analysis for text in %s", input_data.language)
+        result = (await predict("sentiment", [input_data.text]))[0]
+        return sentiment_response(result, input_data)
     except Exception as e:
-        logger.error(f"Error in sentiment analysis: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error("Error in sentiment analysis: %s", e)
+        raise inference_error(e)
 
 @app.post("/classify/text", response_model=TextClassificationResponse)
 async def classify_text(
@@ -127,17 +266,12 @@ async def classify_text(
     rate_limit: None = Depends(check_rate_limit)
 ):
     try:
-        logger.info(f"Processing text classification for text in {input_data.language}")
-        result = ai_models.text_classifier(input_data.text)[0]
-        
-        return TextClassificationResponse(
-            label=result["label"],
-            score=float(result["score"]),
-            timestamp=datetime.now()
-        )
+        logger.info("Processing text classification for text in %s", input_data.language)
+        result = (await predict("text_classifier", [input_data.text]))[0]
+        return classification_response(result)
     except Exception as e:
-        logger.error(f"Error in text classification: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error("Error in text classification: %s", e)
+        raise inference_error(e)
 
 @app.post("/analyze/health", response_model=HealthAnalysisResponse)
 async def analyze_health_condition(
@@ -146,78 +280,195 @@ async def analyze_health_condition(
 ):
     try:
         logger.info("Processing health condition analysis")
-        
-        # Preparar o texto para análise
-        symptoms_text = ", ".join(input_data.symptoms)
-        full_text = f"Symptoms: {symptoms_text}"
-        if input_data.patient_history:
-            full_text += f"\nHistory: {input_data.patient_history}"
-        
-        # Lista de possíveis condições médicas para classificação
-        candidate_conditions = [
-            "Gripe",
-            "Resfriado",
-            "COVID-19",
-            "Alergia",
-            "Sinusite",
-            "Bronquite",
-            "Ansiedade",
-            "Estresse",
-            "Depressão",
-            "Enxaqueca"
-        ]
-        
-        # Classificar o texto contra as possíveis condições
-        result = ai_models.health_classifier(
-            full_text,
-            candidate_conditions,
-            multi_label=True
-        )
-        
-        # Organizar resultados
-        conditions = [
-            {"condition": label, "probability": score}
-            for label, score in zip(result["labels"], result["scores"])
-        ]
-        conditions.sort(key=lambda x: x["probability"], reverse=True)
-        
-        # Determinar nível de risco
-        max_prob = max(result["scores"])
-        risk_level = "alto" if max_prob > 0.8 else "médio" if max_prob > 0.5 else "baixo"
-        
-        # Gerar recomendações básicas
-        recommendations = [
-            "Procure um médico para uma avaliação adequada",
-            "Mantenha-se hidratado",
-            "Descanse adequadamente",
-            "Monitore seus sintomas"
-        ]
-        
-        return HealthAnalysisResponse(
-            possible_conditions=conditions[:3],  # Top 3 condições mais prováveis
-            risk_level=risk_level,
-            recommendations=recommendations,
-            confidence_score=float(max_prob),
-            timestamp=datetime.now()
-        )
+        # Classificar o texto contra o catálogo de condições
+        if model_client is not None:
+            # O servidor de modelos já agrupa as chamadas de todos os workers
+            conditions = (await predict("conditions", [health_text(input_data)]))[0]
+        else:
+            with metrics.timed_stage("predict", "conditions"):
+                conditions = await get_condition_batcher().classify(health_text(input_data))
+        return health_response(conditions)
     except Exception as e:
-        logger.error(f"Error in health condition analysis: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error("Error in health condition analysis: %s", e)
+        raise inference_error(e)
+
+# Handlers de lote: uma chamada ao pipeline para várias entradas já validadas
+async def sentiment_batch(inputs: List[TextInput]) -> List[SentimentResponse]:
+    results = await predict("sentiment", [i.text for i in inputs])
+    return [sentiment_response(r, i) for r, i in zip(results, inputs)]
+
+async def classification_batch(inputs: List[TextInput]) -> List[TextClassificationResponse]:
+    results = await predict("text_classifier", [i.text for i in inputs])
+    return [classification_response(r) for r in results]
+
+async def health_batch(inputs: List[HealthAnalysisInput]) -> List[HealthAnalysisResponse]:
+    results = await predict("conditions", [health_text(i) for i in inputs])
+    return [health_response(conditions) for conditions in results]
+
+# tarefa -> (entrada, handler, modelo usado)
+BATCH_TASKS = {
+    "sentiment": (TextInput, sentiment_batch, "sentiment"),
+    "classification": (TextInput, classification_batch, "text_classifier"),
+    "health": (HealthAnalysisInput, health_batch, "conditions")
+}
+
+async def process_batch(task: str, batch: BatchRequest) -> BatchResponse:
+    model, handler, model_name = BATCH_TASKS[task]
+    try:
+        # Modelo fora do ar vale para o lote inteiro, não item a item
+        ensure_ready(model_name)
+        logger.info("Processing %s batch with %d items", task, len(batch.items))
+        return batch_response(await run_batch(batch.items, model.model_validate, handler))
+    except Exception as e:
+        logger.error("Error in %s batch: %s", task, e)
+        raise inference_error(e)
+
+async def process_batch_stream(task: str, request: Request) -> StreamingResponse:
+    model, handler, model_name = BATCH_TASKS[task]
+    try:
+        ensure_ready(model_name)
+    except ModelNotReady as e:
+        raise inference_error(e)
+    logger.info("Processing %s NDJSON batch stream", task)
+    spool = await spool_request_body(request)
+    return StreamingResponse(stream_batch(spool, model, handler), media_type="application/x-ndjson")
+
+@app.post("/analyze/sentiment/batch", response_model=BatchResponse)
+async def analyze_sentiment_batch(batch: BatchRequest, rate_limit: None = Depends(check_rate_limit)):
+    return await process_batch("sentiment", batch)
+
+@app.post("/classify/text/batch", response_model=BatchResponse)
+async def classify_text_batch(batch: BatchRequest, rate_limit: None = Depends(check_rate_limit)):
+    return await process_batch("classification", batch)
+
+@app.post("/analyze/health/batch", response_model=BatchResponse)
+async def analyze_health_batch(batch: BatchRequest, rate_limit: None = Depends(check_rate_limit)):
+    return await process_batch("health", batch)
+
+@app.post("/analyze/sentiment/batch/stream")
+async def analyze_sentiment_batch_stream(request: Request, rate_limit: None = Depends(check_rate_limit)):
+    return await process_batch_stream("sentiment", request)
+
+@app.post("/classify/text/batch/stream")
+async def classify_text_batch_stream(request: Request, rate_limit: None = Depends(check_rate_limit)):
+    return await process_batch_stream("classification", request)
+
+@app.post("/analyze/health/batch/stream")
+async def analyze_health_batch_stream(request: Request, rate_limit: None = Depends(check_rate_limit)):
+    return await process_batch_stream("health", request)
 
 @app.get("/health")
 async def health_check():
-    return {
+    torch = sys.modules.get("torch")
+    health = {
         "status": "healthy",
         "timestamp": datetime.now(),
-        "gpu_available": torch.cuda.is_available(),
-        "models_loaded": True
+        "gpu_available": torch.cuda.is_available() if torch else None,
+        "models_loaded": model_loader.ready,
+        "models": model_loader.stats()["models"],
+        "inference": inference_executor.stats(),
+        "memory": serve.memory_report(),
+        "conditions": condition_batcher.stats() if condition_batcher else None,
+        "logging": logs.logging_stats()
     }
+    if model_client is not None:
+        health["model_client"] = model_client.stats()
+        try:
+            health["model_server"] = await model_client.health()
+        except Exception as e:
+            health["model_server"] = {"status": "unreachable", "error": str(e)}
+        health["models_loaded"] = bool(health["model_server"].get("ready"))
+        health["models"] = health["model_server"].get("models", {})
+    return health
+
+def collect_service_metrics() -> List[metrics.MetricFamily]:
+    """Contadores e profundidades de fila que os componentes já mantêm"""
+    executor = inference_executor.stats()
+    log_queue = logs.logging_stats()
+    queue_depth = metrics.MetricFamily("queue_depth", "gauge", "Items waiting in an internal queue")
+    queue_depth.add(executor["pending"], queue="inference_executor")
+    queue_depth.add(log_queue["queued"], queue="log")
+    if condition_batcher is not None:
+        queue_depth.add(condition_batcher.pending, queue="batcher:conditions")
+    ready = metrics.MetricFamily("model_ready", "gauge", "1 when the model is loaded and warmed up")
+    for name, state in model_loader.stats()["models"].items():
+        ready.add(1 if state["status"] == "ready" else 0, model=name)
+    families = [
+        queue_depth,
+        ready,
+        metrics.MetricFamily("inference_rejected_total", "counter", "Inference calls rejected by admission control")
+            .add(executor["rejected"]),
+        metrics.MetricFamily("inference_timeouts_total", "counter", "Inference calls that timed out")
+            .add(executor["timeouts"]),
+        metrics.MetricFamily("log_records_dropped_total", "counter", "Log records dropped on a full log queue")
+            .add(log_queue["dropped"])
+    ]
+    if model_client is not None:
+        client = model_client.stats()
+        families.extend([
+            metrics.MetricFamily("model_server_requests_total", "counter", "Calls to the model server by outcome")
+                .add(client["requests"] - client["errors"], outcome="success")
+                .add(client["errors"], outcome="failure"),
+            metrics.MetricFamily("model_server_requests_in_flight", "gauge", "Calls awaiting the model server")
+                .add(client["in_flight"])
+        ])
+    return families
+
+metrics.registry.register_collector(collect_service_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Só com o X-Admin-Token configurado; sem token configurado, os endpoints /admin não existem"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Token de administração inválido")
+
+@app.post("/admin/profile", response_class=PlainTextResponse)
+async def profile(
+    mode: str = Query("sample", description=f"Um de: {', '.join(PROFILE_MODES)}"),
+    seconds: float = Query(10.0, gt=0),
+    limit: int = Query(50, ge=1, le=1000),
+    _: None = Depends(require_admin)
+):
+    """Perfila por `seconds` o worker que atende esta requisição e devolve o relatório"""
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode deve ser um de: {', '.join(PROFILE_MODES)}")
+    if seconds > PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds deve ser no máximo {PROFILE_MAX_SECONDS:g}")
+    logger.warning("Capturing a %s profile for %gs", mode, seconds)
+    try:
+        report = await capture_profile(mode, seconds, limit)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    # Vários workers atendem a mesma porta: o cabeçalho diz qual foi perfilado
+    return PlainTextResponse(report, headers={"X-Worker-PID": str(os.getpid()), "X-Profile-Mode": mode})
+
+@app.get("/live")
+async def liveness():
+    """O processo está de pé e o event loop responde, mesmo durante a carga dos modelos"""
+    return {"status": "alive", "timestamp": datetime.now()}
+
+@app.get("/ready")
+async def readiness():
+    """Pronto só quando todos os modelos carregaram e passaram pelo aquecimento"""
+    if model_client is not None:
+        # Modo cliente: pronto quando o servidor de modelos responde e está aquecido
+        try:
+            server = await model_client.health()
+        except Exception as e:
+            return JSONResponse(status_code=503, content={"status": "unreachable", "error": str(e)})
+        status_code = 200 if server.get("ready") else 503
+        return JSONResponse(status_code=status_code, content={"status": "ready" if server.get("ready") else "loading", "model_server": server})
+    stats = model_loader.stats()
+    if model_loader.ready:
+        return {"status": "ready", **stats}
+    status = "failed" if model_loader.failed else "loading"
+    return JSONResponse(status_code=503, content={"status": status, **stats})
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        workers=4
-    ) 
\ No newline at end of file
+    # Workers com modelos compartilhados; RELOAD=1 para desenvolvimento
+    serve.main() 
\ No newline at end of file
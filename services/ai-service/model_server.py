@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sanara_common import model_server as protocol
+from sanara_common.inference_executor import InferenceExecutor
+from sanara_common.model_server import DEFAULT_MAX_FRAME_BYTES, FrameServer, ModelServerError
+
+import logs
+from startup import ModelLoader, ModelNotReady
+
+logger = logging.getLogger(__name__)
+
+# Vazio: modelos no próprio worker HTTP; um caminho: workers viram clientes do servidor de modelos
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "")
+MAX_FRAME_BYTES = int(os.getenv("MODEL_SERVER_MAX_FRAME_BYTES", str(DEFAULT_MAX_FRAME_BYTES)))
+
+# Além dos erros do protocolo, "modelo carregando" atravessa o socket como ModelNotReady
+ERROR_KINDS = {**protocol.ERROR_KINDS, "not_ready": ModelNotReady}
+
+class CallBatcher:
+    """
+    Junta as chamadas de vários workers em um único forward por modelo.
+
+    Como o `ConditionBatcher`, a primeira chamada abre uma janela de
+    `max_wait_ms`; aqui cada chamada já traz uma lista de textos, e o lote é
+    despachado ao atingir `max_batch_texts` textos ou ao fim da janela.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[str]], List[Any]],
+        run: Callable[..., Awaitable[Any]],
+        max_batch_texts: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self.fn = fn
+        self.run = run
+        self.max_batch_texts = max_batch_texts
+        self.max_wait_seconds = max_wait_ms / 1000
+        self._pending: List[Tuple[List[str], asyncio.Future]] = []
+        self._pending_texts = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Lotes em andamento: o event loop só guarda referências fracas às tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.calls = 0
+        self.texts = 0
+
+    async def submit(self, texts: List[str]) -> List[Any]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((texts, future))
+        self._pending_texts += len(texts)
+        if self._pending_texts >= self.max_batch_texts:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_texts = self._pending, [], 0
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[List[str], asyncio.Future]]) -> None:
+        texts = [text for call_texts, _ in batch for text in call_texts]
+        self.batches += 1
+        self.calls += len(batch)
+        self.texts += len(texts)
+        try:
+            results = await self.run(self.fn, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # Roda a cada lote: amostrado para o nível debug não pesar sob carga
+        if logger.isEnabledFor(logging.DEBUG) and logs.sampled():
+            logger.debug("Batch of %d texts from %d calls", len(texts), len(batch))
+        offset = 0
+        for call_texts, future in batch:
+            if not future.done():
+                future.set_result(results[offset:offset + len(call_texts)])
+            offset += len(call_texts)
+
+    async def close(self) -> None:
+        """Despacha a janela aberta e espera os lotes em andamento"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "calls": self.calls,
+            "texts": self.texts,
+            "average_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0
+        }
+
+class ModelServer(FrameServer):
+    """
+    Processo dono dos modelos, atendendo os workers HTTP por um socket Unix.
+
+    Cada conexão pode ter várias requisições em andamento, identificadas pelo
+    id do quadro; as respostas voltam na ordem em que ficam prontas. Chamadas
+    de workers diferentes ao mesmo modelo são agrupadas pelo `CallBatcher`.
+    """
+
+    def __init__(
+        self,
+        loader: ModelLoader,
+        executor: InferenceExecutor,
+        path: str,
+        extra_info: Optional[Callable[[], Dict[str, Any]]] = None
+    ):
+        super().__init__(path, MAX_FRAME_BYTES, ERROR_KINDS)
+        self.loader = loader
+        self.executor = executor
+        # Informações do domínio para o handshake (ex.: versão do catálogo)
+        self.extra_info = extra_info
+        self.batchers: Dict[str, CallBatcher] = {}
+
+    def register(self, name: str, fn: Callable[[Any, List[str]], List[Any]], max_batch_texts: int, max_wait_ms: float) -> None:
+        """`fn(modelo, textos)` roda a inferência de `name` em lote"""
+        self.batchers[name] = CallBatcher(
+            lambda texts: fn(self.loader.get(name), texts),
+            self.executor.run,
+            max_batch_texts=max_batch_texts,
+            max_wait_ms=max_wait_ms
+        )
+
+    async def close(self) -> None:
+        await super().close()
+        for batcher in self.batchers.values():
+            await batcher.close()
+
+    async def dispatch(self, payload: Dict[str, Any]) -> Any:
+        op = payload.get("op")
+        if op == "infer":
+            batcher = self.batchers.get(payload.get("model"))
+            if batcher is None:
+                raise ModelServerError(f"Modelo desconhecido '{payload.get('model')}'")
+            # Modelo ainda carregando: falha na hora, sem ocupar o lote
+            self.loader.get(payload["model"])
+            return {"results": await batcher.submit(payload["items"])}
+        if op == "hello":
+            return self.info()
+        if op == "health":
+            return self.health()
+        raise ModelServerError(f"Operação desconhecida '{op}'")
+
+    def info(self) -> Dict[str, Any]:
+        info = {"pid": os.getpid(), "served_models": sorted(self.batchers), "ready": self.loader.ready}
+        if self.extra_info is not None and self.loader.ready:
+            info.update(self.extra_info())
+        return info
+
+    def health(self) -> Dict[str, Any]:
+        import serve
+
+        return {
+            **self.info(),
+            **self.server_stats(),
+            "models": self.loader.stats()["models"],
+            "batchers": {name: batcher.stats() for name, batcher in self.batchers.items()},
+            "inference": self.executor.stats(),
+            "memory": serve.process_memory()
+        }
+
+class ModelServerClient(protocol.ModelServerClient):
+    """
+    Cliente de um worker HTTP: uma conexão persistente, compartilhada pelas
+    requisições concorrentes do worker e reaberta quando cai.
+    """
+
+    def __init__(self, path: str, timeout_seconds: float = 30.0):
+        super().__init__(path, timeout_seconds, MAX_FRAME_BYTES, ERROR_KINDS)
+
+    async def infer(self, model: str, texts: List[str]) -> List[Any]:
+        """Resultados de `model` para cada texto, na mesma ordem"""
+        if not self.server_info.get("ready"):
+            # Informações do servidor (ex.: versão do catálogo) só valem depois da carga
+            await self.hello()
+        return await super().infer(model, texts)
+
+async def serve_models(path: str) -> None:
+    """Carrega e aquece os modelos de `main` e atende os workers até receber SIGTERM"""
+    import signal
+    import main
+
+    server = ModelServer(
+        main.model_loader,
+        main.inference_executor,
+        path,
+        extra_info=lambda: {"catalogue_version": main.model_loader.get("conditions").catalogue.version}
+    )
+    for name, fn in main.MODEL_CALLS.items():
+        server.register(
+            name,
+            fn,
+            max_batch_texts=int(os.getenv("MODEL_SERVER_MAX_BATCH_TEXTS", "32")),
+            max_wait_ms=float(os.getenv("MODEL_SERVER_BATCH_WAIT_MS", "5"))
+        )
+    # O socket abre já durante a carga: os workers recebem 503 até os modelos ficarem prontos
+    await server.start()
+    await main.model_loader.load_all()
+    if main.model_loader.failed:
+        await server.close()
+        raise RuntimeError("Falha ao carregar os modelos; veja os logs acima")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set)
+    await stopping.wait()
+    await server.close()
+    main.inference_executor.shutdown()
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # O servidor sempre carrega os modelos localmente, mesmo que o ambiente aponte para o socket
+    path = MODEL_SERVER_SOCKET or "/tmp/ai-service-models.sock"
+    os.environ["MODEL_SERVER_SOCKET"] = ""
+    asyncio.run(serve_models(path))
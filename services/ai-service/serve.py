@@ -0,0 +1,180 @@
+import asyncio
+import gc
+import logging
+import os
+import signal
+import sys
+import time
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# "fork": modelos carregados uma vez no processo mestre e compartilhados
+# copy-on-write com os workers; "none": cada worker carrega sua cópia
+MODEL_SHARING = os.getenv("MODEL_SHARING", "fork")
+
+def process_memory(pid: str = "self") -> Dict[str, int]:
+    """
+    Memória de um processo segundo /proc/<pid>/smaps_rollup.
+
+    `shared_bytes` são páginas residentes também mapeadas por outro processo
+    (por exemplo, os pesos herdados do mestre); `pss_bytes` divide cada página
+    compartilhada entre os processos que a usam, então a soma do PSS dos
+    workers é o custo real de memória do serviço.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return {}
+    rss = fields.get("Rss", 0)
+    shared = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+    return {
+        "rss_bytes": rss,
+        "pss_bytes": fields.get("Pss", 0),
+        "shared_bytes": shared,
+        "private_bytes": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared_fraction": round(shared / rss, 4) if rss else 0.0
+    }
+
+def _sibling_pids() -> List[int]:
+    parent = os.getppid()
+    try:
+        with open(f"/proc/{parent}/task/{parent}/children") as f:
+            return sorted(int(pid) for pid in f.read().split())
+    except OSError:
+        return [os.getpid()]
+
+def memory_report() -> Dict[str, Any]:
+    """Memória deste worker e, sob o supervisor, de todos os workers do mesmo mestre"""
+    report: Dict[str, Any] = {"sharing": MODEL_SHARING, "pid": os.getpid(), "worker": process_memory()}
+    if os.environ.get("AI_SERVICE_MASTER_PID") == str(os.getppid()):
+        workers = {str(pid): process_memory(str(pid)) for pid in _sibling_pids()}
+        report["workers"] = workers
+        report["total_pss_bytes"] = sum(w.get("pss_bytes", 0) for w in workers.values())
+        report["master"] = process_memory(str(os.getppid()))
+    return report
+
+def describe_exit(status: int) -> str:
+    """Traduz o status bruto de os.wait() em código de saída ou sinal"""
+    code = os.waitstatus_to_exitcode(status)
+    if code < 0:
+        return f"killed by {signal.Signals(-code).name}"
+    return f"exited with code {code}"
+
+class WorkerSupervisor:
+    """
+    Processo mestre: carrega os modelos, faz fork dos workers e os mantém vivos.
+
+    Os workers herdam o socket já aberto e os modelos já carregados. Como os
+    pesos não são escritos durante a inferência, as páginas continuam
+    compartilhadas; `gc.freeze()` evita que o coletor de lixo dos filhos
+    toque nos objetos herdados e force cópias. Cada worker faz o próprio
+    aquecimento, já que pools de threads e kernels não sobrevivem ao fork.
+    """
+
+    def __init__(self, app_path: str, host: str, port: int, workers: int):
+        import uvicorn
+
+        self.config = uvicorn.Config(app_path, host=host, port=port, lifespan="on")
+        self.workers = workers
+        self.children: Dict[int, int] = {}
+        self.stopping = False
+
+    def preload(self) -> None:
+        import main
+
+        # O fork herdaria pools de threads do tokenizer já iniciados
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        started = time.perf_counter()
+        asyncio.run(main.model_loader.load_all(warmup=False))
+        if main.model_loader.failed:
+            raise RuntimeError("Falha ao pré-carregar os modelos; veja os logs acima")
+        gc.collect()
+        gc.freeze()
+        logger.info(
+            "Models preloaded in %.1fs (%.0f MiB resident in master)",
+            time.perf_counter() - started, process_memory().get("rss_bytes", 0) / 2**20
+        )
+
+    def _spawn(self, slot: int, sock: Any) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = slot
+            return
+        # Filho: volta aos handlers padrão; o uvicorn instala os seus
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        import uvicorn
+        try:
+            uvicorn.Server(self.config).run(sockets=[sock])
+        finally:
+            os._exit(0)
+
+    def _stop(self, signum: int, frame: Any) -> None:
+        self.stopping = True
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        import main
+
+        sock = self.config.bind_socket()
+        os.environ["AI_SERVICE_MASTER_PID"] = str(os.getpid())
+        if main.model_client is not None:
+            # Workers só encaminham para o servidor de modelos: nada a pré-carregar
+            logger.info("Using model server at %s", main.model_client.path)
+        elif MODEL_SHARING == "fork":
+            if main.inference_device() >= 0:
+                # CUDA não sobrevive a fork: cada worker carrega os seus modelos
+                logger.warning("GPU available: model sharing disabled, every worker loads its own models")
+            else:
+                self.preload()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        self.supervise(sock)
+        sock.close()
+
+    def supervise(self, sock: Any) -> None:
+        """Faz fork dos workers e repõe os que morrem até o supervisor ser parado"""
+        for slot in range(self.workers):
+            self._spawn(slot, sock)
+        logger.info("Started %d workers: %s", self.workers, sorted(self.children))
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            slot = self.children.pop(pid, None)
+            if slot is None:
+                continue
+            if not self.stopping:
+                logger.warning("Worker %d %s, restarting", pid, describe_exit(status))
+                time.sleep(1)
+                self._spawn(slot, sock)
+
+def main() -> None:
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+    workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+    if os.getenv("RELOAD", "").lower() in ("1", "true"):
+        # Desenvolvimento: o reload do uvicorn só funciona com um único worker
+        import uvicorn
+        uvicorn.run("main:app", host=host, port=port, reload=True)
+        return
+    WorkerSupervisor("main:app", host, port, workers).run()
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
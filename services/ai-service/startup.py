@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class ModelNotReady(Exception):
+    """Lançada quando um modelo ainda não terminou de carregar e aquecer"""
+
+@dataclass
+class ModelState:
+    name: str
+    # pending -> loading -> loaded -> warming -> ready, ou failed
+    status: str = "pending"
+    load_seconds: Optional[float] = None
+    warmup_ms: Optional[float] = None
+    error: Optional[str] = None
+
+class ModelLoader:
+    """
+    Carrega e aquece os modelos em paralelo, fora do event loop.
+
+    Cada modelo tem uma função de carga e uma inferência de aquecimento, que
+    dispara a inicialização preguiçosa de kernels e alocadores antes do
+    primeiro request real. O servidor aceita conexões enquanto isso acontece;
+    `ready` só fica verdadeiro quando todos os modelos estão aquecidos.
+    """
+
+    def __init__(self, max_workers: int = 3, prepare: Optional[Callable[[], Any]] = None):
+        self.max_workers = max_workers
+        # Executado uma vez antes das cargas paralelas (ex.: imports que não são thread-safe)
+        self.prepare = prepare
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._warmups: Dict[str, Callable[[Any], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._states: Dict[str, ModelState] = {}
+        self.started_at: Optional[float] = None
+        self.ready_seconds: Optional[float] = None
+
+    def register(self, name: str, load: Callable[[], Any], warmup: Callable[[Any], Any]) -> None:
+        self._loaders[name] = load
+        self._warmups[name] = warmup
+        self._states[name] = ModelState(name=name)
+
+    @property
+    def ready(self) -> bool:
+        return all(state.status == "ready" for state in self._states.values())
+
+    @property
+    def failed(self) -> bool:
+        return any(state.status == "failed" for state in self._states.values())
+
+    def get(self, name: str) -> Any:
+        """Modelo `name`, se já estiver aquecido"""
+        if self._states[name].status != "ready":
+            raise ModelNotReady(f"Modelo '{name}' ainda não está pronto ({self._states[name].status})")
+        return self._models[name]
+
+    def _load(self, name: str, warmup: bool) -> None:
+        state = self._states[name]
+        if name not in self._models:
+            state.status = "loading"
+            started = time.perf_counter()
+            self._models[name] = self._loaders[name]()
+            state.load_seconds = round(time.perf_counter() - started, 3)
+            state.status = "loaded"
+            logger.info("Model '%s' loaded in %ss", name, state.load_seconds)
+        if not warmup:
+            return
+
+        state.status = "warming"
+        started = time.perf_counter()
+        self._warmups[name](self._models[name])
+        state.warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+        state.status = "ready"
+        logger.info("Model '%s' ready: warm-up %sms", name, state.warmup_ms)
+
+    async def load_all(self, warmup: bool = True) -> None:
+        """
+        Carrega todos os modelos registrados, até `max_workers` ao mesmo tempo.
+
+        Modelos já carregados (por exemplo, herdados de um processo pai via
+        fork) só passam pelo aquecimento. Com `warmup=False` eles ficam no
+        estado `loaded`, sem nenhuma inferência.
+        """
+        loop = asyncio.get_running_loop()
+        self.started_at = time.perf_counter()
+        pending = [name for name, state in self._states.items() if state.status != "ready"]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="model-load") as pool:
+            if self.prepare is not None and pending:
+                await loop.run_in_executor(pool, self.prepare)
+
+            async def load(name: str) -> None:
+                try:
+                    await loop.run_in_executor(pool, self._load, name, warmup)
+                except Exception as e:
+                    self._states[name].status = "failed"
+                    self._states[name].error = str(e)
+                    logger.error("Failed to load model '%s': %s", name, e, exc_info=True)
+
+            await asyncio.gather(*(load(name) for name in pending))
+        if self.ready:
+            self.ready_seconds = round(time.perf_counter() - self.started_at, 3)
+            logger.info("All models ready in %ss", self.ready_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "ready_seconds": self.ready_seconds,
+            "models": {name: asdict(state) for name, state in self._states.items()}
+        }
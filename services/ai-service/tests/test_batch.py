@@ -0,0 +1,78 @@
+import asyncio
+import json
+import tempfile
+from typing import List
+import pytest
+from pydantic import BaseModel
+from sanara_common.inference_executor import InferenceRejected
+import batch
+from batch import BatchItemResult, _run_isolated, run_batch, stream_batch
+
+class Item(BaseModel):
+    text: str
+
+class Echo(BaseModel):
+    text: str
+
+async def echo(inputs: List[Item]) -> List[Echo]:
+    """Falha no lote inteiro se algum texto for "boom", como um pipeline real"""
+    if any(item.text == "boom" for item in inputs):
+        raise ValueError("boom")
+    return [Echo(text=item.text.upper()) for item in inputs]
+
+async def rejected(inputs: List[Item]) -> List[Echo]:
+    raise InferenceRejected("fila cheia")
+
+def test_failing_item_is_isolated_from_the_rest_of_the_batch():
+    """Um item que derruba o lote falha sozinho; os demais são processados"""
+    outcomes = asyncio.run(_run_isolated(echo, [Item(text="a"), Item(text="boom"), Item(text="b")]))
+    assert outcomes[0] == Echo(text="A")
+    assert isinstance(outcomes[1], ValueError)
+    assert outcomes[2] == Echo(text="B")
+
+def test_admission_failures_are_not_retried_item_by_item():
+    """Fila cheia vale para o lote inteiro e é propagada"""
+    with pytest.raises(InferenceRejected):
+        asyncio.run(_run_isolated(rejected, [Item(text="a"), Item(text="b")]))
+
+def test_run_batch_reports_one_result_per_item_in_order(monkeypatch):
+    """Erros de validação (422) e de inferência (500) ficam no item, com o índice original"""
+    monkeypatch.setattr(batch, "BATCH_INFERENCE_SIZE", 2)
+    raw = [{"text": "a"}, {"texto": "inválido"}, {"text": "boom"}, {"text": "b"}]
+    results = asyncio.run(run_batch(raw, Item.model_validate, echo, offset=10))
+
+    assert [result.index for result in results] == [10, 11, 12, 13]
+    assert results[0].result == {"text": "A"}
+    assert results[1].error["status_code"] == 422
+    assert results[2].error == {"status_code": 500, "detail": "boom"}
+    assert results[3].result == {"text": "B"}
+
+def spool_of(lines: List[str]) -> tempfile.SpooledTemporaryFile:
+    # max_size pequeno: o corpo vai para disco, como um job grande
+    spool = tempfile.SpooledTemporaryFile(max_size=16, mode="w+b")
+    spool.write("".join(lines).encode())
+    spool.seek(0)
+    return spool
+
+async def collect(stream) -> List[dict]:
+    return [json.loads(line) async for line in stream]
+
+def test_stream_batch_emits_a_line_per_input_line(monkeypatch):
+    """Linhas em branco são ignoradas e os índices seguem a ordem das linhas com conteúdo"""
+    monkeypatch.setattr(batch, "BATCH_INFERENCE_SIZE", 2)
+    spool = spool_of(['{"text": "a"}\n', "\n", '{"text": "b"}\n', "não é json\n", '{"text": "c"}'])
+    lines = asyncio.run(collect(stream_batch(spool, Item, echo)))
+
+    assert [BatchItemResult(**line).index for line in lines] == [0, 1, 2, 3]
+    assert lines[1]["result"] == {"text": "B"}
+    assert lines[2]["error"]["status_code"] == 422
+    assert lines[3]["result"] == {"text": "C"}
+    assert spool.closed
+
+def test_stream_batch_aborts_when_inference_is_rejected():
+    """Sem capacidade, o stream termina com uma linha de erro 503"""
+    spool = spool_of(['{"text": "a"}\n', '{"text": "b"}\n'])
+    lines = asyncio.run(collect(stream_batch(spool, Item, rejected)))
+
+    assert lines == [{"index": 0, "error": {"status_code": 503, "detail": "fila cheia"}, "aborted": True}]
+    assert spool.closed
@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from condition_classifier import ConditionBatcher, ConditionCatalogue, ConditionClassifier
+
+CATALOGUE = ConditionCatalogue(version="test", labels=("Gripe", "Alergia", "Enxaqueca"))
+
+WORDS = ["this", "example", "is", "gripe", "alergia", "enxaqueca", "febre", "tosse", "dor", "de", "cabeça", "e", "."]
+
+def tiny_nli_model(tmp_path):
+    """Modelo NLI pequeno com pesos aleatórios: basta para comparar os dois caminhos"""
+    transformers = pytest.importorskip("transformers")
+    pytest.importorskip("torch")
+    vocab = tmp_path / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *WORDS]) + "\n", encoding="utf-8")
+    tokenizer = transformers.BertTokenizer(str(vocab), model_max_length=64)
+    config = transformers.BertConfig(
+        vocab_size=len(WORDS) + 5,
+        hidden_size=16,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=32,
+        num_labels=3,
+        label2id={"contradiction": 0, "neutral": 1, "entailment": 2},
+        id2label={0: "contradiction", 1: "neutral", 2: "entailment"}
+    )
+    transformers.set_seed(0)
+    return tokenizer, transformers.BertForSequenceClassification(config).eval()
+
+def test_batched_scores_match_the_zero_shot_pipeline(tmp_path):
+    """As probabilidades multi-label batem com as do pipeline zero-shot-classification"""
+    tokenizer, model = tiny_nli_model(tmp_path)
+    from transformers import pipeline
+
+    texts = ["febre e tosse", "dor de cabeça", "tosse"]
+    classifier = ConditionClassifier(tokenizer, model, CATALOGUE, max_pairs_per_batch=4)
+    reference = pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+    for text, conditions in zip(texts, classifier.classify(texts)):
+        expected = reference(
+            text,
+            candidate_labels=list(CATALOGUE.labels),
+            hypothesis_template=CATALOGUE.hypothesis_template,
+            multi_label=True
+        )
+        assert [condition["condition"] for condition in conditions] == expected["labels"]
+        assert [condition["probability"] for condition in conditions] == pytest.approx(expected["scores"], abs=1e-5)
+
+class RecordingClassifier:
+    """Classificador falso: guarda o tamanho de cada lote"""
+    catalogue = CATALOGUE
+    prefilter = None
+
+    def __init__(self):
+        self.batches = []
+
+    def classify(self, texts):
+        self.batches.append(list(texts))
+        return [[{"condition": text, "probability": 1.0}] for text in texts]
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+def test_batcher_flushes_when_the_batch_is_full():
+    """O lote sai assim que atinge max_batch_texts, sem esperar a janela"""
+    classifier = RecordingClassifier()
+
+    async def scenario():
+        batcher = ConditionBatcher(classifier, run_inline, max_batch_texts=3, max_wait_ms=10_000)
+        results = await asyncio.wait_for(asyncio.gather(*[batcher.classify(f"t{i}") for i in range(3)]), 1)
+        await batcher.close()
+        return results
+
+    results = asyncio.run(scenario())
+    assert classifier.batches == [["t0", "t1", "t2"]]
+    assert results[2] == [{"condition": "t2", "probability": 1.0}]
+
+def test_batcher_flushes_when_the_window_closes():
+    """Um lote incompleto sai quando a janela de max_wait_ms termina"""
+    classifier = RecordingClassifier()
+
+    async def scenario():
+        batcher = ConditionBatcher(classifier, run_inline, max_batch_texts=8, max_wait_ms=20)
+        results = await asyncio.wait_for(asyncio.gather(batcher.classify("a"), batcher.classify("b")), 1)
+        stats = batcher.stats()
+        await batcher.close()
+        return results, stats
+
+    results, stats = asyncio.run(scenario())
+    assert classifier.batches == [["a", "b"]]
+    assert len(results) == 2
+    assert stats["batches"] == 1 and stats["pending"] == 0
+
+def test_close_waits_for_batches_in_flight():
+    """close() classifica a janela aberta e espera os lotes em andamento"""
+    classifier = RecordingClassifier()
+
+    async def scenario():
+        batcher = ConditionBatcher(classifier, run_inline, max_batch_texts=8, max_wait_ms=10_000)
+        waiting = asyncio.ensure_future(batcher.classify("a"))
+        await asyncio.sleep(0)
+        await batcher.close()
+        return waiting.done() and waiting.result()
+
+    assert asyncio.run(scenario()) == [{"condition": "a", "probability": 1.0}]
@@ -0,0 +1,41 @@
+import pytest
+from sanara_common import inference_engine as shared
+import engines
+
+def test_engine_from_env_falls_back_to_the_default(monkeypatch):
+    """Engine por modelo tem prioridade; vazia usa INFERENCE_ENGINE"""
+    monkeypatch.setenv("INFERENCE_ENGINE", "onnx")
+    monkeypatch.setenv("SENTIMENT_ENGINE", "ONNX-int8")
+    monkeypatch.delenv("CONDITION_ENGINE", raising=False)
+    assert engines.engine_from_env("SENTIMENT_ENGINE") == "onnx-int8"
+    assert engines.engine_from_env("CONDITION_ENGINE") == "onnx"
+    monkeypatch.setenv("CONDITION_ENGINE", "tensorrt")
+    with pytest.raises(ValueError):
+        engines.engine_from_env("CONDITION_ENGINE")
+
+def test_exports_go_to_onnx_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("ONNX_CACHE_DIR", str(tmp_path))
+    path = engines.onnx_model_dir("nlptown/bert-base-multilingual-uncased-sentiment", "onnx-int8")
+    assert path == tmp_path / "nlptown--bert-base-multilingual-uncased-sentiment" / "onnx-int8"
+
+def test_models_without_onnx_export_fall_back_to_pytorch(monkeypatch, tmp_path):
+    """Uma arquitetura que o optimum não exporta continua servindo em PyTorch"""
+    transformers = pytest.importorskip("transformers")
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("onnxruntime")
+    vocab = tmp_path / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "febre"]) + "\n", encoding="utf-8")
+    config = transformers.BertConfig(
+        vocab_size=6, hidden_size=8, num_hidden_layers=1, num_attention_heads=2, intermediate_size=16
+    )
+    model_dir = tmp_path / "tiny-bert"
+    transformers.BertForSequenceClassification(config).save_pretrained(model_dir)
+    transformers.BertTokenizer(str(vocab)).save_pretrained(model_dir)
+
+    def unsupported(task, model, engine, cache_dir):
+        raise ValueError("unsupported architecture")
+
+    monkeypatch.setattr(shared, "export_onnx", unsupported)
+    tokenizer, model = engines.load_model("text-classification", str(model_dir), "onnx-int8")
+    assert isinstance(model, torch.nn.Module)
+    assert tokenizer("febre")["input_ids"][1] == 5
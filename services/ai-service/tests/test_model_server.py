@@ -0,0 +1,77 @@
+import asyncio
+import gc
+import pytest
+from sanara_common.inference_executor import InferenceExecutor
+from model_server import CallBatcher, ModelServer, ModelServerClient
+from startup import ModelLoader, ModelNotReady
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+def test_batches_in_flight_are_kept_until_they_finish():
+    """O lote agendado pelo timer sobrevive à coleta de lixo e close() espera por ele"""
+    async def scenario():
+        gate = asyncio.Event()
+        batches = []
+
+        async def slow_run(fn, texts):
+            await gate.wait()
+            batches.append(texts)
+            return fn(texts)
+
+        batcher = CallBatcher(lambda texts: [t.upper() for t in texts], slow_run, max_batch_texts=8, max_wait_ms=1)
+        waiting = asyncio.ensure_future(batcher.submit(["a", "b"]))
+        await asyncio.sleep(0.02)
+        gc.collect()
+        assert len(batcher._tasks) == 1
+        gate.set()
+        await batcher.close()
+        return await waiting, batches, batcher._tasks
+
+    results, batches, tasks = asyncio.run(scenario())
+    assert results == ["A", "B"] and batches == [["a", "b"]]
+    assert not tasks
+
+def test_close_dispatches_the_open_window():
+    async def scenario():
+        batcher = CallBatcher(lambda texts: texts, run_inline, max_batch_texts=8, max_wait_ms=10_000)
+        waiting = asyncio.ensure_future(batcher.submit(["a"]))
+        await asyncio.sleep(0)
+        await batcher.close()
+        return waiting.done() and waiting.result()
+
+    assert asyncio.run(scenario()) == ["a"]
+
+def test_calls_from_several_workers_share_a_batch(tmp_path):
+    """Workers diferentes caem no mesmo lote; modelo carregando volta como ModelNotReady"""
+    calls = []
+
+    def upper(model, texts):
+        calls.append(list(texts))
+        return [model + text for text in texts]
+
+    async def scenario():
+        loader = ModelLoader()
+        loader.register("sentiment", lambda: "m:", lambda model: None)
+        executor = InferenceExecutor(max_workers=1)
+        server = ModelServer(loader, executor, str(tmp_path / "models.sock"), extra_info=lambda: {"catalogue_version": "v1"})
+        server.register("sentiment", upper, max_batch_texts=4, max_wait_ms=50)
+        await server.start()
+        clients = [ModelServerClient(server.path, timeout_seconds=5) for _ in range(2)]
+        try:
+            with pytest.raises(ModelNotReady):
+                await clients[0].infer("sentiment", ["x"])
+            await loader.load_all()
+            results = await asyncio.gather(clients[0].infer("sentiment", ["a"]), clients[1].infer("sentiment", ["b", "c"]))
+            return results, clients[1].server_info, await clients[0].health()
+        finally:
+            for client in clients:
+                await client.close()
+            await server.close()
+            executor.shutdown()
+
+    results, info, health = asyncio.run(scenario())
+    assert results == [["m:a"], ["m:b", "m:c"]]
+    assert calls == [["a", "b", "c"]]
+    assert info["catalogue_version"] == "v1"
+    assert health["connections"] == 2 and health["batchers"]["sentiment"]["calls"] == 2
@@ -0,0 +1,86 @@
+import logging
+import os
+import signal
+import pytest
+import serve
+from serve import WorkerSupervisor, describe_exit
+
+class FakeProcesses:
+    """os.fork/os.wait falsos: cada fork devolve um pid novo e os.wait devolve as saídas roteirizadas"""
+
+    def __init__(self, exits):
+        self.next_pid = 100
+        self.exits = list(exits)
+        self.forked = []
+
+    def fork(self):
+        self.next_pid += 1
+        self.forked.append(self.next_pid)
+        return self.next_pid
+
+    def wait(self):
+        if not self.exits:
+            raise ChildProcessError()
+        exited = self.exits.pop(0)
+        return exited(self) if callable(exited) else exited
+
+@pytest.fixture
+def supervisor(monkeypatch):
+    monkeypatch.setattr(serve.time, "sleep", lambda seconds: None)
+    return WorkerSupervisor("main:app", "127.0.0.1", 0, workers=2)
+
+def test_describe_exit_decodes_wait_status():
+    assert describe_exit(3 << 8) == "exited with code 3"
+    assert describe_exit(signal.SIGKILL) == "killed by SIGKILL"
+
+def test_dead_worker_is_respawned_in_its_slot(monkeypatch, supervisor, caplog):
+    # 101 e 102 são os workers iniciais; 101 morre por SIGKILL e 103 toma o seu lugar
+    processes = FakeProcesses([(101, signal.SIGKILL)])
+    monkeypatch.setattr(serve.os, "fork", processes.fork)
+    monkeypatch.setattr(serve.os, "wait", processes.wait)
+
+    with caplog.at_level(logging.WARNING, logger="serve"):
+        supervisor.supervise(sock=None)
+
+    assert processes.forked == [101, 102, 103]
+    assert supervisor.children == {102: 1, 103: 0}
+    assert "Worker 101 killed by SIGKILL, restarting" in caplog.text
+
+def test_workers_are_not_respawned_while_stopping(monkeypatch, supervisor):
+    def stop_then_exit(pid):
+        def exited(processes):
+            supervisor.stopping = True
+            return pid, 0
+        return exited
+
+    processes = FakeProcesses([stop_then_exit(101), (102, 0)])
+    monkeypatch.setattr(serve.os, "fork", processes.fork)
+    monkeypatch.setattr(serve.os, "wait", processes.wait)
+
+    supervisor.supervise(sock=None)
+    assert processes.forked == [101, 102]
+    assert supervisor.children == {}
+
+def test_memory_report_covers_sibling_workers_under_the_supervisor(monkeypatch):
+    memory = {"self": 10, "201": 30, "202": 50, "200": 70}
+    monkeypatch.setattr(serve, "process_memory", lambda pid="self": {"pss_bytes": memory[pid]})
+    monkeypatch.setattr(serve, "_sibling_pids", lambda: [201, 202])
+    monkeypatch.setattr(serve.os, "getppid", lambda: 200)
+
+    monkeypatch.delenv("AI_SERVICE_MASTER_PID", raising=False)
+    report = serve.memory_report()
+    assert report["worker"] == {"pss_bytes": 10}
+    assert "workers" not in report
+
+    monkeypatch.setenv("AI_SERVICE_MASTER_PID", "200")
+    report = serve.memory_report()
+    assert report["total_pss_bytes"] == 80
+    assert report["master"] == {"pss_bytes": 70}
+    assert set(report["workers"]) == {"201", "202"}
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="requer /proc/<pid>/smaps_rollup")
+def test_process_memory_reads_smaps_rollup():
+    memory = serve.process_memory()
+    assert memory["rss_bytes"] > 0
+    assert 0 < memory["pss_bytes"] <= memory["rss_bytes"]
+    assert 0.0 <= memory["shared_fraction"] <= 1.0
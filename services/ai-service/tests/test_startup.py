@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from startup import ModelLoader, ModelNotReady
+
+class Gate:
+    """Segura a carga ou o aquecimento até o teste liberar"""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, *args):
+        self.entered.set()
+        assert self.release.wait(5)
+        return "modelo"
+
+async def wait_for(event: threading.Event) -> None:
+    assert await asyncio.to_thread(event.wait, 5)
+
+def test_model_goes_through_loading_and_warming_before_ready():
+    load, warmup = Gate(), Gate()
+    loader = ModelLoader(max_workers=1)
+    loader.register("sentiment", load, warmup)
+
+    async def scenario():
+        statuses = [loader.stats()["models"]["sentiment"]["status"]]
+        loading = asyncio.ensure_future(loader.load_all())
+        await wait_for(load.entered)
+        statuses.append(loader.stats()["models"]["sentiment"]["status"])
+        with pytest.raises(ModelNotReady):
+            loader.get("sentiment")
+        load.release.set()
+        await wait_for(warmup.entered)
+        statuses.append(loader.stats()["models"]["sentiment"]["status"])
+        assert not loader.ready
+        warmup.release.set()
+        await loading
+        statuses.append(loader.stats()["models"]["sentiment"]["status"])
+        return statuses
+
+    assert asyncio.run(scenario()) == ["pending", "loading", "warming", "ready"]
+    assert loader.ready and loader.ready_seconds is not None
+    assert loader.get("sentiment") == "modelo"
+
+def test_failed_warmup_marks_only_that_model_failed():
+    def broken(model):
+        raise RuntimeError("sem memória")
+
+    loader = ModelLoader()
+    loader.register("sentiment", lambda: "modelo", lambda model: None)
+    loader.register("conditions", lambda: "modelo", broken)
+    asyncio.run(loader.load_all())
+
+    models = loader.stats()["models"]
+    assert models["sentiment"]["status"] == "ready"
+    assert models["conditions"]["status"] == "failed"
+    assert models["conditions"]["error"] == "sem memória"
+    assert loader.failed and not loader.ready
+    assert loader.ready_seconds is None
+
+def test_loaded_models_are_only_warmed_up_again():
+    """Modelos herdados do processo pai não são carregados de novo"""
+    loads = []
+    loader = ModelLoader()
+    loader.register("sentiment", lambda: loads.append(1) or "modelo", lambda model: None)
+    asyncio.run(loader.load_all(warmup=False))
+    assert loader.stats()["models"]["sentiment"]["status"] == "loaded"
+    asyncio.run(loader.load_all())
+    assert loader.ready and loads == [1]
+
+@pytest.fixture
+def client(monkeypatch):
+    import main
+    loader = ModelLoader()
+    loader.register("sentiment", lambda: "modelo", lambda model: None)
+    monkeypatch.setattr(main, "model_loader", loader)
+    monkeypatch.setattr(main, "model_client", None)
+    # Sem `with`: o lifespan (e a carga dos modelos reais) não roda
+    return TestClient(main.app), loader
+
+def test_ready_returns_503_until_models_are_warmed_up(client):
+    http, loader = client
+    assert http.get("/live").status_code == 200
+    response = http.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "loading"
+
+    asyncio.run(loader.load_all())
+    response = http.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["models"]["sentiment"]["status"] == "ready"
+
+def test_ready_reports_failed_loads(client):
+    http, loader = client
+
+    def missing():
+        raise OSError("modelo ausente")
+
+    loader.register("conditions", missing, lambda model: None)
+    asyncio.run(loader.load_all())
+    response = http.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "failed"
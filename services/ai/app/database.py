@@ -0,0 +1,26 @@
+from typing import Optional
+from app.config import settings
+
+_client = None
+
+def get_mongo_client():
+    """
+    Return the process-wide Motor client, creating it on first use.
+
+    Motor keeps a connection pool per client, so every component shares this
+    single instance instead of opening its own connections.
+    """
+    global _client
+    if _client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _client = AsyncIOMotorClient(settings.MONGODB_URL)
+    return _client
+
+def get_database():
+    return get_mongo_client()[settings.MONGODB_DB]
+
+def close_mongo_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
@@ -0,0 +1,38 @@
+from typing import Optional
+from fastapi import Request
+from app.services.model_registry import ModelRegistry
+from app.services.result_cache import ResultCache
+from app.services.incremental_analysis import ConsultationStore
+from app.services.llm import LLMClient
+from app.services.analysis_store import AnalysisStore
+
+def get_model_registry(request: Request) -> ModelRegistry:
+    """
+    Return the model registry created during application startup.
+    """
+    return request.app.state.model_registry
+
+def get_result_cache(request: Request) -> ResultCache:
+    """
+    Return the LLM/NLP result cache created during application startup.
+    """
+    return request.app.state.result_cache
+
+def get_consultation_store(request: Request) -> ConsultationStore:
+    """
+    Return the per-consultation state used by incremental chat analysis.
+    """
+    return request.app.state.consultation_store
+
+
+def get_llm_client(request: Request) -> LLMClient:
+    """
+    Return the pooled LLM client shared by every service.
+    """
+    return request.app.state.llm_client
+
+def get_analysis_store(request: Request) -> Optional[AnalysisStore]:
+    """
+    Return the write-behind analysis store, or None when persistence is disabled.
+    """
+    return request.app.state.analysis_store
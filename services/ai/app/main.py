@@ -1,8 +1,18 @@
-from fastapi import FastAPI
+import asyncio
+from typing import List
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from sanara_common import metrics
 from app.config import settings
-from app.routers import health, chat
-from app.utils.logger import get_logger
+from app.routers import health, chat, analyses, admin
+from app.services.model_registry import create_inference_executor, create_model_registry
+from app.services.model_client import ModelServerClient, create_remote_model_registry
+from app.services.result_cache import create_result_cache
+from app.services.llm import create_llm_client
+from app.services.incremental_analysis import create_consultation_store
+from app.services.analysis_store import create_analysis_store
+from app.database import close_mongo_client
+from app.utils.logger import RequestIdMiddleware, get_logger, logging_stats
 from datetime import datetime
 
 logger = get_logger(__name__)
@@ -21,17 +31,109 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tag every log record of a request with its X-Request-ID
+app.add_middleware(RequestIdMiddleware)
+
+# Outermost, so request latency covers every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
 app.include_router(health.router, prefix=settings.API_V1_STR)
 app.include_router(chat.router, prefix=settings.API_V1_STR)
+app.include_router(analyses.router, prefix=settings.API_V1_STR)
+app.include_router(admin.router)
+
+def collect_state_metrics() -> List[metrics.MetricFamily]:
+    """
+    Expose the counters and queue depths the components already keep.
+    """
+    state = app.state
+    queue_depth = metrics.MetricFamily("queue_depth", "gauge", "Items waiting in an internal queue")
+    for name, stats in state.model_registry.batcher_stats().items():
+        queue_depth.add(stats["queue_depth"], queue=f"batcher:{name}")
+    executor = state.inference_executor.stats()
+    queue_depth.add(executor["pending"], queue="inference_executor")
+    log_queue = logging_stats()
+    queue_depth.add(log_queue["queued"], queue="log")
+    families = [
+        queue_depth,
+        metrics.MetricFamily("inference_rejected_total", "counter", "Inference calls rejected by admission control")
+            .add(executor["rejected"]),
+        metrics.MetricFamily("inference_timeouts_total", "counter", "Inference calls that timed out")
+            .add(executor["timeouts"]),
+        metrics.MetricFamily("log_records_dropped_total", "counter", "Log records dropped on a full log queue")
+            .add(log_queue["dropped"])
+    ]
+
+    cache = state.result_cache.stats()
+    families.append(
+        metrics.MetricFamily("cache_lookups_total", "counter", "Cache lookups by outcome")
+            .add(cache["hits"], cache="results", result="hit")
+            .add(cache["misses"], cache="results", result="miss")
+    )
+    families.append(metrics.MetricFamily("cache_entries", "gauge", "Entries held by a cache").add(cache["entries"], cache="results"))
+
+    llm = state.llm_client.stats()
+    families.extend([
+        metrics.MetricFamily("llm_requests_total", "counter", "LLM chat completions by outcome")
+            .add(llm["successes"], outcome="success")
+            .add(llm["failures"], outcome="failure"),
+        metrics.MetricFamily("llm_retries_total", "counter", "LLM attempts retried after a 429/5xx or network error")
+            .add(llm["retries"]),
+        metrics.MetricFamily("llm_requests_in_flight", "gauge", "LLM requests awaiting a response").add(llm["in_flight"]),
+        metrics.MetricFamily("tokens_total", "counter", "Tokens processed by a generative model")
+            .add(llm["prompt_tokens"], model="llm", kind="prompt")
+            .add(llm["completion_tokens"], model="llm", kind="completion")
+    ])
+
+    if state.analysis_store is not None:
+        store = state.analysis_store.stats()
+        queue_depth.add(store["pending"], queue="analysis_store")
+        families.append(
+            metrics.MetricFamily("analysis_store_written_total", "counter", "Analysis results written to MongoDB")
+                .add(store["written"])
+        )
+    return families
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting AI service")
+    if settings.MODEL_SERVER_SOCKET:
+        # Models live in the model server; this worker only tokenizes and forwards
+        app.state.model_client = ModelServerClient(settings.MODEL_SERVER_SOCKET)
+        app.state.inference_executor = create_inference_executor(process_workers=0)
+        app.state.model_registry = create_remote_model_registry(
+            app.state.model_client, app.state.inference_executor
+        )
+    else:
+        # Load every model once per worker; requests only pay for inference
+        app.state.model_client = None
+        app.state.inference_executor = create_inference_executor()
+        app.state.model_registry = create_model_registry(app.state.inference_executor)
+    app.state.result_cache = create_result_cache()
+    app.state.llm_client = create_llm_client()
+    app.state.consultation_store = create_consultation_store()
+    app.state.analysis_store = create_analysis_store()
+    if app.state.analysis_store is not None:
+        await app.state.analysis_store.start()
+    metrics.registry.register_collector(collect_state_metrics)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, app.state.model_registry.load_all)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down AI service")
+    metrics.registry.unregister_collector(collect_state_metrics)
+    await app.state.model_registry.close_batchers()
+    app.state.model_registry.unload_all()
+    app.state.inference_executor.shutdown()
+    if app.state.model_client is not None:
+        await app.state.model_client.close()
+    await app.state.llm_client.aclose()
+    if app.state.analysis_store is not None:
+        # Write out buffered results before the Mongo client goes away
+        await app.state.analysis_store.close()
+    close_mongo_client()
 
 @app.get("/")
 async def root():
@@ -46,4 +148,42 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat()
-    } 
\ No newline at end of file
+    } 
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/models")
+async def models_status():
+    status = {
+        "models": app.state.model_registry.stats(),
+        "batchers": app.state.model_registry.batcher_stats(),
+        "executor": app.state.inference_executor.stats(),
+        "logging": logging_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    client = app.state.model_client
+    if client is not None:
+        status["model_client"] = client.stats()
+        try:
+            status["model_server"] = await client.health()
+        except Exception as e:
+            status["model_server"] = {"status": "unreachable", "error": str(e)}
+    return status
+
+@app.get("/llm")
+async def llm_status():
+    return {
+        "llm": app.state.llm_client.stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@app.get("/cache")
+async def cache_status():
+    return {
+        "cache": app.state.result_cache.stats(),
+        "consultations": app.state.consultation_store.stats(),
+        "analysis_store": app.state.analysis_store.stats() if app.state.analysis_store is not None else None,
+        "timestamp": datetime.utcnow().isoformat()
+    }
\ No newline at end of file
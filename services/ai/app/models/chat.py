@@ -27,6 +27,8 @@ class ChatAnalysisRequest(BaseModel):
     consultation_id: str
     messages: List[Message]
     context: Optional[Dict[str, Any]] = None
+    # Reuse per-message results from earlier calls for this consultation
+    incremental: bool = False
 
 class SentimentScore(BaseModel):
     positive: float = Field(ge=0.0, le=1.0)
@@ -53,6 +55,7 @@ class ChatAnalysisResponse(BaseModel):
     entities: List[Entity]
     summary: str
     recommendations: List[str]
+    metadata: Optional[Dict[str, Any]] = None
 
 class ChatSummaryRequest(BaseModel):
     consultation_id: str
@@ -65,4 +68,5 @@ class ChatSummaryResponse(BaseModel):
     timestamp: datetime
     content: str
     highlights: List[str]
-    sentiment: Optional[SentimentScore] = None 
\ No newline at end of file
+    sentiment: Optional[SentimentScore] = None
+    metadata: Optional[Dict[str, Any]] = None 
\ No newline at end of file
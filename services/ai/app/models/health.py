@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
 
@@ -37,6 +37,7 @@ class HealthAnalysisResponse(BaseModel):
     possible_conditions: List[HealthCondition]
     recommendations: List[str]
     disclaimer: str = "Esta análise é apenas para fins informativos e não substitui uma consulta médica profissional."
+    metadata: Optional[Dict[str, Any]] = None
 
 class MedicalReportRequest(BaseModel):
     consultation_id: str
@@ -52,4 +53,5 @@ class MedicalReportResponse(BaseModel):
     timestamp: datetime
     content: str
     summary: str
-    recommendations: List[str] 
\ No newline at end of file
+    recommendations: List[str]
+    metadata: Optional[Dict[str, Any]] = None 
\ No newline at end of file
@@ -0,0 +1,43 @@
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import PlainTextResponse
+from sanara_common.profiling import PROFILE_MODES, ProfilerBusy, capture_profile
+from app.config import settings
+from app.utils.logger import get_logger
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+logger = get_logger(__name__)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Allow the request only with the configured ``X-Admin-Token``; without a
+    configured token the admin endpoints do not exist.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    mode: str = Query("sample", description=f"One of: {', '.join(PROFILE_MODES)}"),
+    seconds: float = Query(10.0, gt=0),
+    limit: int = Query(50, ge=1, le=1000),
+    _: None = Depends(require_admin)
+):
+    """
+    Profile the worker serving this request for ``seconds`` and return the report.
+    """
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(PROFILE_MODES)}")
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {settings.PROFILE_MAX_SECONDS:g}")
+    logger.warning("Capturing a %s profile for %gs", mode, seconds)
+    try:
+        report = await capture_profile(mode, seconds, limit)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    # Several workers may sit behind one port: say which one was profiled
+    return PlainTextResponse(report, headers={"X-Worker-PID": str(os.getpid()), "X-Profile-Mode": mode})
@@ -0,0 +1,46 @@
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
+from app.services.analysis_store import AnalysisStore
+from app.dependencies import get_analysis_store
+from app.utils.logger import get_logger
+
+router = APIRouter(prefix="/analyses", tags=["analyses"])
+logger = get_logger(__name__)
+
+def require_store(store: Optional[AnalysisStore] = Depends(get_analysis_store)) -> AnalysisStore:
+    if store is None:
+        raise HTTPException(status_code=404, detail="Analysis persistence is disabled")
+    return store
+
+def _public(document: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in document.items() if key != "_id"}
+
+@router.get("/{analysis_id}")
+async def get_analysis(analysis_id: str, store: AnalysisStore = Depends(require_store)):
+    """
+    Fetch a stored chat, health or report analysis by its id.
+    """
+    try:
+        document = await store.get(analysis_id)
+    except Exception as e:
+        logger.error("Failed to fetch analysis", error=e)
+        raise HTTPException(status_code=503, detail="Analysis storage unavailable")
+    if document is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return _public(document)
+
+@router.get("")
+async def list_consultation_analyses(
+    consultation_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    store: AnalysisStore = Depends(require_store)
+) -> List[Dict[str, Any]]:
+    """
+    List the latest analyses of a consultation, newest first.
+    """
+    try:
+        documents = await store.find_by_consultation(consultation_id, limit)
+    except Exception as e:
+        logger.error("Failed to list consultation analyses", error=e)
+        raise HTTPException(status_code=503, detail="Analysis storage unavailable")
+    return [_public(document) for document in documents]
@@ -1,4 +1,7 @@
+import asyncio
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
+from sanara_common.inference_executor import InferenceRejected
 from app.models.chat import (
     ChatAnalysisRequest,
     ChatAnalysisResponse,
@@ -6,24 +9,45 @@ from app.models.chat import (
     ChatSummaryResponse
 )
 from app.services.chat_analysis import ChatAnalysisService
+from app.services.model_registry import ModelRegistry
+from app.services.result_cache import ResultCache
+from app.services.llm import LLMClient, LLMError
+from app.services.incremental_analysis import ConsultationStore
+from app.services.analysis_store import AnalysisStore
+from app.dependencies import get_analysis_store, get_model_registry, get_llm_client, get_result_cache, get_consultation_store
 from app.utils.logger import get_logger
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 logger = get_logger(__name__)
 
-async def get_chat_service() -> ChatAnalysisService:
-    return ChatAnalysisService()
+async def get_chat_service(
+    registry: ModelRegistry = Depends(get_model_registry),
+    llm: LLMClient = Depends(get_llm_client),
+    cache: ResultCache = Depends(get_result_cache),
+    consultations: ConsultationStore = Depends(get_consultation_store)
+) -> ChatAnalysisService:
+    return ChatAnalysisService(registry, llm, cache, consultations)
 
 @router.post("/analyze", response_model=ChatAnalysisResponse)
 async def analyze_chat(
     request: ChatAnalysisRequest,
-    service: ChatAnalysisService = Depends(get_chat_service)
+    service: ChatAnalysisService = Depends(get_chat_service),
+    store: Optional[AnalysisStore] = Depends(get_analysis_store)
 ):
     """
     Analyze chat messages and provide insights.
     """
     try:
-        return await service.analyze_chat(request)
+        response = await service.analyze_chat(request)
+        if store is not None:
+            await store.save("chat", response)
+        return response
+    except InferenceRejected:
+        raise HTTPException(status_code=503, detail="Inference capacity exhausted, retry later")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Inference timed out")
+    except LLMError:
+        raise HTTPException(status_code=502, detail="Language model request failed")
     except Exception as e:
         logger.error("Failed to analyze chat", error=e)
         raise HTTPException(
@@ -41,6 +65,12 @@ async def generate_chat_summary(
     """
     try:
         return await service.generate_summary(request)
+    except InferenceRejected:
+        raise HTTPException(status_code=503, detail="Inference capacity exhausted, retry later")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Inference timed out")
+    except LLMError:
+        raise HTTPException(status_code=502, detail="Language model request failed")
     except Exception as e:
         logger.error("Failed to generate chat summary", error=e)
         raise HTTPException(
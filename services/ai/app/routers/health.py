@@ -1,4 +1,7 @@
+import asyncio
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
+from sanara_common.inference_executor import InferenceRejected
 from app.models.health import (
     HealthAnalysisRequest,
     HealthAnalysisResponse,
@@ -6,24 +9,43 @@ from app.models.health import (
     MedicalReportResponse
 )
 from app.services.health_analysis import HealthAnalysisService
+from app.services.model_registry import ModelRegistry
+from app.services.result_cache import ResultCache
+from app.services.llm import LLMClient, LLMError
+from app.services.analysis_store import AnalysisStore
+from app.dependencies import get_analysis_store, get_model_registry, get_llm_client, get_result_cache
 from app.utils.logger import get_logger
 
 router = APIRouter(prefix="/health", tags=["health"])
 logger = get_logger(__name__)
 
-async def get_health_service() -> HealthAnalysisService:
-    return HealthAnalysisService()
+async def get_health_service(
+    registry: ModelRegistry = Depends(get_model_registry),
+    llm: LLMClient = Depends(get_llm_client),
+    cache: ResultCache = Depends(get_result_cache)
+) -> HealthAnalysisService:
+    return HealthAnalysisService(registry, llm, cache)
 
 @router.post("/analyze", response_model=HealthAnalysisResponse)
 async def analyze_symptoms(
     request: HealthAnalysisRequest,
-    service: HealthAnalysisService = Depends(get_health_service)
+    service: HealthAnalysisService = Depends(get_health_service),
+    store: Optional[AnalysisStore] = Depends(get_analysis_store)
 ):
     """
     Analyze symptoms and provide health insights.
     """
     try:
-        return await service.analyze_symptoms(request)
+        response = await service.analyze_symptoms(request)
+        if store is not None:
+            await store.save("health", response)
+        return response
+    except InferenceRejected:
+        raise HTTPException(status_code=503, detail="Inference capacity exhausted, retry later")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Inference timed out")
+    except LLMError:
+        raise HTTPException(status_code=502, detail="Language model request failed")
     except Exception as e:
         logger.error("Failed to analyze symptoms", error=e)
         raise HTTPException(
@@ -34,13 +56,23 @@ async def analyze_symptoms(
 @router.post("/report", response_model=MedicalReportResponse)
 async def generate_medical_report(
     request: MedicalReportRequest,
-    service: HealthAnalysisService = Depends(get_health_service)
+    service: HealthAnalysisService = Depends(get_health_service),
+    store: Optional[AnalysisStore] = Depends(get_analysis_store)
 ):
     """
     Generate a medical report based on consultation data.
     """
     try:
-        return await service.generate_medical_report(request)
+        response = await service.generate_medical_report(request)
+        if store is not None:
+            await store.save("report", response)
+        return response
+    except InferenceRejected:
+        raise HTTPException(status_code=503, detail="Inference capacity exhausted, retry later")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Inference timed out")
+    except LLMError:
+        raise HTTPException(status_code=502, detail="Language model request failed")
     except Exception as e:
         logger.error("Failed to generate medical report", error=e)
         raise HTTPException(
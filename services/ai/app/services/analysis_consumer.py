@@ -0,0 +1,292 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+from sanara_common.inference_executor import InferenceRejected
+from app.config import settings
+from app.models.chat import ChatAnalysisRequest
+from app.models.health import HealthAnalysisRequest
+from app.utils.logger import get_logger, request_id_var
+from .analysis_store import analysis_document, create_analysis_store
+from .llm import LLMError
+from .message_broker import Delivery
+
+logger = get_logger(__name__)
+
+# Failures worth another attempt; anything else sends the message to the DLQ
+TRANSIENT_ERRORS = (InferenceRejected, asyncio.TimeoutError, LLMError)
+
+# Runs one validated request and returns its response model
+AnalysisHandler = Callable[[BaseModel], Awaitable[BaseModel]]
+# Builds the handler of each analysis kind; called once per batch
+HandlerFactory = Callable[[], Dict[str, AnalysisHandler]]
+
+class PoisonMessage(ValueError):
+    """
+    Raised for messages that can never be processed (bad JSON, unknown kind, invalid request).
+    """
+
+@dataclass
+class AnalysisJob:
+    delivery: Delivery
+    request_id: str
+    kind: str
+    request: BaseModel
+    correlation_id: Optional[str] = None
+    origin: Optional[str] = None
+
+@dataclass
+class ConsumerStats:
+    received: int = 0
+    batches: int = 0
+    processed: int = 0
+    persisted: int = 0
+    poison: int = 0
+    failed: int = 0
+    requeued: int = 0
+    dead_lettered: int = 0
+    persist_errors: int = 0
+    total_batch_seconds: float = 0.0
+
+def parse_message(delivery: Delivery, requests: Dict[str, Type[BaseModel]]) -> AnalysisJob:
+    """
+    Parse an ``analysis_requested`` message (AIServiceMessage in the message broker types).
+
+    ``data.content`` holds the request body as a JSON string and
+    ``data.metadata.analysis`` names the analysis to run (``chat`` or ``health``).
+    """
+    try:
+        message = json.loads(delivery.body)
+        data = message["data"]
+        request_id = str(data["request_id"])
+        kind = (data.get("metadata") or {}).get("analysis", "chat")
+        content = data["content"]
+        if isinstance(content, str):
+            content = json.loads(content)
+    except (ValueError, KeyError, TypeError) as e:
+        raise PoisonMessage(f"Malformed analysis message: {e!r}")
+
+    if kind not in requests:
+        raise PoisonMessage(f"Unknown analysis '{kind}' for request {request_id}")
+    try:
+        request = requests[kind].model_validate(content)
+    except ValidationError as e:
+        raise PoisonMessage(f"Invalid {kind} request {request_id}: {e.error_count()} errors")
+    return AnalysisJob(delivery, request_id, kind, request, message.get("correlationId"), message.get("origin"))
+
+class InMemoryResultStore:
+    """
+    Result store kept in a dict, for tests and local runs.
+    """
+
+    def __init__(self):
+        self.documents: Dict[str, Dict[str, Any]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def save_many(self, documents: List[Dict[str, Any]]) -> None:
+        for document in documents:
+            self.documents[document["_id"]] = document
+
+class AnalysisConsumer:
+    """
+    Consumes analysis requests from the broker in batches.
+
+    Up to ``batch_size`` deliveries arriving within ``batch_wait_ms`` form a
+    batch; its requests run concurrently, so the model micro-batchers turn
+    them into shared forward passes. Batches themselves are pipelined, bounded
+    by the broker prefetch. Results of a batch are persisted in one write and
+    only then acknowledged. Poison messages are rejected to the dead-letter
+    queue at once; transient failures are requeued once, then dead-lettered.
+
+    ``handlers`` builds fresh handlers for every batch, so whatever the
+    analysis services keep between calls is released with the batch instead
+    of living as long as the worker.
+    """
+
+    def __init__(
+        self,
+        broker: Any,
+        store: Any,
+        requests: Dict[str, Type[BaseModel]],
+        handlers: HandlerFactory,
+        batch_size: int = 16,
+        batch_wait_ms: float = 50.0
+    ):
+        self.broker = broker
+        self.store = store
+        self.handlers = handlers
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait_ms / 1000
+        self._requests = requests
+        self._stats = ConsumerStats()
+        self._tasks: set = set()
+        self._stopping = asyncio.Event()
+
+    async def run(self) -> None:
+        """
+        Consume until ``stop`` is called, then wait for the batches in flight.
+        """
+        await self.broker.connect()
+        while not self._stopping.is_set():
+            batch = await self._collect()
+            if not batch:
+                continue
+            task = asyncio.create_task(self.process_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def _collect(self) -> List[Delivery]:
+        stop = asyncio.ensure_future(self._stopping.wait())
+        first = asyncio.ensure_future(self.broker.get())
+        try:
+            await asyncio.wait({stop, first}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop.cancel()
+        if not first.done():
+            first.cancel()
+            try:
+                await first
+            except asyncio.CancelledError:
+                pass
+            return []
+
+        batch = [first.result()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.broker.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def process_batch(self, deliveries: List[Delivery]) -> None:
+        started = time.perf_counter()
+        self._stats.received += len(deliveries)
+        self._stats.batches += 1
+
+        jobs: List[AnalysisJob] = []
+        for delivery in deliveries:
+            try:
+                jobs.append(parse_message(delivery, self._requests))
+            except PoisonMessage as e:
+                self._stats.poison += 1
+                logger.warning("Rejecting poison message to the DLQ: %s", e)
+                await self._reject(delivery, requeue=False)
+
+        handlers = self.handlers() if jobs else {}
+        results = await asyncio.gather(*(self._run(job, handlers[job.kind]) for job in jobs), return_exceptions=True)
+        done: List[Tuple[AnalysisJob, BaseModel]] = []
+        for job, result in zip(jobs, results):
+            if isinstance(result, BaseException):
+                self._stats.failed += 1
+                # One retry for transient failures; a redelivered message that fails again is dead-lettered
+                requeue = isinstance(result, TRANSIENT_ERRORS) and not job.delivery.redelivered
+                logger.warning(
+                    "Analysis %s failed (%r), %s", job.request_id, result, "requeued" if requeue else "dead-lettered"
+                )
+                await self._reject(job.delivery, requeue=requeue)
+            else:
+                done.append((job, result))
+
+        if done:
+            await self._persist_and_ack(done)
+        self._stats.total_batch_seconds += time.perf_counter() - started
+
+    async def _run(self, job: AnalysisJob, handler: AnalysisHandler) -> BaseModel:
+        token = request_id_var.set(job.correlation_id or job.request_id)
+        try:
+            return await handler(job.request)
+        finally:
+            request_id_var.reset(token)
+
+    async def _persist_and_ack(self, done: List[Tuple[AnalysisJob, BaseModel]]) -> None:
+        documents = [
+            analysis_document(
+                job.kind,
+                result,
+                _id=job.request_id,
+                request_id=job.request_id,
+                correlation_id=job.correlation_id,
+                origin=job.origin
+            )
+            for job, result in done
+        ]
+        try:
+            await self.store.save_many(documents)
+        except Exception as e:
+            # Nothing was acked: the whole batch comes back and is saved again (writes are upserts)
+            self._stats.persist_errors += 1
+            logger.error("Failed to persist %d analysis results", len(documents), error=e)
+            for job, _ in done:
+                await self._reject(job.delivery, requeue=True)
+            return
+
+        self._stats.persisted += len(documents)
+        for job, _ in done:
+            await self.broker.ack(job.delivery)
+            self._stats.processed += 1
+
+    async def _reject(self, delivery: Delivery, requeue: bool) -> None:
+        await self.broker.nack(delivery, requeue=requeue)
+        if requeue:
+            self._stats.requeued += 1
+        else:
+            self._stats.dead_lettered += 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats = asdict(self._stats)
+        stats["batches_in_flight"] = len(self._tasks)
+        stats["average_batch_size"] = (
+            self._stats.received / self._stats.batches if self._stats.batches else 0.0
+        )
+        stats["broker"] = self.broker.stats()
+        return stats
+
+def create_result_store():
+    """
+    Build the result store from settings: the write-behind MongoDB analysis
+    store shared with the HTTP API, or an in-memory one.
+    """
+    if settings.ANALYSIS_RESULT_STORE == "memory":
+        return InMemoryResultStore()
+    return create_analysis_store(enabled=True)
+
+def create_analysis_consumer(registry, llm, cache, consultations, broker, store) -> AnalysisConsumer:
+    """
+    Build the consumer with handlers backed by the chat and health analysis services.
+
+    The services are created per batch, like the routers create them per
+    request; models, cache and LLM client are shared and not rebuilt.
+    """
+    from .chat_analysis import ChatAnalysisService
+    from .health_analysis import HealthAnalysisService
+
+    def handlers() -> Dict[str, AnalysisHandler]:
+        return {
+            "chat": ChatAnalysisService(registry, llm, cache, consultations).analyze_chat,
+            "health": HealthAnalysisService(registry, llm, cache).analyze_symptoms,
+        }
+
+    return AnalysisConsumer(
+        broker,
+        store,
+        {"chat": ChatAnalysisRequest, "health": HealthAnalysisRequest},
+        handlers,
+        batch_size=settings.ANALYSIS_BATCH_SIZE,
+        batch_wait_ms=settings.ANALYSIS_BATCH_WAIT_MS
+    )
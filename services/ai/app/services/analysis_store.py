@@ -0,0 +1,267 @@
+import asyncio
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def analysis_document(kind: str, result: BaseModel, _id: Optional[str] = None, **fields: Any) -> Dict[str, Any]:
+    """
+    Build the stored form of an analysis result.
+
+    ``analysis_id`` and ``consultation_id`` are lifted to the top level (a
+    medical report's ``report_id`` serves as its analysis id) so both can be
+    queried through their indexes. The document id defaults to the analysis id.
+    """
+    analysis_id = getattr(result, "analysis_id", None) or getattr(result, "report_id", None)
+    document = {
+        "_id": _id or analysis_id,
+        "analysis_id": analysis_id,
+        "consultation_id": getattr(result, "consultation_id", None),
+        "kind": kind,
+        **fields,
+        "result": result.model_dump(mode="json"),
+        "completed_at": datetime.utcnow()
+    }
+    return document
+
+@dataclass
+class StoreStats:
+    buffered: int = 0
+    flushes: int = 0
+    written: int = 0
+    flush_errors: int = 0
+    retried: int = 0
+    dropped: int = 0
+    backpressure_waits: int = 0
+    lookups: int = 0
+    buffer_hits: int = 0
+
+class _Entry:
+    __slots__ = ("document", "future", "attempts")
+
+    def __init__(self, document: Dict[str, Any], future: Optional[asyncio.Future]):
+        self.document = document
+        self.future = future
+        self.attempts = 0
+
+class AnalysisStore:
+    """
+    Write-behind store of analysis results in MongoDB.
+
+    ``save`` only appends the result to a bounded in-memory buffer, so it adds
+    no round trip to the request; a background task flushes the buffer with
+    one ``bulk_write`` whenever ``flush_size`` results are waiting or every
+    ``flush_interval_ms``. Writes are upserts on ``_id``, which makes retried
+    flushes and redelivered queue messages idempotent.
+
+    When the buffer is full, ``save`` waits for the next flush to make room
+    instead of growing without bound. ``save_many`` also waits until its
+    documents are written, for callers that must not acknowledge work before
+    it is durable (the analysis queue worker). A failed flush is retried once
+    for fire-and-forget results, then they are dropped and logged; waiting
+    callers get the error.
+
+    Lookups by analysis id (and by consultation) take a single query, served
+    from the buffer when the result has not been flushed yet.
+    """
+
+    def __init__(
+        self,
+        collection,
+        max_buffered: int = 5000,
+        flush_size: int = 200,
+        flush_interval_ms: float = 250.0,
+        max_attempts: int = 2
+    ):
+        self.collection = collection
+        self.max_buffered = max(1, max_buffered)
+        self.flush_size = max(1, min(flush_size, self.max_buffered))
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_attempts = max(1, max_attempts)
+        self._buffer: List[_Entry] = []
+        # Documents buffered or being written, by analysis id, for read-your-writes lookups
+        self._unflushed: Dict[str, Dict[str, Any]] = {}
+        self._stats = StoreStats()
+        self._indexes_created = False
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._has_room: Optional[asyncio.Event] = None
+        self._closing = False
+
+    async def start(self) -> None:
+        if self._flusher is None:
+            self._flush_requested = asyncio.Event()
+            self._has_room = asyncio.Event()
+            self._has_room.set()
+            self._closing = False
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """
+        Stop the flusher after writing everything still buffered.
+        """
+        if self._flusher is None:
+            return
+        self._closing = True
+        self._flush_requested.set()
+        await self._flusher
+        self._flusher = None
+
+    async def save(self, kind: str, result: BaseModel, **fields: Any) -> None:
+        """
+        Queue an analysis result for persistence; returns as soon as it is buffered.
+        """
+        await self._put(analysis_document(kind, result, **fields), wait=False)
+
+    async def save_many(self, documents: List[Dict[str, Any]]) -> None:
+        """
+        Queue prepared documents and wait until they are written.
+        """
+        futures = [await self._put(document, wait=True) for document in documents]
+        errors = [error for error in await asyncio.gather(*futures, return_exceptions=True) if error is not None]
+        if errors:
+            raise errors[0]
+
+    async def _put(self, document: Dict[str, Any], wait: bool) -> Optional[asyncio.Future]:
+        if self._flusher is None:
+            await self.start()
+        while len(self._buffer) >= self.max_buffered:
+            self._stats.backpressure_waits += 1
+            self._has_room.clear()
+            self._flush_requested.set()
+            await self._has_room.wait()
+
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self._buffer.append(_Entry(document, future))
+        if document.get("analysis_id"):
+            self._unflushed[document["analysis_id"]] = document
+        self._stats.buffered += 1
+        if len(self._buffer) >= self.flush_size:
+            self._flush_requested.set()
+        return future
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            while self._buffer:
+                written = await self._flush()
+                if not self._closing and (not written or len(self._buffer) < self.flush_size):
+                    break
+            if self._closing and not self._buffer:
+                return
+
+    async def _flush(self) -> bool:
+        from pymongo import ReplaceOne
+
+        batch = self._buffer[:self.flush_size]
+        del self._buffer[:len(batch)]
+        # The batch no longer counts against the buffer while it is written
+        self._has_room.set()
+        try:
+            await self._ensure_indexes()
+            await self.collection.bulk_write(
+                [ReplaceOne({"_id": entry.document["_id"]}, entry.document, upsert=True) for entry in batch],
+                ordered=False
+            )
+        except Exception as e:
+            self._stats.flush_errors += 1
+            logger.error("Failed to write %d analysis results", len(batch), error=e)
+            retry = self._settle_failed(batch, e)
+            # Retried results go back to the front so they keep their order
+            self._buffer[:0] = retry
+            self._stats.retried += len(retry)
+            if self._closing:
+                await asyncio.sleep(self.flush_interval)
+            written = False
+        else:
+            self._stats.flushes += 1
+            self._stats.written += len(batch)
+            for entry in batch:
+                self._forget(entry)
+                if entry.future is not None and not entry.future.done():
+                    entry.future.set_result(None)
+            written = True
+        return written
+
+    def _settle_failed(self, batch: List[_Entry], error: Exception) -> List[_Entry]:
+        retry = []
+        for entry in batch:
+            entry.attempts += 1
+            if entry.future is not None:
+                # The caller decides what to do (the queue worker requeues the message)
+                self._forget(entry)
+                if not entry.future.done():
+                    entry.future.set_exception(error)
+            elif entry.attempts < self.max_attempts:
+                retry.append(entry)
+            else:
+                self._forget(entry)
+                self._stats.dropped += 1
+        return retry
+
+    def _forget(self, entry: _Entry) -> None:
+        analysis_id = entry.document.get("analysis_id")
+        if analysis_id and self._unflushed.get(analysis_id) is entry.document:
+            del self._unflushed[analysis_id]
+
+    async def _ensure_indexes(self) -> None:
+        if not self._indexes_created:
+            await self.collection.create_index("analysis_id")
+            await self.collection.create_index([("consultation_id", 1), ("completed_at", -1)])
+            self._indexes_created = True
+
+    async def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored analysis with this id, or None.
+        """
+        self._stats.lookups += 1
+        document = self._unflushed.get(analysis_id)
+        if document is not None:
+            self._stats.buffer_hits += 1
+            return document
+        return await self.collection.find_one({"analysis_id": analysis_id})
+
+    async def find_by_consultation(self, consultation_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Return the latest analyses of a consultation, newest first.
+        """
+        self._stats.lookups += 1
+        buffered = [
+            document for document in self._unflushed.values()
+            if document.get("consultation_id") == consultation_id
+        ]
+        cursor = self.collection.find({"consultation_id": consultation_id}).sort("completed_at", -1).limit(limit)
+        stored = await cursor.to_list(length=limit)
+        seen = {document["_id"] for document in buffered}
+        documents = buffered + [document for document in stored if document["_id"] not in seen]
+        documents.sort(key=lambda document: document["completed_at"], reverse=True)
+        return documents[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = asdict(self._stats)
+        stats["pending"] = len(self._buffer)
+        stats["max_buffered"] = self.max_buffered
+        stats["flush_size"] = self.flush_size
+        return stats
+
+def create_analysis_store(enabled: Optional[bool] = None) -> Optional[AnalysisStore]:
+    """
+    Build the analysis store from settings; None when persistence is disabled.
+    """
+    if not (settings.ANALYSIS_STORE_ENABLED if enabled is None else enabled):
+        return None
+    from app.database import get_database
+    return AnalysisStore(
+        get_database()[settings.ANALYSIS_RESULTS_COLLECTION],
+        max_buffered=settings.ANALYSIS_STORE_MAX_BUFFERED,
+        flush_size=settings.ANALYSIS_STORE_FLUSH_SIZE,
+        flush_interval_ms=settings.ANALYSIS_STORE_FLUSH_INTERVAL_MS
+    )
@@ -0,0 +1,196 @@
+import asyncio
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sanara_common.inference_executor import InferenceExecutor
+from sanara_common.metrics import BATCH_DURATION, BATCH_SIZE
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Runs one batch of inputs with shared call options and returns one result per input
+BatchFunction = Callable[[List[Any], Dict[str, Any]], List[Any]]
+
+@dataclass
+class BatcherStats:
+    batches: int = 0
+    items: int = 0
+    errors: int = 0
+    max_observed_batch_size: int = 0
+    last_batch_size: int = 0
+    total_batch_seconds: float = 0.0
+
+@dataclass
+class _PendingItem:
+    item: Any
+    options: Dict[str, Any]
+    future: asyncio.Future
+
+class MicroBatcher:
+    """
+    Collects concurrent inference requests into batches.
+
+    The first request opens a collection window of ``max_wait_ms``; the batch
+    is dispatched when the window closes or ``max_batch_size`` items arrived,
+    whichever comes first. Requests with different call options are run as
+    separate batches.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        process_batch: BatchFunction,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        executor: Optional[InferenceExecutor] = None
+    ):
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stats = BatcherStats()
+
+    async def submit(self, item: Any, **options: Any) -> Any:
+        """
+        Queue one input and wait for its result.
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingItem(item, options, future))
+        return await future
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and not self._worker.done():
+            return
+        if self._worker is not None and not self._worker.cancelled() and self._worker.exception() is not None:
+            logger.error("Batcher worker for '%s' died", self.name, error=self._worker.exception())
+
+        # A new queue, since the old one may belong to a closed event loop; requests
+        # still waiting in it are handed to the new worker instead of hanging forever
+        loop = asyncio.get_running_loop()
+        previous, self._queue = self._queue, asyncio.Queue()
+        while previous is not None and not previous.empty():
+            pending = previous.get_nowait()
+            if not pending.future.done() and pending.future.get_loop() is loop:
+                self._queue.put_nowait(pending)
+        self._worker = asyncio.create_task(self._run(), name=f"batcher-{self.name}")
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                for group in self._group_by_options(batch).values():
+                    await self._dispatch(group)
+            except asyncio.CancelledError:
+                # Stopped mid-batch: callers of the batch in flight must not wait forever
+                self._fail(batch, RuntimeError(f"Batcher '{self.name}' was closed"))
+                raise
+            except Exception as e:
+                # Errors outside the batch function (e.g. unhashable options) fail
+                # only this batch; the worker keeps serving the queue
+                self._stats.errors += 1
+                logger.error("Batcher worker for '%s' failed a batch", self.name, error=e)
+                self._fail(batch, e)
+
+    @staticmethod
+    def _fail(batch: List[_PendingItem], error: Exception) -> None:
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_exception(error)
+
+    async def _collect(self) -> List[_PendingItem]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    @staticmethod
+    def _group_by_options(batch: List[_PendingItem]) -> Dict[Tuple, List[_PendingItem]]:
+        groups: Dict[Tuple, List[_PendingItem]] = {}
+        for pending in batch:
+            key = tuple(sorted(pending.options.items()))
+            groups.setdefault(key, []).append(pending)
+        return groups
+
+    async def _dispatch(self, group: List[_PendingItem]) -> None:
+        # Callers that gave up (e.g. timed out) no longer need a result
+        group = [pending for pending in group if not pending.future.done()]
+        if not group:
+            return
+
+        items = [pending.item for pending in group]
+        started = time.perf_counter()
+        try:
+            results = await self._execute(items, group[0].options)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"Batch function for '{self.name}' returned {len(results)} results for {len(items)} inputs"
+                )
+        except Exception as e:
+            self._stats.errors += 1
+            logger.error("Batch inference failed for '%s'", self.name, error=e)
+            self._fail(group, e)
+            return
+        finally:
+            seconds = time.perf_counter() - started
+            self._record_batch(len(items), seconds)
+            # Runs for every batch: sampled so debug level stays affordable under load
+            logger.debug("Batch of %d for '%s' ran in %.1fms", len(items), self.name, seconds * 1000)
+
+        for pending, result in zip(group, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    async def _execute(self, items: List[Any], options: Dict[str, Any]) -> List[Any]:
+        if self.executor is not None:
+            return await self.executor.run(self.process_batch, items, options)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.process_batch, items, options)
+
+    def _record_batch(self, size: int, seconds: float) -> None:
+        self._stats.batches += 1
+        self._stats.items += size
+        self._stats.last_batch_size = size
+        self._stats.max_observed_batch_size = max(self._stats.max_observed_batch_size, size)
+        self._stats.total_batch_seconds += seconds
+        BATCH_SIZE.observe(size, model=self.name)
+        BATCH_DURATION.observe(seconds, model=self.name)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = asdict(self._stats)
+        stats["queue_depth"] = self.queue_depth
+        stats["average_batch_size"] = (
+            self._stats.items / self._stats.batches if self._stats.batches else 0.0
+        )
+        return stats
+
+    async def close(self) -> None:
+        """
+        Stop the background worker and fail any requests still queued.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        while self._queue is not None and not self._queue.empty():
+            self._fail([self._queue.get_nowait()], RuntimeError(f"Batcher '{self.name}' was closed"))
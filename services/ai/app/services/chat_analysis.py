@@ -1,8 +1,6 @@
-from typing import List, Dict, Any
-import openai
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import uuid
-from app.config import settings
 from app.utils.logger import get_logger
 from app.models.chat import (
     Message,
@@ -14,28 +12,59 @@ from app.models.chat import (
     KeyPhrase,
     Entity
 )
-from .nlp_service import NLPService
+from .model_registry import ModelRegistry
+from .nlp_service import NLPService, Analysis
+from .stage_graph import Stage, StageGraph
+from .result_cache import ResultCache
+from .llm import LLMClient
+from .incremental_analysis import ConsultationStore, IncrementalChatAnalyzer
 
 logger = get_logger(__name__)
 
+# Analyses used for chat analysis; the summary comes from GPT, so BART is skipped
+CHAT_ANALYSES = frozenset({Analysis.ENTITIES, Analysis.KEY_PHRASES, Analysis.SENTIMENT})
+
+# Prompt template versions; bump when a prompt changes to invalidate cached completions
+INSIGHTS_TEMPLATE = "chat_insights:v1"
+SUMMARY_TEMPLATE = "chat_summary:v1"
+
 class ChatAnalysisService:
-    def __init__(self):
-        openai.api_key = settings.OPENAI_API_KEY
-        self.nlp_service = NLPService()
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        llm: LLMClient,
+        cache: Optional[ResultCache] = None,
+        consultations: Optional[ConsultationStore] = None
+    ):
+        self.llm = llm
+        self.cache = cache
+        self.nlp_service = NLPService(registry, cache)
+        self.incremental = IncrementalChatAnalyzer(self.nlp_service, consultations) if consultations else None
 
     async def analyze_chat(self, request: ChatAnalysisRequest) -> ChatAnalysisResponse:
         """
         Analyze chat messages using GPT and NLP services.
         """
         try:
-            # Prepare chat content for analysis
-            chat_text = self._prepare_chat_text(request.messages)
+            # Incremental mode only analyses messages appended since the last call
+            if request.incremental and self.incremental is not None:
+                lines = self._prepare_chat_lines(request.messages)
+                analyze_nlp = lambda: self.incremental.analyze(request.consultation_id, lines, CHAT_ANALYSES)
+            else:
+                chat_text = self._prepare_chat_text(request.messages)
+                analyze_nlp = lambda: self.nlp_service.analyze_text(chat_text, CHAT_ANALYSES)
             
-            # Perform NLP analysis
-            nlp_analysis = self.nlp_service.analyze_text(chat_text)
+            # Local NLP analysis and GPT insights are independent and run concurrently
+            graph = await StageGraph([
+                Stage("nlp", analyze_nlp),
+                Stage("llm", lambda: self._get_chat_insights(request))
+            ], "chat_analysis").run()
+            nlp_analysis = graph["nlp"]
+            insights = graph["llm"]
             
-            # Get GPT insights
-            insights = await self._get_chat_insights(request)
+            metadata = graph.metadata(nlp_analysis["timings_ms"])
+            if "incremental" in nlp_analysis:
+                metadata["incremental"] = nlp_analysis["incremental"]
             
             # Create response
             return ChatAnalysisResponse(
@@ -46,7 +75,8 @@ class ChatAnalysisService:
                 key_phrases=self._create_key_phrases(nlp_analysis["key_phrases"]),
                 entities=self._create_entities(nlp_analysis["entities"]),
                 summary=insights["summary"],
-                recommendations=insights["recommendations"]
+                recommendations=insights["recommendations"],
+                metadata=metadata
             )
         except Exception as e:
             logger.error("Failed to analyze chat", error=e)
@@ -60,17 +90,23 @@ class ChatAnalysisService:
             # Prepare chat content
             chat_text = self._prepare_chat_text(request.messages)
             
-            # Get GPT summary
-            summary = await self._generate_chat_summary(chat_text)
-            
-            # Extract highlights
-            highlights = self._extract_highlights(summary)
+            stages = [
+                # Get GPT summary, then extract its highlights
+                Stage("llm", lambda: self._generate_chat_summary(chat_text)),
+                Stage("highlights", lambda llm: self._extract_highlights(llm), depends_on=("llm",))
+            ]
+            # Analyze sentiment if requested, alongside the GPT call
+            if request.include_sentiment:
+                stages.append(Stage("nlp", lambda: self.nlp_service.analyze_text(chat_text, {Analysis.SENTIMENT})))
+            graph = await StageGraph(stages, "chat_summary").run()
             
-            # Analyze sentiment if requested
+            summary = graph["llm"]
+            highlights = graph["highlights"]
             sentiment = None
+            nlp_timings = {}
             if request.include_sentiment:
-                sentiment_analysis = self.nlp_service.analyze_sentiment(chat_text)
-                sentiment = self._create_sentiment_score(sentiment_analysis)
+                sentiment = self._create_sentiment_score(graph["nlp"]["sentiment"])
+                nlp_timings = graph["nlp"]["timings_ms"]
             
             return ChatSummaryResponse(
                 summary_id=str(uuid.uuid4()),
@@ -78,7 +114,8 @@ class ChatAnalysisService:
                 timestamp=datetime.utcnow(),
                 content=summary,
                 highlights=highlights,
-                sentiment=sentiment
+                sentiment=sentiment,
+                metadata=graph.metadata(nlp_timings)
             )
         except Exception as e:
             logger.error("Failed to generate chat summary", error=e)
@@ -88,11 +125,17 @@ class ChatAnalysisService:
         """
         Prepare chat messages for analysis.
         """
-        return "\n".join([
-            f"{msg.role}: {msg.content}"
+        return "\n".join(line for _, line in self._prepare_chat_lines(messages))
+
+    def _prepare_chat_lines(self, messages: List[Message]) -> List[Tuple[str, str]]:
+        """
+        Prepare one transcript line per text message, paired with the message id.
+        """
+        return [
+            (msg.id, f"{msg.role}: {msg.content}")
             for msg in messages
             if msg.type == "text"  # Only process text messages
-        ])
+        ]
 
     async def _get_chat_insights(self, request: ChatAnalysisRequest) -> Dict[str, Any]:
         """
@@ -103,18 +146,15 @@ class ChatAnalysisService:
             prompt = self._prepare_insights_prompt(request)
             
             # Get GPT response
-            response = await openai.ChatCompletion.acreate(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "Você é um assistente especializado em análise de conversas médicas."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=settings.TEMPERATURE,
-                max_tokens=settings.MAX_TOKENS
+            content = await self.llm.chat_completion(
+                "Você é um assistente especializado em análise de conversas médicas.",
+                prompt,
+                INSIGHTS_TEMPLATE,
+                self.cache
             )
             
             # Parse response
-            return self._parse_insights_response(response.choices[0].message.content)
+            return self._parse_insights_response(content)
         except Exception as e:
             logger.error("Failed to get chat insights", error=e)
             raise
@@ -124,17 +164,12 @@ class ChatAnalysisService:
         Generate a summary of the chat using GPT.
         """
         try:
-            response = await openai.ChatCompletion.acreate(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "Você é um assistente especializado em resumir conversas médicas."},
-                    {"role": "user", "content": f"Por favor, resuma a seguinte conversa médica de forma clara e concisa:\n\n{chat_text}"}
-                ],
-                temperature=settings.TEMPERATURE,
-                max_tokens=settings.MAX_TOKENS
+            return await self.llm.chat_completion(
+                "Você é um assistente especializado em resumir conversas médicas.",
+                f"Por favor, resuma a seguinte conversa médica de forma clara e concisa:\n\n{chat_text}",
+                SUMMARY_TEMPLATE,
+                self.cache
             )
-            
-            return response.choices[0].message.content
         except Exception as e:
             logger.error("Failed to generate chat summary", error=e)
             raise
@@ -234,25 +269,25 @@ Formate a resposta em JSON com as seguintes chaves:
             for entity in entities
         ]
 
-    def _extract_highlights(self, summary: str) -> List[str]:
+    async def _extract_highlights(self, summary: str) -> List[str]:
         """
         Extract key highlights from the summary.
         """
         try:
             # Use NLP to split summary into sentences
-            doc = self.nlp_service.nlp(summary)
+            sentences = await self.nlp_service.split_sentences(summary)
             
             # Select important sentences based on keywords
             highlights = []
             important_keywords = ["importante", "crucial", "essencial", "principal", "fundamental"]
             
-            for sent in doc.sents:
+            for sent in sentences:
                 # Check if sentence contains important keywords or is a key statement
                 if (
-                    any(keyword in sent.text.lower() for keyword in important_keywords) or
-                    sent.text.strip().endswith((".", "!")) and len(sent.text.split()) > 5
+                    any(keyword in sent.lower() for keyword in important_keywords) or
+                    sent.strip().endswith((".", "!")) and len(sent.split()) > 5
                 ):
-                    highlights.append(sent.text.strip())
+                    highlights.append(sent.strip())
             
             # Limit to top 5 highlights
             return highlights[:5]
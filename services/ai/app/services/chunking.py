@@ -0,0 +1,81 @@
+import copy
+import threading
+from dataclasses import dataclass
+from typing import Any, List
+
+# Tokenizers without a real limit report a huge sentinel as model_max_length
+_UNBOUNDED_MODEL_LENGTH = 100_000
+
+@dataclass
+class Chunk:
+    text: str
+    tokens: int
+
+class TokenChunker:
+    """
+    Packs sentences into chunks that fit a model's input limit.
+
+    Token counts come from the pipeline's own tokenizer, so chunks are never
+    truncated by the model. A sentence longer than the limit is split on token
+    boundaries.
+
+    Fast tokenizers are not safe to call from several threads at once, so the
+    chunker uses its own copy of the tokenizer behind a lock rather than the
+    instance the pipeline is using concurrently.
+    """
+
+    def __init__(self, tokenizer: Any, max_tokens: int):
+        self.tokenizer = tokenizer
+        self.max_tokens = max(1, max_tokens)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_pipeline(cls, pipeline: Any, default_max_tokens: int) -> "TokenChunker":
+        return cls.for_tokenizer(copy.deepcopy(pipeline.tokenizer), default_max_tokens)
+
+    @classmethod
+    def for_tokenizer(cls, tokenizer: Any, default_max_tokens: int) -> "TokenChunker":
+        limit = tokenizer.model_max_length
+        if not limit or limit > _UNBOUNDED_MODEL_LENGTH:
+            limit = default_max_tokens
+        # Leave room for the special tokens the pipeline adds ([CLS], </s>, ...)
+        return cls(tokenizer, limit - tokenizer.num_special_tokens_to_add())
+
+    def count(self, text: str) -> int:
+        with self._lock:
+            return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def chunk(self, sentences: List[str]) -> List[Chunk]:
+        sentences = [sentence.strip() for sentence in sentences if sentence.strip()]
+        if not sentences:
+            return []
+
+        with self._lock:
+            token_ids = self.tokenizer(sentences, add_special_tokens=False)["input_ids"]
+        chunks: List[Chunk] = []
+        current: List[str] = []
+        current_tokens = 0
+
+        def flush() -> None:
+            nonlocal current, current_tokens
+            if current:
+                chunks.append(Chunk(" ".join(current), current_tokens))
+                current, current_tokens = [], 0
+
+        for sentence, ids in zip(sentences, token_ids):
+            if len(ids) > self.max_tokens:
+                flush()
+                for start in range(0, len(ids), self.max_tokens):
+                    window = ids[start:start + self.max_tokens]
+                    with self._lock:
+                        text = self.tokenizer.decode(window, skip_special_tokens=True)
+                    chunks.append(Chunk(text, len(window)))
+                continue
+
+            if current_tokens + len(ids) > self.max_tokens:
+                flush()
+            current.append(sentence)
+            current_tokens += len(ids)
+
+        flush()
+        return chunks
@@ -1,8 +1,6 @@
-from typing import List, Dict, Any
-import openai
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 import uuid
-from app.config import settings
 from app.utils.logger import get_logger
 from app.models.health import (
     Symptom,
@@ -13,39 +11,42 @@ from app.models.health import (
     MedicalReportResponse,
     Severity
 )
-from .nlp_service import NLPService
+from .model_registry import ModelRegistry
+from .nlp_service import NLPService, Analysis
+from .stage_graph import Stage, StageGraph
+from .result_cache import ResultCache
+from .llm import LLMClient
 
 logger = get_logger(__name__)
 
+DEFAULT_RECOMMENDATION = "Consulte um profissional de saúde para recomendações específicas."
+
+# Prompt template versions; bump when a prompt changes to invalidate cached completions
+SYMPTOM_ANALYSIS_TEMPLATE = "symptom_analysis:v1"
+MEDICAL_REPORT_TEMPLATE = "medical_report:v1"
+
 class HealthAnalysisService:
-    def __init__(self):
-        openai.api_key = settings.OPENAI_API_KEY
-        self.nlp_service = NLPService()
+    def __init__(self, registry: ModelRegistry, llm: LLMClient, cache: Optional[ResultCache] = None):
+        self.llm = llm
+        self.cache = cache
+        self.nlp_service = NLPService(registry, cache)
 
     async def analyze_symptoms(self, request: HealthAnalysisRequest) -> HealthAnalysisResponse:
         """
         Analyze symptoms using GPT and NLP services.
         """
         try:
-            # Extract medical entities from the description
-            medical_analysis = self.nlp_service.analyze_medical_text(request.symptoms_description)
-            
-            # Prepare prompt for GPT
-            prompt = self._prepare_analysis_prompt(request, medical_analysis)
-            
-            # Get GPT analysis
-            response = await openai.ChatCompletion.acreate(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "Você é um assistente médico especializado em análise de sintomas."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=settings.TEMPERATURE,
-                max_tokens=settings.MAX_TOKENS
-            )
-            
-            # Parse GPT response
-            analysis = self._parse_gpt_response(response.choices[0].message.content)
+            # The GPT prompt includes the extracted symptoms, so the stages run in sequence
+            graph = await StageGraph([
+                # Extract medical entities from the description; only the symptoms are used
+                Stage("nlp", lambda: self.nlp_service.analyze_medical_text(
+                    request.symptoms_description,
+                    {Analysis.ENTITIES}
+                )),
+                Stage("llm", lambda nlp: self._get_symptom_analysis(request, nlp), depends_on=("nlp",))
+            ], "symptom_analysis").run()
+            medical_analysis = graph["nlp"]
+            analysis = graph["llm"]
             
             # Create response
             return HealthAnalysisResponse(
@@ -53,7 +54,8 @@ class HealthAnalysisService:
                 timestamp=datetime.utcnow(),
                 symptoms=self._create_symptoms(medical_analysis["symptoms"], analysis),
                 possible_conditions=self._create_conditions(analysis),
-                recommendations=analysis.get("recommendations", [])
+                recommendations=analysis.get("recommendations", []),
+                metadata=graph.metadata(medical_analysis["timings_ms"])
             )
         except Exception as e:
             logger.error("Failed to analyze symptoms", error=e)
@@ -64,41 +66,60 @@ class HealthAnalysisService:
         Generate a medical report using GPT.
         """
         try:
-            # Prepare prompt for GPT
-            prompt = self._prepare_report_prompt(request)
-            
-            # Get GPT response
-            response = await openai.ChatCompletion.acreate(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "Você é um médico especializado em elaborar relatórios médicos detalhados."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=settings.TEMPERATURE,
-                max_tokens=settings.MAX_TOKENS
-            )
-            
-            # Parse GPT response
-            report_content = response.choices[0].message.content
-            
-            # Generate summary
-            summary = self.nlp_service.summarize_text(report_content)
-            
-            # Extract recommendations
-            recommendations = self._extract_recommendations(report_content)
+            # Summary and recommendations both read the GPT report but not each other
+            graph = await StageGraph([
+                Stage("llm", lambda: self._get_report_content(request)),
+                Stage("summary", lambda llm: self.nlp_service.summarize_text(llm), depends_on=("llm",)),
+                Stage(
+                    "recommendations",
+                    lambda llm: self._extract_recommendations(llm),
+                    depends_on=("llm",),
+                    required=False,
+                    fallback=[DEFAULT_RECOMMENDATION]
+                )
+            ], "medical_report").run()
             
             return MedicalReportResponse(
                 report_id=str(uuid.uuid4()),
                 consultation_id=request.consultation_id,
                 timestamp=datetime.utcnow(),
-                content=report_content,
-                summary=summary,
-                recommendations=recommendations
+                content=graph["llm"],
+                summary=graph["summary"],
+                recommendations=graph["recommendations"],
+                metadata=graph.metadata()
             )
         except Exception as e:
             logger.error("Failed to generate medical report", error=e)
             raise
 
+    async def _get_symptom_analysis(self, request: HealthAnalysisRequest, medical_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the structured symptom analysis from GPT.
+        """
+        prompt = self._prepare_analysis_prompt(request, medical_analysis)
+        
+        content = await self.llm.chat_completion(
+            "Você é um assistente médico especializado em análise de sintomas.",
+            prompt,
+            SYMPTOM_ANALYSIS_TEMPLATE,
+            self.cache
+        )
+        
+        return self._parse_gpt_response(content)
+
+    async def _get_report_content(self, request: MedicalReportRequest) -> str:
+        """
+        Get the medical report text from GPT.
+        """
+        prompt = self._prepare_report_prompt(request)
+        
+        return await self.llm.chat_completion(
+            "Você é um médico especializado em elaborar relatórios médicos detalhados.",
+            prompt,
+            MEDICAL_REPORT_TEMPLATE,
+            self.cache
+        )
+
     def _prepare_analysis_prompt(self, request: HealthAnalysisRequest, medical_analysis: Dict[str, Any]) -> str:
         """
         Prepare the prompt for symptom analysis.
@@ -252,21 +273,21 @@ O relatório deve ser claro, profissional e detalhado."""
             )
         return conditions
 
-    def _extract_recommendations(self, report_content: str) -> List[str]:
+    async def _extract_recommendations(self, report_content: str) -> List[str]:
         """
         Extract recommendations from report content.
         """
         try:
             # Use NLP to identify recommendation sentences
-            doc = self.nlp_service.nlp(report_content)
+            sentences = await self.nlp_service.split_sentences(report_content)
             recommendations = []
             
-            for sent in doc.sents:
+            for sent in sentences:
                 # Look for recommendation patterns
-                if any(keyword in sent.text.lower() for keyword in ["recomend", "suger", "aconselh", "indic"]):
-                    recommendations.append(sent.text.strip())
+                if any(keyword in sent.lower() for keyword in ["recomend", "suger", "aconselh", "indic"]):
+                    recommendations.append(sent.strip())
             
-            return recommendations if recommendations else ["Consulte um profissional de saúde para recomendações específicas."]
+            return recommendations if recommendations else [DEFAULT_RECOMMENDATION]
         except Exception as e:
             logger.error("Failed to extract recommendations", error=e)
-            return ["Consulte um profissional de saúde para recomendações específicas."] 
\ No newline at end of file
+            return [DEFAULT_RECOMMENDATION] 
\ No newline at end of file
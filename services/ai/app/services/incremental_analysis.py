@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from app.config import settings
+from .nlp_service import NLPService, Analysis
+from .result_cache import LRUCache
+
+@dataclass
+class ConsultationState:
+    """
+    Per-message analysis results of a consultation, in transcript order.
+    Offsets in each result are relative to the message's own line.
+    """
+    message_keys: List[str] = field(default_factory=list)
+    results: List[Dict[str, Any]] = field(default_factory=list)
+
+class ConsultationStore:
+    """
+    Bounded in-process store of consultation states with LRU eviction and TTL.
+    """
+
+    def __init__(self, max_consultations: int = 1000, ttl_seconds: float = 14400):
+        self._states = LRUCache(max_entries=max_consultations, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def _key(consultation_id: str, analyses: FrozenSet[Analysis]) -> str:
+        return f"{consultation_id}:{','.join(sorted(analysis.value for analysis in analyses))}"
+
+    def get(self, consultation_id: str, analyses: FrozenSet[Analysis]) -> Optional[ConsultationState]:
+        found, state = self._states.get(self._key(consultation_id, analyses))
+        return state if found else None
+
+    def save(self, consultation_id: str, analyses: FrozenSet[Analysis], state: ConsultationState) -> None:
+        self._states.set(self._key(consultation_id, analyses), state)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "consultations": len(self._states),
+            "max_consultations": self._states.max_entries,
+            "evictions": self._states.evictions,
+            "expirations": self._states.expirations
+        }
+
+def message_key(message_id: str, line: str) -> str:
+    """
+    Identify a message by id and content, so an edited message is re-analysed.
+    """
+    return hashlib.sha1(f"{message_id}\0{line}".encode("utf-8")).hexdigest()
+
+class IncrementalChatAnalyzer:
+    """
+    Analyses a growing consultation transcript message by message.
+
+    Results for the messages already seen are kept per consultation; each call
+    only analyses the messages appended (or changed) since the previous one and
+    merges all per-message results into the shape returned by
+    ``NLPService.analyze_text``. Entity offsets are shifted so they refer to the
+    joined transcript. Sentiment is the length-weighted mean of the messages.
+    """
+
+    def __init__(self, nlp_service: NLPService, store: ConsultationStore):
+        self.nlp_service = nlp_service
+        self.store = store
+
+    async def analyze(
+        self,
+        consultation_id: str,
+        lines: List[Tuple[str, str]],
+        analyses: FrozenSet[Analysis]
+    ) -> Dict[str, Any]:
+        """
+        Analyse ``lines`` (pairs of message id and transcript line) for a consultation.
+        """
+        analyses = frozenset(analyses)
+        keys = [message_key(message_id, line) for message_id, line in lines]
+        state = self.store.get(consultation_id, analyses) or ConsultationState()
+
+        # Reuse results up to the first message that differs from the stored transcript
+        reused = 0
+        for stored_key, key in zip(state.message_keys, keys):
+            if stored_key != key:
+                break
+            reused += 1
+
+        new_results = await asyncio.gather(*[
+            self.nlp_service.analyze_text(line, analyses)
+            for _, line in lines[reused:]
+        ])
+
+        results = state.results[:reused] + list(new_results)
+        self.store.save(consultation_id, analyses, ConsultationState(keys, results))
+
+        merged = self._merge([line for _, line in lines], results, analyses)
+        merged["timings_ms"] = self._merge_timings(new_results)
+        merged["incremental"] = {"new_messages": len(new_results), "reused_messages": reused}
+        return merged
+
+    @staticmethod
+    def _merge(lines: List[str], results: List[Dict[str, Any]], analyses: FrozenSet[Analysis]) -> Dict[str, Any]:
+        merged: Dict[str, Any] = {}
+        if Analysis.ENTITIES in analyses:
+            merged["entities"] = []
+        if Analysis.KEY_PHRASES in analyses:
+            merged["key_phrases"] = []
+
+        sentiment_totals = {"positive": 0.0, "neutral": 0.0, "negative": 0.0}
+        total_weight = 0
+
+        offset = 0
+        for line, result in zip(lines, results):
+            if Analysis.ENTITIES in analyses:
+                merged["entities"].extend(
+                    {**entity, "start": entity["start"] + offset, "end": entity["end"] + offset}
+                    for entity in result["entities"]
+                )
+            if Analysis.KEY_PHRASES in analyses:
+                merged["key_phrases"].extend(result["key_phrases"])
+            if Analysis.SENTIMENT in analyses and line:
+                for label in sentiment_totals:
+                    sentiment_totals[label] += result["sentiment"].get(label, 0.0) * len(line)
+                total_weight += len(line)
+            # Lines are joined with a newline in the transcript
+            offset += len(line) + 1
+
+        if Analysis.SENTIMENT in analyses:
+            merged["sentiment"] = {
+                label: total / total_weight if total_weight else 0.0
+                for label, total in sentiment_totals.items()
+            }
+        return merged
+
+    @staticmethod
+    def _merge_timings(results: List[Dict[str, Any]]) -> Dict[str, float]:
+        # Messages are analysed concurrently, so report the slowest per stage
+        timings: Dict[str, float] = {}
+        for result in results:
+            for stage, ms in result["timings_ms"].items():
+                timings[stage] = max(timings.get(stage, 0.0), ms)
+        return timings
+
+def create_consultation_store() -> ConsultationStore:
+    return ConsultationStore(
+        max_consultations=settings.INCREMENTAL_MAX_CONSULTATIONS,
+        ttl_seconds=settings.INCREMENTAL_TTL_SECONDS
+    )
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+from typing import Any, List, Optional
+from sanara_common import inference_engine as engines
+from sanara_common.inference_engine import (  # noqa: F401 - re-exported with the settings-aware helpers
+    ENGINES,
+    ONNX,
+    ONNX_INT8,
+    PYTORCH,
+    ParityReport,
+    compare_outputs,
+)
+from app.config import settings
+
+def resolve_engine(engine: Optional[str]) -> str:
+    """
+    Return the engine to use, falling back to ``INFERENCE_ENGINE`` when unset.
+    """
+    return engines.resolve_engine(engine, settings.INFERENCE_ENGINE)
+
+def onnx_model_dir(model: str, engine: str, cache_dir: Optional[str] = None) -> Path:
+    """
+    Return the directory holding the exported graph of ``model`` for ``engine``.
+    """
+    return engines.onnx_model_dir(model, engine, cache_dir or settings.ONNX_CACHE_DIR)
+
+def export_onnx(task: str, model: str, engine: str, cache_dir: Optional[str] = None) -> Path:
+    """
+    Export ``model`` for ``engine`` into ``ONNX_CACHE_DIR`` unless already cached.
+    """
+    return engines.export_onnx(task, model, engine, cache_dir or settings.ONNX_CACHE_DIR)
+
+def load_pipeline(task: str, model: str, engine: Optional[str] = None, cache_dir: Optional[str] = None) -> Any:
+    """
+    Build a transformers pipeline for ``task`` backed by the requested engine.
+    """
+    return engines.load_pipeline(
+        task,
+        model,
+        resolve_engine(engine),
+        cache_dir=cache_dir or settings.ONNX_CACHE_DIR,
+        intra_op_threads=settings.ONNX_INTRA_OP_THREADS
+    )
+
+def check_parity(task: str, model: str, engine: str, texts: List[str], cache_dir: Optional[str] = None) -> ParityReport:
+    """
+    Compare ``engine`` against the PyTorch baseline on ``texts``.
+    """
+    return engines.check_parity(
+        task, model, engine, texts, cache_dir or settings.ONNX_CACHE_DIR, settings.ONNX_INTRA_OP_THREADS
+    )
+
+def main(argv: Optional[List[str]] = None) -> int:
+    return engines.main(argv, settings.ONNX_CACHE_DIR, settings.ONNX_INTRA_OP_THREADS)
+
+if __name__ == "__main__":
+    sys.exit(main())
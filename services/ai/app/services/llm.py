@@ -0,0 +1,243 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+import httpx
+from app.config import settings
+from app.utils.logger import get_logger
+from .result_cache import ResultCache, cache_key, normalize_text
+
+logger = get_logger(__name__)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class LLMError(Exception):
+    """
+    Raised when a chat completion fails after all retries.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at ``per_minute`` tokens per minute.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self._tokens = per_minute
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1) -> None:
+        # Requests larger than the bucket would wait forever; cap them at capacity
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+@dataclass
+class LLMStats:
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    retries: int = 0
+    in_flight: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_latency_seconds: float = 0.0
+    max_latency_seconds: float = 0.0
+
+class LLMClient:
+    """
+    Shared async client for the OpenAI chat completions API.
+
+    One pooled HTTP/1.1 keep-alive connection pool serves every service. Calls
+    are bounded by a concurrency semaphore and optional request/token rate
+    limits, retried with jittered exponential backoff on 429/5xx and network
+    errors, and each attempt has its own timeout. ``base_url`` and
+    ``transport`` can point the client at a local stub server in tests.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: str = "https://api.openai.com/v1",
+        max_concurrency: int = 8,
+        max_connections: int = 20,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 3,
+        retry_backoff_seconds: float = 0.5,
+        timeout_seconds: float = 60.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.model = model
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout_seconds,
+            transport=transport
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._stats = LLMStats()
+        self._status_codes: Dict[int, int] = {}
+
+    async def chat_completion(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        template: str,
+        cache: Optional[ResultCache] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        Run a chat completion and return the message content.
+
+        ``template`` names the prompt template and its version (e.g.
+        "chat_insights:v1"); bump the version whenever the template changes so
+        cached completions of the old prompt are no longer served.
+        """
+        temperature = settings.TEMPERATURE if temperature is None else temperature
+        max_tokens = settings.MAX_TOKENS if max_tokens is None else max_tokens
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+
+        async def complete() -> str:
+            response = await self._request(payload)
+            return response["choices"][0]["message"]["content"]
+
+        if cache is None:
+            return await complete()
+
+        key = cache_key(
+            "llm",
+            template=template,
+            model=self.model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system=normalize_text(system_prompt),
+            prompt=normalize_text(user_prompt)
+        )
+        return await cache.get_or_compute(key, complete)
+
+    @staticmethod
+    def _estimate_tokens(payload: Dict[str, Any]) -> int:
+        # Roughly four characters per token, plus the completion budget
+        characters = sum(len(message["content"]) for message in payload["messages"])
+        return characters // 4 + payload["max_tokens"]
+
+    async def _request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self._stats.requests += 1
+        attempt = 0
+        while True:
+            if self._request_bucket is not None:
+                await self._request_bucket.acquire()
+            if self._token_bucket is not None:
+                await self._token_bucket.acquire(self._estimate_tokens(payload))
+
+            retry_after: Optional[float] = None
+            error: Exception
+            started = time.perf_counter()
+            async with self._semaphore:
+                self._stats.in_flight += 1
+                try:
+                    response = await self._client.post("/chat/completions", json=payload, timeout=self.timeout_seconds)
+                    self._status_codes[response.status_code] = self._status_codes.get(response.status_code, 0) + 1
+                    if response.status_code < 400:
+                        body = response.json()
+                        self._record_success(time.perf_counter() - started, body.get("usage", {}))
+                        return body
+                    error = LLMError(
+                        f"Chat completion failed with status {response.status_code}: {response.text[:200]}",
+                        response.status_code
+                    )
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        self._stats.failures += 1
+                        raise error
+                    retry_after = self._parse_retry_after(response.headers.get("retry-after"))
+                except httpx.TransportError as e:
+                    error = LLMError(f"Chat completion request failed: {e!r}")
+                finally:
+                    self._stats.in_flight -= 1
+
+            if attempt >= self.max_retries:
+                self._stats.failures += 1
+                raise error
+
+            # Full jitter spreads out clients that were throttled together
+            delay = random.uniform(0, self.retry_backoff_seconds * 2 ** attempt)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            attempt += 1
+            self._stats.retries += 1
+            logger.warning("Retrying chat completion in %.2fs (attempt %d): %s", delay, attempt, error)
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    def _record_success(self, seconds: float, usage: Dict[str, Any]) -> None:
+        self._stats.successes += 1
+        self._stats.total_latency_seconds += seconds
+        self._stats.max_latency_seconds = max(self._stats.max_latency_seconds, seconds)
+        self._stats.prompt_tokens += usage.get("prompt_tokens", 0)
+        self._stats.completion_tokens += usage.get("completion_tokens", 0)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = asdict(self._stats)
+        stats["status_codes"] = dict(self._status_codes)
+        stats["average_latency_seconds"] = (
+            self._stats.total_latency_seconds / self._stats.successes if self._stats.successes else 0.0
+        )
+        return stats
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+def create_llm_client() -> LLMClient:
+    """
+    Build the shared LLM client from settings.
+    """
+    return LLMClient(
+        api_key=settings.OPENAI_API_KEY,
+        model=settings.OPENAI_MODEL,
+        base_url=settings.OPENAI_BASE_URL,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+        max_retries=settings.LLM_MAX_RETRIES,
+        retry_backoff_seconds=settings.LLM_RETRY_BACKOFF_SECONDS,
+        timeout_seconds=settings.LLM_TIMEOUT_SECONDS
+    )
@@ -0,0 +1,191 @@
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+@dataclass
+class Delivery:
+    """
+    One message received from a queue, acknowledged through the broker that delivered it.
+    """
+    body: bytes
+    delivery_tag: int
+    redelivered: bool = False
+    headers: Dict[str, Any] = field(default_factory=dict)
+    # The broker's own message object (an aio-pika IncomingMessage for RabbitMQ)
+    message: Any = None
+
+class InMemoryBroker:
+    """
+    In-process stand-in for a RabbitMQ queue, for tests and local runs.
+
+    Mirrors the semantics the consumer relies on: at most ``prefetch``
+    unacknowledged deliveries, requeued messages come back flagged as
+    redelivered, and rejected messages without requeue go to the dead-letter
+    list, as the queue's dead-letter exchange would route them.
+    """
+
+    def __init__(self, prefetch: int = 10):
+        self.prefetch = max(1, prefetch)
+        self.dead_letters: List[Delivery] = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._unacked: Dict[int, Delivery] = {}
+        self._tags = itertools.count(1)
+        self.published = 0
+        self.acked = 0
+        self.requeued = 0
+
+    async def connect(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.prefetch)
+
+    async def publish(self, body: bytes, headers: Optional[Dict[str, Any]] = None) -> None:
+        await self.connect()
+        self.published += 1
+        self._queue.put_nowait((body, headers or {}, False))
+
+    async def get(self) -> Delivery:
+        """
+        Wait for the next message, holding it as unacknowledged until it is acked or nacked.
+        """
+        await self.connect()
+        await self._slots.acquire()
+        try:
+            body, headers, redelivered = await self._queue.get()
+        except BaseException:
+            self._slots.release()
+            raise
+        delivery = Delivery(body, next(self._tags), redelivered, headers)
+        self._unacked[delivery.delivery_tag] = delivery
+        return delivery
+
+    def _settle(self, delivery: Delivery) -> None:
+        if self._unacked.pop(delivery.delivery_tag, None) is None:
+            raise ValueError(f"Delivery {delivery.delivery_tag} is not pending")
+        self._slots.release()
+
+    async def ack(self, delivery: Delivery) -> None:
+        self._settle(delivery)
+        self.acked += 1
+
+    async def nack(self, delivery: Delivery, requeue: bool) -> None:
+        self._settle(delivery)
+        if requeue:
+            self.requeued += 1
+            self._queue.put_nowait((delivery.body, delivery.headers, True))
+        else:
+            self.dead_letters.append(delivery)
+
+    @property
+    def pending(self) -> int:
+        """
+        Messages waiting in the queue or delivered and not yet settled.
+        """
+        return (self._queue.qsize() if self._queue is not None else 0) + len(self._unacked)
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "broker": "memory",
+            "published": self.published,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "unacked": len(self._unacked),
+            "acked": self.acked,
+            "requeued": self.requeued,
+            "dead_lettered": len(self.dead_letters)
+        }
+
+class RabbitMQBroker:
+    """
+    Consumer of one RabbitMQ queue through aio-pika.
+
+    The queue is expected to exist already: the message broker service
+    declares it with its dead-letter exchange, so it is only looked up
+    (passively) here. ``prefetch`` is applied as the channel QoS, which
+    bounds the unacknowledged deliveries held by this worker.
+    """
+
+    def __init__(self, url: str, queue: str, prefetch: int = 10):
+        self.url = url
+        self.queue_name = queue
+        self.prefetch = max(1, prefetch)
+        self._connection = None
+        self._channel = None
+        self._deliveries: Optional[asyncio.Queue] = None
+        self._tags = itertools.count(1)
+        self.received = 0
+        self.acked = 0
+        self.requeued = 0
+        self.dead_lettered = 0
+
+    async def connect(self) -> None:
+        if self._connection is not None:
+            return
+        import aio_pika
+
+        self._deliveries = asyncio.Queue()
+        self._connection = await aio_pika.connect_robust(self.url)
+        self._channel = await self._connection.channel()
+        await self._channel.set_qos(prefetch_count=self.prefetch)
+        queue = await self._channel.get_queue(self.queue_name, ensure=True)
+        await queue.consume(self._on_message)
+        logger.info("Consuming '%s' with prefetch %d", self.queue_name, self.prefetch)
+
+    async def _on_message(self, message: Any) -> None:
+        self.received += 1
+        await self._deliveries.put(Delivery(
+            body=message.body,
+            delivery_tag=next(self._tags),
+            redelivered=bool(message.redelivered),
+            headers=dict(message.headers or {}),
+            message=message
+        ))
+
+    async def get(self) -> Delivery:
+        await self.connect()
+        return await self._deliveries.get()
+
+    async def ack(self, delivery: Delivery) -> None:
+        await delivery.message.ack()
+        self.acked += 1
+
+    async def nack(self, delivery: Delivery, requeue: bool) -> None:
+        # Without requeue, the queue's dead-letter exchange routes the message to the DLQ
+        await delivery.message.nack(requeue=requeue)
+        if requeue:
+            self.requeued += 1
+        else:
+            self.dead_lettered += 1
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "broker": "rabbitmq",
+            "queue": self.queue_name,
+            "prefetch": self.prefetch,
+            "received": self.received,
+            "buffered": self._deliveries.qsize() if self._deliveries is not None else 0,
+            "acked": self.acked,
+            "requeued": self.requeued,
+            "dead_lettered": self.dead_lettered
+        }
+
+def create_broker():
+    """
+    Build the broker from settings; ``BROKER_URL=memory://`` selects the in-memory stand-in.
+    """
+    if settings.BROKER_URL.startswith("memory://"):
+        return InMemoryBroker(prefetch=settings.ANALYSIS_PREFETCH)
+    return RabbitMQBroker(settings.BROKER_URL, settings.ANALYSIS_QUEUE, prefetch=settings.ANALYSIS_PREFETCH)
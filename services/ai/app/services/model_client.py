@@ -0,0 +1,83 @@
+from typing import Any, Dict, Optional
+from sanara_common import model_server
+from sanara_common.inference_executor import InferenceExecutor
+from app.config import settings
+from .chunking import TokenChunker
+from .model_registry import ModelRegistry, pipeline_specs
+
+class ModelServerClient(model_server.ModelServerClient):
+    """
+    Model server client with the timeout and frame limit of the settings.
+    """
+
+    def __init__(self, path: str, timeout_seconds: Optional[float] = None):
+        super().__init__(
+            path,
+            timeout_seconds or settings.MODEL_SERVER_TIMEOUT_SECONDS,
+            settings.MODEL_SERVER_MAX_FRAME_BYTES
+        )
+
+class RemoteBatcher:
+    """
+    Stand-in for a MicroBatcher whose model lives on the model server.
+
+    Batching happens on the server, across the requests of every worker.
+    """
+
+    def __init__(self, name: str, client: ModelServerClient):
+        self.name = name
+        self.client = client
+        self.items = 0
+
+    async def submit(self, item: Any, **options: Any) -> Any:
+        self.items += 1
+        return (await self.client.infer(self.name, [item], options))[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"remote": True, "items": self.items}
+
+    async def close(self) -> None:
+        pass
+
+def _tokenizer_loader(model: str):
+    def load():
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(model)
+    return load
+
+class RemoteModelRegistry(ModelRegistry):
+    """
+    Registry of an HTTP worker backed by a model server.
+
+    Only the tokenizers are loaded locally, to size chunks before they are
+    sent; pipelines and spaCy run on the server.
+    """
+
+    remote = True
+
+    def __init__(self, client: ModelServerClient, executor: Optional[InferenceExecutor] = None):
+        super().__init__(executor)
+        self.client = client
+
+    def batcher(self, name: str) -> RemoteBatcher:
+        batcher = self._batchers.get(name)
+        if batcher is None:
+            batcher = RemoteBatcher(name, self.client)
+            self._batchers[name] = batcher
+        return batcher
+
+    def chunker(self, name: str) -> TokenChunker:
+        chunker = self._chunkers.get(name)
+        if chunker is None:
+            chunker = TokenChunker.for_tokenizer(self.get(name), settings.CHUNK_DEFAULT_MAX_TOKENS)
+            self._chunkers[name] = chunker
+        return chunker
+
+def create_remote_model_registry(client: ModelServerClient, executor: Optional[InferenceExecutor] = None) -> RemoteModelRegistry:
+    """
+    Build a registry holding the pipeline tokenizers, with inference on the model server.
+    """
+    registry = RemoteModelRegistry(client, executor)
+    for name, _, model, _ in pipeline_specs():
+        registry.register(name, _tokenizer_loader(model), engine="remote")
+    return registry
@@ -0,0 +1,223 @@
+import threading
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from sanara_common.inference_executor import InferenceExecutor
+from sanara_common.process import current_rss_bytes
+from app.config import settings
+from app.utils.logger import get_logger
+from .batching import MicroBatcher
+from .chunking import TokenChunker
+from .inference_engine import load_pipeline, resolve_engine
+
+logger = get_logger(__name__)
+
+ModelLoader = Callable[[], Any]
+
+@dataclass
+class ModelStats:
+    name: str
+    engine: Optional[str] = None
+    loaded: bool = False
+    load_time_seconds: float = 0.0
+    resident_bytes: int = 0
+    loaded_at: Optional[datetime] = None
+
+class ModelRegistry:
+    """
+    Process-wide registry of NLP models.
+
+    Each model is loaded at most once per worker and shared by every service
+    that asks for it. Load time and the resident memory added by each load
+    are recorded so they can be exposed by the API.
+    """
+
+    # True when inference runs on a separate model server (see model_client.py)
+    remote = False
+
+    def __init__(self, executor: Optional[InferenceExecutor] = None):
+        # Executor that runs every blocking call on the registered models
+        self.executor = executor or InferenceExecutor()
+        self._loaders: Dict[str, ModelLoader] = {}
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, ModelStats] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._batchers: Dict[str, MicroBatcher] = {}
+        self._chunkers: Dict[str, TokenChunker] = {}
+        self._engines: Dict[str, Optional[str]] = {}
+
+    def register(self, name: str, loader: ModelLoader, engine: Optional[str] = None) -> None:
+        """
+        Register a loader for a model. The model is not loaded until requested.
+        """
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+        self._engines[name] = engine
+        self._stats[name] = ModelStats(name=name, engine=engine)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._loaders)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def get(self, name: str) -> Any:
+        """
+        Return the model registered under ``name``, loading it on first use.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"Model '{name}' is not registered")
+
+        with self._locks[name]:
+            # Another thread may have loaded it while we waited for the lock
+            if name in self._models:
+                return self._models[name]
+
+            logger.info("Loading model '%s'", name)
+            rss_before = current_rss_bytes()
+            started = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                logger.error("Failed to load model '%s'", name, error=e)
+                raise
+
+            stats = self._stats[name]
+            stats.loaded = True
+            stats.load_time_seconds = time.perf_counter() - started
+            stats.resident_bytes = max(current_rss_bytes() - rss_before, 0)
+            stats.loaded_at = datetime.utcnow()
+            self._models[name] = model
+
+            logger.info(
+                "Model '%s' loaded in %.2fs (+%.1f MiB resident)",
+                name, stats.load_time_seconds, stats.resident_bytes / 2**20
+            )
+            return model
+
+    def load_all(self) -> None:
+        """
+        Eagerly load every registered model.
+        """
+        for name in self._loaders:
+            self.get(name)
+
+    def batcher(self, name: str) -> MicroBatcher:
+        """
+        Return the shared micro-batcher in front of the pipeline ``name``.
+        """
+        batcher = self._batchers.get(name)
+        if batcher is None:
+            batcher = MicroBatcher(
+                name,
+                lambda items, options: self._run_pipeline(name, items, options),
+                max_batch_size=settings.BATCH_MAX_SIZE,
+                max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+                executor=self.executor
+            )
+            self._batchers[name] = batcher
+        return batcher
+
+    def chunker(self, name: str) -> TokenChunker:
+        """
+        Return a token-aware chunker sized to the input limit of the pipeline ``name``.
+        """
+        chunker = self._chunkers.get(name)
+        if chunker is None:
+            chunker = TokenChunker.for_pipeline(self.get(name), settings.CHUNK_DEFAULT_MAX_TOKENS)
+            self._chunkers[name] = chunker
+        return chunker
+
+    def _run_pipeline(self, name: str, items: List[Any], options: Dict[str, Any]) -> List[Any]:
+        # Passing a list lets the pipeline pad the inputs into a single forward pass
+        return self.get(name)(items, batch_size=len(items), **options)
+
+    def batcher_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return queue depth and batch-size metrics for every batcher.
+        """
+        return {name: batcher.stats() for name, batcher in self._batchers.items()}
+
+    async def close_batchers(self) -> None:
+        """
+        Stop all batcher workers.
+        """
+        for batcher in self._batchers.values():
+            await batcher.close()
+        self._batchers.clear()
+
+    def unload_all(self) -> None:
+        """
+        Drop references to all loaded models so their memory can be reclaimed.
+        """
+        for name in list(self._models):
+            del self._models[name]
+            self._chunkers.pop(name, None)
+            self._stats[name] = ModelStats(name=name, engine=self._engines[name])
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return load statistics for every registered model.
+        """
+        return {name: asdict(stats) for name, stats in self._stats.items()}
+
+def _load_spacy():
+    import spacy
+    return spacy.load(settings.SPACY_MODEL)
+
+def _pipeline_loader(task: str, model: str, engine: str) -> ModelLoader:
+    def load():
+        return load_pipeline(task, model, engine)
+    return load
+
+def pipeline_specs() -> List[tuple]:
+    """
+    Return ``(name, task, model, engine)`` for every transformers pipeline used by NLPService.
+    """
+    return [
+        ("sentiment", "sentiment-analysis", settings.SENTIMENT_MODEL, settings.SENTIMENT_ENGINE),
+        ("ner", "ner", settings.NER_MODEL, settings.NER_ENGINE),
+        ("summarizer", "summarization", settings.SUMMARIZATION_MODEL, settings.SUMMARIZATION_ENGINE),
+    ]
+
+def model_versions() -> Dict[str, str]:
+    """
+    Return the model and resolved engine behind every model NLPService uses,
+    so results computed with another model or engine are not served from cache.
+    """
+    versions = {"spacy": settings.SPACY_MODEL}
+    for name, task, model, engine in pipeline_specs():
+        versions[name] = f"{model}@{resolve_engine(engine)}"
+    return versions
+
+def create_inference_executor(process_workers: Optional[int] = None) -> InferenceExecutor:
+    """
+    Build the inference executor from settings. ``process_workers`` overrides
+    ``SPACY_PROCESS_WORKERS`` (HTTP workers of a model server parse nothing locally).
+    """
+    from .nlp_service import init_spacy_worker
+    return InferenceExecutor(
+        max_workers=settings.INFERENCE_THREADS,
+        max_pending=settings.INFERENCE_MAX_PENDING,
+        timeout_seconds=settings.INFERENCE_TIMEOUT_SECONDS,
+        process_workers=settings.SPACY_PROCESS_WORKERS if process_workers is None else process_workers,
+        process_initializer=init_spacy_worker,
+        process_initargs=(settings.SPACY_MODEL,)
+    )
+
+def create_model_registry(executor: Optional[InferenceExecutor] = None) -> ModelRegistry:
+    """
+    Build the registry with the models used by NLPService.
+    """
+    registry = ModelRegistry(executor)
+    registry.register("spacy", _load_spacy)
+    for name, task, model, engine in pipeline_specs():
+        engine = resolve_engine(engine)
+        registry.register(name, _pipeline_loader(task, model, engine), engine=engine)
+    return registry
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+from typing import Any, Dict, List, Optional
+from sanara_common.model_server import FrameServer, ModelServerError
+from sanara_common.process import current_rss_bytes
+from app.config import settings
+from app.utils.logger import get_logger
+from .model_registry import ModelRegistry
+
+logger = get_logger(__name__)
+
+class ModelServer(FrameServer):
+    """
+    Serves the models of a registry to HTTP workers over a Unix-domain socket.
+
+    Each connection may carry many requests at once, matched to their
+    responses by the frame's request id. Inputs from every connection go
+    through the registry's micro-batchers, so concurrent requests from
+    different workers share forward passes.
+    """
+
+    def __init__(self, registry: ModelRegistry, path: str):
+        super().__init__(path, settings.MODEL_SERVER_MAX_FRAME_BYTES)
+        self.registry = registry
+
+    async def dispatch(self, payload: Dict[str, Any]) -> Any:
+        """
+        Run one request: ``infer``, ``hello`` or ``health``.
+        """
+        op = payload.get("op")
+        if op == "infer":
+            return {"results": await self.infer(payload["model"], payload["items"], payload.get("options") or {})}
+        if op == "hello":
+            return self.info()
+        if op == "health":
+            return self.health()
+        raise ModelServerError(f"Unknown model server operation '{op}'")
+
+    async def infer(self, model: str, items: List[Any], options: Dict[str, Any]) -> List[Any]:
+        if model not in self.registry.names:
+            raise ModelServerError(f"Model '{model}' is not served")
+        if model == "spacy":
+            from .nlp_service import parse_text
+            return list(await asyncio.gather(*(parse_text(self.registry, item) for item in items)))
+        batcher = self.registry.batcher(model)
+        return list(await asyncio.gather(*(batcher.submit(item, **options) for item in items)))
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "models": self.registry.names,
+            "engines": {name: stats["engine"] for name, stats in self.registry.stats().items()}
+        }
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            **self.info(),
+            **self.server_stats(),
+            "resident_bytes": current_rss_bytes(),
+            "models": self.registry.stats(),
+            "batchers": self.registry.batcher_stats(),
+            "executor": self.registry.executor.stats()
+        }
+
+async def serve(path: str) -> None:
+    """
+    Load every model, then serve them on ``path`` until SIGTERM or SIGINT.
+    """
+    from .model_registry import create_inference_executor, create_model_registry
+
+    executor = create_inference_executor()
+    registry = create_model_registry(executor)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, registry.load_all)
+
+    server = ModelServer(registry, path)
+    await server.start()
+    stopping = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set)
+    await stopping.wait()
+
+    logger.info("Shutting down model server")
+    await server.close()
+    await registry.close_batchers()
+    registry.unload_all()
+    executor.shutdown()
+
+async def _probe(path: str) -> Dict[str, Any]:
+    from .model_client import ModelServerClient
+    client = ModelServerClient(path)
+    try:
+        return await client.health()
+    finally:
+        await client.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the NLP models to the HTTP workers over a Unix socket")
+    parser.add_argument("--socket", default=settings.MODEL_SERVER_SOCKET or "/tmp/sanara-ai-models.sock")
+    parser.add_argument("--health", action="store_true", help="print the health of a running server and exit")
+    args = parser.parse_args(argv)
+
+    if args.health:
+        try:
+            print(json.dumps(asyncio.run(_probe(args.socket)), indent=2))
+        except Exception as e:
+            print(f"Model server unavailable: {e}", file=sys.stderr)
+            return 1
+        return 0
+    asyncio.run(serve(args.socket))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
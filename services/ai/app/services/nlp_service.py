@@ -1,94 +1,282 @@
-import spacy
-from transformers import pipeline
-from typing import List, Dict, Any, Tuple
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from enum import Enum
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, FrozenSet, Optional, Callable, Awaitable
 from app.config import settings
 from app.utils.logger import get_logger
+from .model_registry import ModelRegistry, model_versions
+from .result_cache import ResultCache, cache_key
+from .stage_graph import Stage, StageGraph
+from .chunking import Chunk
 
 logger = get_logger(__name__)
 
+class Analysis(str, Enum):
+    ENTITIES = "entities"
+    KEY_PHRASES = "key_phrases"
+    SENTIMENT = "sentiment"
+    SUMMARY = "summary"
+
+ALL_ANALYSES: FrozenSet[Analysis] = frozenset(Analysis)
+
+# Analyses served by the spaCy parse
+SPACY_ANALYSES: FrozenSet[Analysis] = frozenset({Analysis.ENTITIES, Analysis.KEY_PHRASES})
+
+# spaCy parses of the analysis in progress, keyed by text. Stage tasks inherit
+# the context, so the concurrent stages of one analysis share a parse, and the
+# memo goes away with the analysis instead of growing with a long-lived service.
+_parse_memo: contextvars.ContextVar[Optional[Dict[str, asyncio.Future]]] = contextvars.ContextVar(
+    "nlp_parse_memo", default=None
+)
+
+@contextmanager
+def parse_scope() -> Iterator[None]:
+    """
+    Share spaCy parses between the stages run inside this block.
+    """
+    if _parse_memo.get() is not None:
+        yield
+        return
+    token = _parse_memo.set({})
+    try:
+        yield
+    finally:
+        _parse_memo.reset(token)
+
+# spaCy model of a process-pool worker, loaded once per child process
+_worker_nlp = None
+
+def init_spacy_worker(model_name: str) -> None:
+    """
+    Process-pool initializer: load the spaCy model in the child process.
+    """
+    global _worker_nlp
+    import spacy
+    _worker_nlp = spacy.load(model_name)
+
+def parse_in_worker(text: str) -> Dict[str, Any]:
+    """
+    Parse text with the spaCy model of a process-pool worker.
+    """
+    return doc_to_dict(_worker_nlp(text))
+
+def doc_to_dict(doc) -> Dict[str, Any]:
+    """
+    Convert a spaCy Doc into the plain, picklable structure used by NLPService.
+    """
+    return {
+        "entities": [
+            {
+                "text": ent.text,
+                "label": ent.label_,
+                "start": ent.start_char,
+                "end": ent.end_char
+            }
+            for ent in doc.ents
+        ],
+        "key_phrases": [
+            {
+                "text": chunk.text,
+                "root": chunk.root.text,
+                "dependency": chunk.root.dep_
+            }
+            for chunk in doc.noun_chunks
+        ],
+        "sentences": [sent.text for sent in doc.sents]
+    }
+
+async def parse_text(registry: ModelRegistry, text: str) -> Dict[str, Any]:
+    """
+    Parse text with spaCy off the event loop: on the model server when the
+    registry is remote, otherwise on the process pool or the thread pool.
+    """
+    if registry.remote:
+        return await registry.batcher("spacy").submit(text)
+    executor = registry.executor
+    if executor.has_process_pool:
+        return await executor.run_in_process(parse_in_worker, text)
+    return await executor.run(lambda: doc_to_dict(registry.get("spacy")(text)))
+
 class NLPService:
-    def __init__(self):
-        try:
-            # Load spaCy model
-            self.nlp = spacy.load(settings.SPACY_MODEL)
-            
-            # Load transformers pipelines
-            self.sentiment_analyzer = pipeline("sentiment-analysis", model="neuralmind/bert-base-portuguese-cased")
-            self.ner = pipeline("ner", model="neuralmind/bert-base-portuguese-cased")
-            self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-            
-            logger.info("NLP models loaded successfully")
-        except Exception as e:
-            logger.error("Failed to load NLP models", error=e)
-            raise
+    def __init__(self, registry: ModelRegistry, cache: Optional[ResultCache] = None):
+        # Models are owned by the registry and shared across services,
+        # so constructing an NLPService per request is cheap.
+        self.registry = registry
+        self.cache = cache
+
+    @property
+    def nlp(self):
+        return self.registry.get("spacy")
+
+    @property
+    def sentiment_analyzer(self):
+        return self.registry.get("sentiment")
+
+    @property
+    def ner(self):
+        return self.registry.get("ner")
+
+    @property
+    def summarizer(self):
+        return self.registry.get("summarizer")
+
+    async def parse(self, text: str) -> Dict[str, Any]:
+        """
+        Run spaCy over the text off the event loop and return its entities,
+        noun chunks and sentences. Inside a ``parse_scope`` the stages asking
+        for the same text share a single parse.
+        """
+        memo = _parse_memo.get()
+        if memo is None:
+            return await self._parse(text)
+        parse = memo.get(text)
+        if parse is None:
+            parse = asyncio.ensure_future(self._parse(text))
+            memo[text] = parse
 
-    def analyze_text(self, text: str) -> Dict[str, Any]:
+            def forget_failure(future: asyncio.Future) -> None:
+                # A failed parse (e.g. a full inference queue) is retried, not reused
+                if future.cancelled() or future.exception() is not None:
+                    memo.pop(text, None)
+
+            parse.add_done_callback(forget_failure)
+        return await asyncio.shield(parse)
+
+    async def _parse(self, text: str) -> Dict[str, Any]:
+        return await parse_text(self.registry, text)
+
+    async def split_sentences(self, text: str) -> List[str]:
+        """
+        Split text into sentences using spaCy.
         """
-        Perform comprehensive text analysis using spaCy and transformers.
+        return (await self.parse(text))["sentences"]
+
+    async def _cached(
+        self,
+        operation: str,
+        text: str,
+        analyses: FrozenSet[Analysis],
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Serve an analysis result from the cache, computing it on a miss.
+
+        Stage timings are not cached; a hit reports an empty timing map.
         """
+        if self.cache is None:
+            return await compute()
+
+        key = cache_key(
+            f"nlp.{operation}",
+            # The exact text is used: entity offsets depend on it
+            text=text,
+            analyses=sorted(analysis.value for analysis in analyses),
+            models=model_versions()
+        )
+        timings: Dict[str, float] = {}
+
+        async def compute_untimed() -> Dict[str, Any]:
+            result = await compute()
+            timings.update(result.pop("timings_ms"))
+            return result
+
+        result = await self.cache.get_or_compute(key, compute_untimed)
+        return {**result, "timings_ms": timings}
+
+    async def analyze_text(self, text: str, analyses: Iterable[Analysis] = ALL_ANALYSES) -> Dict[str, Any]:
+        """
+        Perform text analysis using spaCy and transformers.
+
+        Only the requested analyses are computed, concurrently. The result holds
+        one key per requested analysis plus a "timings_ms" breakdown per stage.
+        """
+        analyses = frozenset(analyses)
+        return await self._cached("analyze_text", text, analyses, lambda: self._analyze_text(text, analyses))
+
+    async def _analyze_text(self, text: str, analyses: FrozenSet[Analysis]) -> Dict[str, Any]:
         try:
-            # Process text with spaCy
-            doc = self.nlp(text)
-            
-            # Extract entities
-            entities = [
-                {
-                    "text": ent.text,
-                    "label": ent.label_,
-                    "start": ent.start_char,
-                    "end": ent.end_char
-                }
-                for ent in doc.ents
-            ]
-            
-            # Extract key phrases (noun chunks)
-            key_phrases = [
-                {
-                    "text": chunk.text,
-                    "root": chunk.root.text,
-                    "dependency": chunk.root.dep_
-                }
-                for chunk in doc.noun_chunks
-            ]
+            stages = []
+            
+            # Process text with spaCy (entities and noun-chunk key phrases)
+            if analyses & SPACY_ANALYSES:
+                stages.append(Stage("spacy", lambda: self.parse(text)))
             
             # Analyze sentiment
-            sentiment = self.analyze_sentiment(text)
+            if Analysis.SENTIMENT in analyses:
+                stages.append(Stage("sentiment", lambda: self.analyze_sentiment(text)))
             
-            return {
-                "entities": entities,
-                "key_phrases": key_phrases,
-                "sentiment": sentiment,
-                "summary": self.summarize_text(text)
-            }
+            # Summarize
+            if Analysis.SUMMARY in analyses:
+                stages.append(Stage("summary", lambda: self.summarize_text(text)))
+            
+            with parse_scope():
+                graph = await StageGraph(stages, "analyze_text").run()
+            
+            result: Dict[str, Any] = {}
+            if Analysis.ENTITIES in analyses:
+                result["entities"] = graph["spacy"]["entities"]
+            if Analysis.KEY_PHRASES in analyses:
+                result["key_phrases"] = graph["spacy"]["key_phrases"]
+            if Analysis.SENTIMENT in analyses:
+                result["sentiment"] = graph["sentiment"]
+            if Analysis.SUMMARY in analyses:
+                result["summary"] = graph["summary"]
+            
+            result["timings_ms"] = graph.timings_ms
+            return result
         except Exception as e:
             logger.error("Failed to analyze text", error=e)
             raise
 
-    def analyze_sentiment(self, text: str) -> Dict[str, float]:
+    async def _chunk(self, pipeline_name: str, text: str) -> List[Chunk]:
+        """
+        Split text into sentence-aligned chunks that fit the pipeline's input limit.
+        Text that already fits is returned as a single chunk.
+        """
+        chunker = self.registry.chunker(pipeline_name)
+        executor = self.registry.executor
+        
+        tokens = await executor.run(chunker.count, text)
+        if tokens <= chunker.max_tokens:
+            return [Chunk(text, tokens)]
+        
+        sentences = await self.split_sentences(text)
+        return await executor.run(chunker.chunk, sentences)
+
+    async def analyze_sentiment(self, text: str) -> Dict[str, float]:
         """
         Analyze sentiment of the text using transformers.
+
+        Long texts are split into chunks that are scored together and averaged,
+        weighted by their token counts.
         """
         try:
-            result = self.sentiment_analyzer(text)[0]
+            chunks = await self._chunk("sentiment", text)
+            batcher = self.registry.batcher("sentiment")
+            results = await asyncio.gather(*[
+                batcher.submit(chunk.text, truncation=True) for chunk in chunks
+            ])
             
             # Convert to positive/neutral/negative scores
-            scores = {
-                "positive": result["score"] if result["label"] == "POSITIVE" else 0.0,
-                "neutral": result["score"] if result["label"] == "NEUTRAL" else 0.0,
-                "negative": result["score"] if result["label"] == "NEGATIVE" else 0.0
-            }
+            scores = {"positive": 0.0, "neutral": 0.0, "negative": 0.0}
+            total_tokens = sum(chunk.tokens for chunk in chunks) or 1
+            for chunk, result in zip(chunks, results):
+                label = result["label"].lower()
+                if label in scores:
+                    scores[label] += result["score"] * (chunk.tokens or 1) / total_tokens
             
             return scores
         except Exception as e:
             logger.error("Failed to analyze sentiment", error=e)
             raise
 
-    def extract_entities(self, text: str) -> List[Dict[str, Any]]:
+    async def extract_entities(self, text: str) -> List[Dict[str, Any]]:
         """
         Extract named entities using transformers NER.
         """
         try:
-            entities = self.ner(text)
+            entities = await self.registry.batcher("ner").submit(text)
             
             # Process and format entities
             formatted_entities = []
@@ -106,68 +294,119 @@ class NLPService:
             logger.error("Failed to extract entities", error=e)
             raise
 
-    def summarize_text(self, text: str, max_length: int = 130, min_length: int = 30) -> str:
+    async def summarize_text(self, text: str, max_length: int = 130, min_length: int = 30) -> str:
         """
         Generate a summary of the text using transformers.
+
+        Texts longer than the model input are summarized hierarchically: each
+        chunk is summarized (the chunks run as one batch), the partial summaries
+        are joined and summarized again until the result fits in one pass. After
+        ``SUMMARY_MAX_DEPTH`` rounds over partial summaries, the joined partial
+        summaries are truncated to one model input for the final pass.
         """
         try:
-            summary = self.summarizer(
-                text,
-                max_length=max_length,
-                min_length=min_length,
-                do_sample=False
-            )[0]["summary_text"]
-            
-            return summary
+            with parse_scope():
+                return await self._summarize(text, max_length, min_length, depth=0)
         except Exception as e:
             logger.error("Failed to summarize text", error=e)
             raise
 
-    def extract_medical_entities(self, text: str) -> Tuple[List[str], List[str], List[str]]:
+    async def _summarize(self, text: str, max_length: int, min_length: int, depth: int) -> str:
+        chunks = await self._chunk("summarizer", text)
+        
+        # Depth 0 is the document itself and is always summarized whole; past the
+        # limit, the partial summaries (which cover all of it) are cut to one pass
+        if len(chunks) > 1 and depth > settings.SUMMARY_MAX_DEPTH:
+            logger.warning(
+                "Partial summaries still span %d chunks after %d rounds; truncating them to one model input",
+                len(chunks), depth
+            )
+            chunks = chunks[:1]
+        
+        batcher = self.registry.batcher("summarizer")
+        summaries = await asyncio.gather(*[
+            batcher.submit(
+                chunk.text,
+                max_length=max_length,
+                # A chunk shorter than min_length would force the model to pad the summary
+                min_length=min(min_length, max(chunk.tokens // 2, 1)),
+                do_sample=False,
+                truncation=True
+            )
+            for chunk in chunks
+        ])
+        summary = " ".join(result["summary_text"] for result in summaries)
+        
+        if len(chunks) == 1:
+            return summary
+        return await self._summarize(summary, max_length, min_length, depth + 1)
+
+    async def extract_medical_entities(self, text: str) -> Tuple[List[str], List[str], List[str]]:
         """
         Extract medical-specific entities (symptoms, conditions, medications).
         """
         try:
-            doc = self.nlp(text)
+            doc = await self.parse(text)
             
             symptoms = []
             conditions = []
             medications = []
             
-            for ent in doc.ents:
-                if ent.label_ == "SYMPTOM":
-                    symptoms.append(ent.text)
-                elif ent.label_ == "CONDITION":
-                    conditions.append(ent.text)
-                elif ent.label_ == "MEDICATION":
-                    medications.append(ent.text)
+            for ent in doc["entities"]:
+                if ent["label"] == "SYMPTOM":
+                    symptoms.append(ent["text"])
+                elif ent["label"] == "CONDITION":
+                    conditions.append(ent["text"])
+                elif ent["label"] == "MEDICATION":
+                    medications.append(ent["text"])
             
             return symptoms, conditions, medications
         except Exception as e:
             logger.error("Failed to extract medical entities", error=e)
             raise
 
-    def analyze_medical_text(self, text: str) -> Dict[str, Any]:
+    async def analyze_medical_text(self, text: str, analyses: Iterable[Analysis] = ALL_ANALYSES) -> Dict[str, Any]:
         """
         Perform medical-specific text analysis.
+
+        Medical entities (symptoms, conditions, medications) are returned when
+        ENTITIES is requested; sentiment and summary only when requested.
         """
+        analyses = frozenset(analyses)
+        return await self._cached(
+            "analyze_medical_text", text, analyses, lambda: self._analyze_medical_text(text, analyses)
+        )
+
+    async def _analyze_medical_text(self, text: str, analyses: FrozenSet[Analysis]) -> Dict[str, Any]:
         try:
+            stages = []
+            
             # Extract medical entities
-            symptoms, conditions, medications = self.extract_medical_entities(text)
+            if Analysis.ENTITIES in analyses:
+                stages.append(Stage("spacy", lambda: self.extract_medical_entities(text)))
             
             # Analyze sentiment (useful for patient mood/state analysis)
-            sentiment = self.analyze_sentiment(text)
+            if Analysis.SENTIMENT in analyses:
+                stages.append(Stage("sentiment", lambda: self.analyze_sentiment(text)))
             
             # Generate summary
-            summary = self.summarize_text(text)
-            
-            return {
-                "symptoms": symptoms,
-                "conditions": conditions,
-                "medications": medications,
-                "sentiment": sentiment,
-                "summary": summary
-            }
+            if Analysis.SUMMARY in analyses:
+                stages.append(Stage("summary", lambda: self.summarize_text(text)))
+            
+            with parse_scope():
+                graph = await StageGraph(stages, "analyze_medical_text").run()
+            
+            result: Dict[str, Any] = {}
+            if Analysis.ENTITIES in analyses:
+                symptoms, conditions, medications = graph["spacy"]
+                result.update(symptoms=symptoms, conditions=conditions, medications=medications)
+            if Analysis.SENTIMENT in analyses:
+                result["sentiment"] = graph["sentiment"]
+            if Analysis.SUMMARY in analyses:
+                result["summary"] = graph["summary"]
+            
+            result["timings_ms"] = graph.timings_ms
+            return result
         except Exception as e:
             logger.error("Failed to analyze medical text", error=e)
             raise 
\ No newline at end of file
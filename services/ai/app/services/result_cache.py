@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse whitespace so formatting differences do not change the cache key.
+    """
+    return " ".join(text.split())
+
+def cache_key(namespace: str, **parts: Any) -> str:
+    """
+    Build a content-addressed key from a namespace and the inputs that determine a result.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    shared_hits: int = 0
+    sets: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    shared_errors: int = 0
+
+class LRUCache:
+    """
+    In-process cache bounded by entry count, with a TTL per entry.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class MongoCacheTier:
+    """
+    Shared cache tier stored in MongoDB, visible to every worker and replica.
+
+    Expired documents are removed by a TTL index on ``expires_at``; reads also
+    check the expiry because MongoDB only purges them periodically.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexes_created = False
+
+    async def _ensure_indexes(self) -> None:
+        if not self._indexes_created:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexes_created = True
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        document = await self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        if document is None:
+            return False, None
+        return True, document["value"]
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        await self._ensure_indexes()
+        now = datetime.utcnow()
+        await self.collection.replace_one(
+            {"_id": key},
+            {"_id": key, "value": value, "created_at": now, "expires_at": now + timedelta(seconds=ttl_seconds)},
+            upsert=True
+        )
+
+class ResultCache:
+    """
+    Two-tier cache for LLM and NLP results.
+
+    Lookups hit the in-process LRU first, then the optional shared tier
+    (promoting hits into the LRU). Concurrent misses for the same key share
+    one computation. Shared-tier failures are logged and treated as misses so
+    they never fail a request.
+    """
+
+    def __init__(self, local: LRUCache, shared: Optional[MongoCacheTier] = None, enabled: bool = True):
+        self.local = local
+        self.shared = shared
+        self.enabled = enabled
+        self._stats = CacheStats()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        found, value = self.local.get(key)
+        if found:
+            return True, value
+
+        if self.shared is not None:
+            try:
+                found, value = await self.shared.get(key)
+            except Exception as e:
+                self._stats.shared_errors += 1
+                logger.warning("Shared cache lookup failed: %r", e)
+                return False, None
+            if found:
+                self._stats.shared_hits += 1
+                self.local.set(key, value)
+                return True, value
+
+        return False, None
+
+    async def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        self._stats.sets += 1
+        self.local.set(key, value, ttl_seconds)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value, ttl_seconds if ttl_seconds is not None else self.local.ttl_seconds)
+            except Exception as e:
+                self._stats.shared_errors += 1
+                logger.warning("Shared cache write failed: %r", e)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[float] = None
+    ) -> Any:
+        """
+        Return the cached value for ``key`` or compute, store and return it.
+        """
+        if not self.enabled:
+            return await compute()
+
+        found, value = await self.get(key)
+        if found:
+            self._stats.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._stats.hits += 1
+            return await asyncio.shield(inflight)
+
+        self._stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            await self.set(key, value, ttl_seconds)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise the error; mark it retrieved for the owner
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = asdict(self._stats)
+        stats["evictions"] = self.local.evictions
+        stats["expirations"] = self.local.expirations
+        stats["entries"] = len(self.local)
+        stats["max_entries"] = self.local.max_entries
+        stats["shared_tier"] = self.shared is not None
+        lookups = self._stats.hits + self._stats.misses
+        stats["hit_rate"] = self._stats.hits / lookups if lookups else 0.0
+        return stats
+
+def create_result_cache() -> ResultCache:
+    """
+    Build the result cache from settings.
+    """
+    shared = None
+    if settings.CACHE_SHARED_ENABLED:
+        from app.database import get_database
+        shared = MongoCacheTier(get_database()[settings.CACHE_COLLECTION])
+    return ResultCache(
+        LRUCache(max_entries=settings.CACHE_MAX_ENTRIES, ttl_seconds=settings.CACHE_TTL_SECONDS),
+        shared,
+        enabled=settings.CACHE_ENABLED
+    )
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from dataclasses import dataclass, asdict, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from sanara_common.metrics import STAGE_DURATION
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+@dataclass
+class Stage:
+    """
+    One unit of work in a StageGraph.
+
+    ``run`` receives the results of the stages it depends on as keyword
+    arguments. A required stage that fails fails the whole graph; an optional
+    stage that fails is recorded and replaced by ``fallback``.
+    """
+    name: str
+    run: Callable[..., Awaitable[Any]]
+    depends_on: Tuple[str, ...] = ()
+    required: bool = True
+    fallback: Any = None
+
+@dataclass
+class StageSpan:
+    name: str
+    status: str
+    start_ms: float
+    duration_ms: float
+    error: Optional[str] = None
+
+@dataclass
+class StageGraphResult:
+    results: Dict[str, Any]
+    spans: List[StageSpan] = field(default_factory=list)
+
+    def __getitem__(self, name: str) -> Any:
+        return self.results[name]
+
+    @property
+    def timings_ms(self) -> Dict[str, float]:
+        return {span.name: span.duration_ms for span in self.spans}
+
+    def spans_as_dicts(self) -> List[Dict[str, Any]]:
+        return [asdict(span) for span in self.spans]
+
+    def metadata(self, *nested_timings: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Build response metadata with the stage spans and a flat timing map,
+        including timings reported by the stages themselves.
+        """
+        timings: Dict[str, float] = {}
+        for extra in nested_timings:
+            timings.update(extra)
+        timings.update(self.timings_ms)
+        return {"timings_ms": timings, "stages": self.spans_as_dicts()}
+
+class StageGraph:
+    """
+    Runs a set of async stages as soon as their dependencies complete.
+
+    Stages without a data dependency run concurrently, so CPU-bound local
+    stages (which run on the inference executor) overlap with outbound LLM
+    calls and end-to-end latency approaches the critical path instead of the
+    sum of all stages.
+    """
+
+    def __init__(self, stages: List[Stage], name: str = "stages"):
+        self.name = name
+        self._stages = self._sort(stages)
+
+    @staticmethod
+    def _sort(stages: List[Stage]) -> List[Stage]:
+        by_name = {stage.name: stage for stage in stages}
+        if len(by_name) != len(stages):
+            raise ValueError("Stage names must be unique")
+
+        ordered: List[Stage] = []
+        visiting: set = set()
+        done: set = set()
+
+        def visit(stage: Stage) -> None:
+            if stage.name in done:
+                return
+            if stage.name in visiting:
+                raise ValueError(f"Stage '{stage.name}' is part of a dependency cycle")
+            visiting.add(stage.name)
+            for dependency in stage.depends_on:
+                if dependency not in by_name:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dependency}'")
+                visit(by_name[dependency])
+            visiting.discard(stage.name)
+            done.add(stage.name)
+            ordered.append(stage)
+
+        for stage in stages:
+            visit(stage)
+        return ordered
+
+    async def run(self) -> StageGraphResult:
+        origin = time.perf_counter()
+        spans: Dict[str, StageSpan] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        def elapsed_ms(since: float) -> float:
+            return round((time.perf_counter() - since) * 1000, 2)
+
+        def record(stage: Stage, status: str, start_ms: float, started: float, error: Optional[str] = None) -> None:
+            seconds = time.perf_counter() - started
+            spans[stage.name] = StageSpan(stage.name, status, start_ms, round(seconds * 1000, 2), error)
+            STAGE_DURATION.observe(seconds, graph=self.name, stage=stage.name, status=status)
+
+        async def execute(stage: Stage) -> Any:
+            inputs = {dependency: await tasks[dependency] for dependency in stage.depends_on}
+            start_ms = elapsed_ms(origin)
+            started = time.perf_counter()
+            try:
+                value = await stage.run(**inputs)
+            except asyncio.CancelledError:
+                record(stage, "cancelled", start_ms, started)
+                raise
+            except Exception as e:
+                record(stage, "failed", start_ms, started, repr(e))
+                if stage.required:
+                    raise
+                logger.warning("Optional stage '%s' failed, using fallback: %r", stage.name, e)
+                return stage.fallback
+            record(stage, "ok", start_ms, started)
+            return value
+
+        # Stages are sorted topologically, so dependencies always have a task
+        for stage in self._stages:
+            tasks[stage.name] = asyncio.create_task(execute(stage), name=f"stage-{stage.name}")
+
+        try:
+            done, pending = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+            errors = [task.exception() for task in done if not task.cancelled() and task.exception()]
+            if errors:
+                raise errors[0]
+        finally:
+            unfinished = [task for task in tasks.values() if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+            # Mark every stage error as retrieved; the first one was re-raised above
+            for task in tasks.values():
+                if task.done() and not task.cancelled():
+                    task.exception()
+
+        return StageGraphResult(
+            results={name: task.result() for name, task in tasks.items()},
+            spans=[spans[stage.name] for stage in self._stages if stage.name in spans]
+        )
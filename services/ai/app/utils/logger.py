@@ -1,33 +1,203 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import random
 import sys
-from typing import Any, Dict
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
 from app.config import settings
 
-# Configure logging format
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=settings.LOG_LEVEL,
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# Id of the request being served, attached to every record logged while handling it
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came from ``extra``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line.
+
+    ``extra`` fields are emitted as top-level keys next to the timestamp,
+    level, logger, message and request id.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamp records with the current request id. Runs in the calling thread,
+    so the id is captured before the record crosses to the listener.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand records to the background listener without formatting them.
+
+    The default QueueHandler formats every record in the calling thread;
+    records stay in-process here, so formatting is left to the listener. When
+    the queue is full, records are dropped and counted rather than blocking
+    the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+def configure_logging() -> None:
+    """
+    Route the root logger through a bounded queue to a background thread
+    that writes to stdout, as JSON or as plain text (``LOG_FORMAT``).
+    """
+    global _handler, _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    _handler.addFilter(RequestIdFilter())
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(settings.LOG_LEVEL)
+
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(_stop_listener)
+    # Threads do not survive fork (e.g. process-pool workers): give the child its own listener
+    os.register_at_fork(after_in_child=_restart_listener)
+
+def _stop_listener() -> None:
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+def _restart_listener() -> None:
+    global _listener
+    _handler.queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _listener = QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+def logging_stats() -> Dict[str, Any]:
+    """
+    Return the depth of the log queue and the number of records dropped.
+    """
+    if _handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware binding each HTTP request to an id, taken from the
+    ``X-Request-ID`` header or generated, and echoed in the response.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).append((b"x-request-id", request_id.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
 
 class Logger:
+    """
+    Thin wrapper over a stdlib logger.
+
+    Messages are formatted lazily, %-style (``logger.info("Loaded %s", name)``),
+    and only when the level is enabled. ``extra`` fields become structured
+    keys in JSON output. Debug calls on hot paths can be sampled.
+    """
+
     def __init__(self, name: str):
         self.logger = logging.getLogger(name)
-    
-    def info(self, message: str, extra: Dict[str, Any] = None):
-        self.logger.info(message, extra=extra)
-    
-    def error(self, message: str, error: Exception = None, extra: Dict[str, Any] = None):
+
+    def info(self, message: str, *args: Any, extra: Dict[str, Any] = None):
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(message, *args, extra=extra, stacklevel=2)
+
+    def error(self, message: str, *args: Any, error: Exception = None, extra: Dict[str, Any] = None):
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
         if error:
-            self.logger.error(f"{message}: {str(error)}", exc_info=True, extra=extra)
+            self.logger.error(message, *args, exc_info=error, extra={**(extra or {}), "error": str(error)}, stacklevel=2)
         else:
-            self.logger.error(message, extra=extra)
-    
-    def warning(self, message: str, extra: Dict[str, Any] = None):
-        self.logger.warning(message, extra=extra)
-    
-    def debug(self, message: str, extra: Dict[str, Any] = None):
-        self.logger.debug(message, extra=extra)
+            self.logger.error(message, *args, extra=extra, stacklevel=2)
+
+    def warning(self, message: str, *args: Any, extra: Dict[str, Any] = None):
+        if self.logger.isEnabledFor(logging.WARNING):
+            self.logger.warning(message, *args, extra=extra, stacklevel=2)
+
+    def debug(self, message: str, *args: Any, extra: Dict[str, Any] = None, sample_rate: Optional[float] = None):
+        """
+        Log at debug level, keeping only a ``sample_rate`` fraction of the calls
+        (``LOG_DEBUG_SAMPLE_RATE`` by default).
+        """
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        rate = settings.LOG_DEBUG_SAMPLE_RATE if sample_rate is None else sample_rate
+        if rate < 1.0 and random.random() >= rate:
+            return
+        self.logger.debug(message, *args, extra=extra, stacklevel=2)
 
 def get_logger(name: str) -> Logger:
-    return Logger(name) 
\ No newline at end of file
+    return Logger(name)
+
+configure_logging()
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import json
+import signal
+import sys
+from typing import List, Optional
+from app.config import settings
+from app.database import close_mongo_client
+from app.services.analysis_consumer import create_analysis_consumer, create_result_store
+from app.services.incremental_analysis import create_consultation_store
+from app.services.llm import create_llm_client
+from app.services.message_broker import InMemoryBroker, create_broker
+from app.services.model_client import ModelServerClient, create_remote_model_registry
+from app.services.model_registry import create_inference_executor, create_model_registry
+from app.services.result_cache import create_result_cache
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+async def run_worker(input_path: Optional[str] = None) -> None:
+    """
+    Consume ``ai.analysis.request`` messages until SIGTERM or SIGINT.
+
+    With ``input_path``, the messages of that NDJSON file are published to an
+    in-memory broker instead, and the worker exits once all are settled.
+    """
+    if settings.MODEL_SERVER_SOCKET:
+        model_client = ModelServerClient(settings.MODEL_SERVER_SOCKET)
+        executor = create_inference_executor(process_workers=0)
+        registry = create_remote_model_registry(model_client, executor)
+    else:
+        model_client = None
+        executor = create_inference_executor()
+        registry = create_model_registry(executor)
+    cache = create_result_cache()
+    llm = create_llm_client()
+    consultations = create_consultation_store()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, registry.load_all)
+
+    broker = InMemoryBroker(prefetch=settings.ANALYSIS_PREFETCH) if input_path else create_broker()
+    store = create_result_store()
+    await store.start()
+    consumer = create_analysis_consumer(registry, llm, cache, consultations, broker, store)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, consumer.stop)
+
+    consuming = asyncio.create_task(consumer.run())
+    try:
+        if input_path:
+            with open(input_path, "rb") as messages:
+                for line in messages:
+                    if line.strip():
+                        await broker.publish(line.strip())
+            while broker.pending and not consuming.done():
+                await asyncio.sleep(0.05)
+            consumer.stop()
+        await consuming
+    finally:
+        logger.info("Analysis worker stopped", extra={"consumer": consumer.stats()})
+        await broker.close()
+        await store.close()
+        await registry.close_batchers()
+        registry.unload_all()
+        executor.shutdown()
+        if model_client is not None:
+            await model_client.close()
+        await llm.aclose()
+        close_mongo_client()
+
+    if input_path:
+        print(json.dumps(consumer.stats(), indent=2))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run chat and health analyses requested on the ai.analysis queue")
+    parser.add_argument("--input", help="NDJSON file of analysis_requested messages to process in-memory, then exit")
+    args = parser.parse_args(argv)
+    asyncio.run(run_worker(args.input))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import asyncio
+import json
+from pydantic import BaseModel
+from sanara_common.inference_executor import InferenceRejected
+from app.models.health import HealthAnalysisRequest
+from app.services.analysis_consumer import AnalysisConsumer, InMemoryResultStore
+from app.services.message_broker import InMemoryBroker
+
+def run(coro):
+    return asyncio.run(coro)
+
+class Result(BaseModel):
+    text: str
+
+def message(request_id: str, description: str = "headache", analysis: str = "health") -> bytes:
+    return json.dumps({
+        "event": "analysis_requested",
+        "data": {
+            "request_id": request_id,
+            "content": json.dumps({"symptoms_description": description}),
+            "metadata": {"analysis": analysis}
+        },
+        "timestamp": "2024-01-01T00:00:00Z",
+        "origin": "api",
+        "correlationId": f"corr-{request_id}"
+    }).encode()
+
+class FailingStore(InMemoryResultStore):
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    async def save_many(self, documents):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("mongo down")
+        await super().save_many(documents)
+
+async def consume(broker, store, handler, bodies, batch_size=8):
+    consumer = AnalysisConsumer(
+        broker,
+        store,
+        {"health": HealthAnalysisRequest},
+        lambda: {"health": handler},
+        batch_size=batch_size,
+        batch_wait_ms=20
+    )
+    for body in bodies:
+        await broker.publish(body)
+    task = asyncio.create_task(consumer.run())
+    while broker.pending:
+        await asyncio.sleep(0.01)
+    consumer.stop()
+    await asyncio.wait_for(task, 5)
+    return consumer
+
+def test_requests_are_batched_and_acked_after_persisting():
+    running = []
+    concurrency = []
+
+    async def handler(request):
+        running.append(request)
+        concurrency.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(request)
+        return Result(text=request.symptoms_description.upper())
+
+    async def scenario():
+        broker = InMemoryBroker(prefetch=32)
+        store = InMemoryResultStore()
+        consumer = await consume(broker, store, handler, [message(str(i), f"pain {i}") for i in range(20)])
+        return broker, store, consumer.stats()
+
+    broker, store, stats = run(scenario())
+    assert len(store.documents) == 20
+    assert store.documents["3"]["result"] == {"text": "PAIN 3"}
+    assert store.documents["3"]["correlation_id"] == "corr-3"
+    assert broker.acked == 20 and not broker.dead_letters
+    # Requests of a batch run together, so their inference can share forward passes
+    assert max(concurrency) > 1
+    assert stats["batches"] < 20
+
+def test_poison_messages_go_to_the_dead_letter_queue():
+    async def handler(request):
+        return Result(text="ok")
+
+    async def scenario():
+        broker = InMemoryBroker()
+        store = InMemoryResultStore()
+        bodies = [b"not json", message("1", analysis="unknown"), message("2", description=None), message("3")]
+        consumer = await consume(broker, store, handler, bodies)
+        return broker, store, consumer.stats()
+
+    broker, store, stats = run(scenario())
+    assert list(store.documents) == ["3"]
+    assert len(broker.dead_letters) == 3
+    assert stats["poison"] == 3
+
+def test_transient_failures_are_retried_once_then_dead_lettered():
+    attempts = {}
+
+    async def handler(request):
+        key = request.symptoms_description
+        attempts[key] = attempts.get(key, 0) + 1
+        if key == "flaky" and attempts[key] == 1:
+            raise InferenceRejected("queue full")
+        if key == "down":
+            raise InferenceRejected("queue full")
+        if key == "bug":
+            raise KeyError("label")
+        return Result(text=key)
+
+    async def scenario():
+        broker = InMemoryBroker()
+        store = InMemoryResultStore()
+        bodies = [message("1", "flaky"), message("2", "down"), message("3", "bug")]
+        await consume(broker, store, handler, bodies)
+        return broker, store
+
+    broker, store = run(scenario())
+    assert list(store.documents) == ["1"]
+    assert attempts == {"flaky": 2, "down": 2, "bug": 1}
+    assert sorted(json.loads(d.body)["data"]["request_id"] for d in broker.dead_letters) == ["2", "3"]
+
+def test_persist_failure_requeues_the_batch_without_acking():
+    async def handler(request):
+        return Result(text="ok")
+
+    async def scenario():
+        broker = InMemoryBroker()
+        store = FailingStore(failures=1)
+        consumer = await consume(broker, store, handler, [message(str(i)) for i in range(4)])
+        return broker, store, consumer.stats()
+
+    broker, store, stats = run(scenario())
+    assert len(store.documents) == 4
+    assert broker.requeued == 4 and broker.acked == 4
+    assert stats["persist_errors"] == 1
+
+def test_analysis_services_are_built_per_batch():
+    """Service state (like the NLPService of each analysis service) does not outlive a batch"""
+    from app.services.analysis_consumer import create_analysis_consumer
+
+    consumer = create_analysis_consumer(None, None, None, None, InMemoryBroker(), InMemoryResultStore())
+    first, second = consumer.handlers(), consumer.handlers()
+    assert set(first) == {"chat", "health"}
+    assert first["chat"].__self__ is not second["chat"].__self__
+    assert first["health"].__self__.nlp_service is not second["health"].__self__.nlp_service
@@ -0,0 +1,144 @@
+import asyncio
+import pytest
+from pydantic import BaseModel
+from app.services.analysis_store import AnalysisStore
+
+def run(coro):
+    return asyncio.run(coro)
+
+class Analysis(BaseModel):
+    analysis_id: str
+    consultation_id: str
+    summary: str = ""
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        self.documents.sort(key=lambda document: document[key], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+class FakeCollection:
+    def __init__(self, failures: int = 0):
+        self.documents = {}
+        self.bulk_sizes = []
+        self.indexes = []
+        self.queries = 0
+        self.failures = failures
+        self.gate = None
+
+    async def create_index(self, keys, **options):
+        self.indexes.append(keys)
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("mongo down")
+        self.bulk_sizes.append(len(requests))
+        for request in requests:
+            self.documents[request._filter["_id"]] = request._doc
+
+    async def find_one(self, query):
+        self.queries += 1
+        return next((d for d in self.documents.values() if d["analysis_id"] == query["analysis_id"]), None)
+
+    def find(self, query):
+        self.queries += 1
+        return FakeCursor([d for d in self.documents.values() if d["consultation_id"] == query["consultation_id"]])
+
+def test_results_are_buffered_and_flushed_in_bulk_by_size_and_interval():
+    collection = FakeCollection()
+
+    async def scenario():
+        store = AnalysisStore(collection, flush_size=4, flush_interval_ms=50)
+        await store.start()
+        for i in range(10):
+            await store.save("chat", Analysis(analysis_id=str(i), consultation_id="c1"))
+        # Nothing is written on the request path
+        assert collection.bulk_sizes == []
+        await asyncio.sleep(0.01)
+        # Two full batches go out at once, the remainder on the next interval
+        assert collection.bulk_sizes == [4, 4]
+        await asyncio.sleep(0.1)
+        assert collection.bulk_sizes == [4, 4, 2]
+        await store.close()
+        return store.stats()
+
+    stats = run(scenario())
+    assert stats["written"] == 10 and stats["pending"] == 0
+    assert "analysis_id" in collection.indexes
+    assert [("consultation_id", 1), ("completed_at", -1)] in collection.indexes
+    assert collection.documents["3"]["result"]["analysis_id"] == "3"
+
+def test_full_buffer_applies_backpressure():
+    collection = FakeCollection()
+
+    async def scenario():
+        collection.gate = asyncio.Event()
+        store = AnalysisStore(collection, max_buffered=4, flush_size=4, flush_interval_ms=1000)
+        await store.start()
+        for i in range(4):
+            await store.save("health", Analysis(analysis_id=str(i), consultation_id="c1"))
+        await asyncio.sleep(0.01)
+        # The flush of the first four is stuck; the buffer refills, then saves wait
+        for i in range(4, 8):
+            await store.save("health", Analysis(analysis_id=str(i), consultation_id="c1"))
+        blocked = asyncio.create_task(store.save("health", Analysis(analysis_id="8", consultation_id="c1")))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        collection.gate.set()
+        await asyncio.wait_for(blocked, 1)
+        await store.close()
+        return store.stats()
+
+    stats = run(scenario())
+    assert len(collection.documents) == 9
+    assert stats["backpressure_waits"] >= 1
+
+def test_lookups_take_one_query_and_see_unflushed_results():
+    collection = FakeCollection()
+
+    async def scenario():
+        store = AnalysisStore(collection, flush_size=100, flush_interval_ms=20)
+        await store.start()
+        await store.save("chat", Analysis(analysis_id="a1", consultation_id="c1", summary="first"))
+        buffered = await store.get("a1")
+        assert collection.queries == 0
+        await asyncio.sleep(0.05)
+        await store.save("chat", Analysis(analysis_id="a2", consultation_id="c1", summary="second"))
+        stored = await store.get("a1")
+        history = await store.find_by_consultation("c1")
+        await store.close()
+        return buffered, stored, history
+
+    buffered, stored, history = run(scenario())
+    assert buffered["result"]["summary"] == "first"
+    assert stored["result"]["summary"] == "first"
+    assert [document["analysis_id"] for document in history] == ["a2", "a1"]
+    assert collection.queries == 2
+
+def test_failed_flushes_retry_fire_and_forget_results_and_fail_waiting_callers():
+    collection = FakeCollection(failures=1)
+
+    async def scenario():
+        store = AnalysisStore(collection, flush_size=10, flush_interval_ms=10)
+        await store.start()
+        await store.save("chat", Analysis(analysis_id="a1", consultation_id="c1"))
+        with pytest.raises(ConnectionError):
+            await store.save_many([{"_id": "r1", "analysis_id": "a2", "consultation_id": "c1", "completed_at": 0}])
+        await store.close()
+        return store.stats()
+
+    stats = run(scenario())
+    assert list(collection.documents) == ["a1"]
+    assert stats["flush_errors"] == 1 and stats["retried"] == 1
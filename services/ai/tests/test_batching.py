@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from app.services.batching import MicroBatcher
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_concurrent_requests_share_a_batch():
+    """Concurrent submissions are grouped into batches of at most max_batch_size"""
+    batch_sizes = []
+
+    def process(items, options):
+        batch_sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher("double", process, max_batch_size=8, max_wait_ms=50)
+        results = await asyncio.gather(*[batcher.submit(i) for i in range(20)])
+        stats = batcher.stats()
+        await batcher.close()
+        return results, stats
+
+    results, stats = run(scenario())
+    assert results == [i * 2 for i in range(20)]
+    assert batch_sizes == [8, 8, 4]
+    assert stats["items"] == 20
+    assert stats["max_observed_batch_size"] == 8
+
+def test_different_options_run_as_separate_batches():
+    """Requests with different call options are never mixed in one batch"""
+    seen = []
+
+    def process(items, options):
+        seen.append((sorted(items), options))
+        return [options["prefix"] + item for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher("prefix", process, max_batch_size=8, max_wait_ms=50)
+        results = await asyncio.gather(
+            batcher.submit("a", prefix="x"),
+            batcher.submit("b", prefix="y"),
+            batcher.submit("c", prefix="x")
+        )
+        await batcher.close()
+        return results
+
+    assert run(scenario()) == ["xa", "yb", "xc"]
+    assert (["a", "c"], {"prefix": "x"}) in seen
+    assert (["b"], {"prefix": "y"}) in seen
+
+def test_batch_errors_propagate_to_every_caller():
+    """A failing batch raises the error in every waiting coroutine"""
+    def process(items, options):
+        raise ValueError("model failure")
+
+    async def scenario():
+        batcher = MicroBatcher("failing", process, max_batch_size=4, max_wait_ms=10)
+        results = await asyncio.gather(
+            batcher.submit(1), batcher.submit(2), return_exceptions=True
+        )
+        stats = batcher.stats()
+        await batcher.close()
+        return results, stats
+
+    results, stats = run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert stats["errors"] == 1
+
+def test_unexpected_worker_errors_fail_the_batch_and_keep_serving():
+    """An error outside the batch function reaches its callers instead of killing the worker"""
+    def process(items, options):
+        return items
+
+    async def scenario():
+        batcher = MicroBatcher("echo", process, max_batch_size=4, max_wait_ms=10)
+        # Unhashable option values cannot be grouped
+        failed = await asyncio.gather(batcher.submit(1, labels=["a"]), return_exceptions=True)
+        served = await batcher.submit(2)
+        await batcher.close()
+        return failed, served
+
+    failed, served = run(scenario())
+    assert isinstance(failed[0], TypeError)
+    assert served == 2
+
+def test_requests_queued_behind_a_dead_worker_are_served_by_its_replacement():
+    """When the worker dies mid-batch, its batch fails and the queued requests are not orphaned"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def process(items, options):
+        started.set()
+        release.wait(5)
+        return items
+
+    async def scenario():
+        batcher = MicroBatcher("slow", process, max_batch_size=1, max_wait_ms=1)
+        in_flight = asyncio.create_task(batcher.submit("first"))
+        await asyncio.to_thread(started.wait, 5)
+        queued = asyncio.create_task(batcher.submit("second"))
+        await asyncio.sleep(0.01)
+        batcher._worker.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        late = await batcher.submit("third")
+        results = await asyncio.gather(in_flight, queued, return_exceptions=True)
+        await batcher.close()
+        return results, late
+
+    (first, second), late = run(scenario())
+    assert isinstance(first, RuntimeError)
+    assert second == "second"
+    assert late == "third"
@@ -0,0 +1,28 @@
+from app.services.chunking import TokenChunker
+
+class WhitespaceTokenizer:
+    """One token per word; decode joins the words back"""
+
+    def __call__(self, text, add_special_tokens=False):
+        if isinstance(text, list):
+            return {"input_ids": [sentence.split() for sentence in text]}
+        return {"input_ids": text.split()}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(ids)
+
+def test_packs_sentences_up_to_the_token_limit():
+    """Whole sentences are packed greedily without exceeding the limit"""
+    chunker = TokenChunker(WhitespaceTokenizer(), max_tokens=5)
+    chunks = chunker.chunk(["a b", "c d", "e f g", " ", "h"])
+
+    assert [chunk.text for chunk in chunks] == ["a b c d", "e f g h"]
+    assert all(chunk.tokens <= 5 for chunk in chunks)
+
+def test_splits_sentences_longer_than_the_limit():
+    """A sentence over the limit is split on token boundaries"""
+    chunker = TokenChunker(WhitespaceTokenizer(), max_tokens=3)
+    chunks = chunker.chunk(["a", "b c d e f g h", "i"])
+
+    assert [chunk.text for chunk in chunks] == ["a", "b c d", "e f g", "h", "i"]
+    assert chunker.count("one two three") == 3
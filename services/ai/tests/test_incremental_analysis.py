@@ -0,0 +1,50 @@
+import asyncio
+from app.services.incremental_analysis import ConsultationStore, IncrementalChatAnalyzer
+from app.services.nlp_service import Analysis
+
+ANALYSES = frozenset({Analysis.ENTITIES, Analysis.KEY_PHRASES, Analysis.SENTIMENT})
+
+class FakeNLPService:
+    """Finds the word 'febre' and scores every line as fully positive"""
+
+    def __init__(self):
+        self.analysed = []
+
+    async def analyze_text(self, text, analyses):
+        self.analysed.append(text)
+        start = text.find("febre")
+        entities = [{"text": "febre", "label": "SYMPTOM", "start": start, "end": start + 5}] if start >= 0 else []
+        return {
+            "entities": entities,
+            "key_phrases": [{"text": text.split(": ", 1)[1]}],
+            "sentiment": {"positive": 1.0, "neutral": 0.0, "negative": 0.0},
+            "timings_ms": {"spacy": 1.0}
+        }
+
+def test_only_new_messages_are_analysed():
+    """A follow-up call analyses only the appended messages and merges all results"""
+    nlp = FakeNLPService()
+    analyzer = IncrementalChatAnalyzer(nlp, ConsultationStore())
+    first = [("1", "user: olá"), ("2", "user: estou com febre")]
+    second = first + [("3", "professional: desde quando tem febre?")]
+
+    asyncio.run(analyzer.analyze("c1", first, ANALYSES))
+    result = asyncio.run(analyzer.analyze("c1", second, ANALYSES))
+
+    assert nlp.analysed == [line for _, line in second]
+    assert result["incremental"] == {"new_messages": 1, "reused_messages": 2}
+    assert len(result["key_phrases"]) == 3
+
+    transcript = "\n".join(line for _, line in second)
+    for entity in result["entities"]:
+        assert transcript[entity["start"]:entity["end"]] == "febre"
+
+def test_edited_message_is_reanalysed():
+    """Changing a message invalidates it and every message after it"""
+    nlp = FakeNLPService()
+    analyzer = IncrementalChatAnalyzer(nlp, ConsultationStore())
+    asyncio.run(analyzer.analyze("c1", [("1", "user: a"), ("2", "user: b")], ANALYSES))
+    result = asyncio.run(analyzer.analyze("c1", [("1", "user: a"), ("2", "user: c")], ANALYSES))
+
+    assert result["incremental"] == {"new_messages": 1, "reused_messages": 1}
+    assert nlp.analysed[-1] == "user: c"
@@ -0,0 +1,26 @@
+import pytest
+from app.config import settings
+from app.services.inference_engine import onnx_model_dir, resolve_engine
+from app.services.model_registry import create_model_registry
+
+def test_resolve_engine_falls_back_to_default(monkeypatch):
+    """Per-model engines override the default; unknown engines are rejected"""
+    monkeypatch.setattr(settings, "INFERENCE_ENGINE", "onnx")
+    assert resolve_engine("") == "onnx"
+    assert resolve_engine("ONNX-int8") == "onnx-int8"
+    with pytest.raises(ValueError):
+        resolve_engine("tensorrt")
+
+def test_registry_records_engine_per_model(monkeypatch):
+    """Each pipeline is registered with its resolved engine, without loading it"""
+    monkeypatch.setattr(settings, "INFERENCE_ENGINE", "pytorch")
+    monkeypatch.setattr(settings, "NER_ENGINE", "onnx-int8")
+    stats = create_model_registry().stats()
+    assert stats["sentiment"]["engine"] == "pytorch"
+    assert stats["ner"]["engine"] == "onnx-int8"
+    assert stats["spacy"]["engine"] is None
+    assert not stats["ner"]["loaded"]
+
+def test_onnx_exports_default_to_the_configured_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "ONNX_CACHE_DIR", str(tmp_path))
+    assert onnx_model_dir("facebook/bart-large-cnn", "onnx") == tmp_path / "facebook--bart-large-cnn" / "onnx"
@@ -0,0 +1,108 @@
+import asyncio
+import httpx
+import pytest
+from app.services.llm import LLMClient, LLMError, TokenBucket
+from app.services.result_cache import LRUCache, ResultCache
+
+def completion(content: str) -> dict:
+    return {
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 3}
+    }
+
+def make_client(handler, **kwargs) -> LLMClient:
+    """Point the client at an in-process stub of the chat completions endpoint"""
+    kwargs.setdefault("retry_backoff_seconds", 0.001)
+    return LLMClient(
+        api_key="test-key",
+        model="gpt-test",
+        base_url="http://llm.stub/v1",
+        transport=httpx.MockTransport(handler),
+        **kwargs
+    )
+
+def test_retries_throttled_and_server_errors():
+    """429 and 5xx responses are retried until the stub succeeds"""
+    responses = iter([
+        httpx.Response(429, headers={"retry-after": "0"}),
+        httpx.Response(503),
+        httpx.Response(200, json=completion("ok"))
+    ])
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/v1/chat/completions"
+        assert request.headers["authorization"] == "Bearer test-key"
+        return next(responses)
+
+    async def scenario():
+        client = make_client(handler)
+        try:
+            return await client.chat_completion("system", "user", "test:v1"), client.stats()
+        finally:
+            await client.aclose()
+
+    content, stats = asyncio.run(scenario())
+    assert content == "ok"
+    assert stats["retries"] == 2
+    assert stats["status_codes"] == {429: 1, 503: 1, 200: 1}
+    assert stats["prompt_tokens"] == 12
+    assert stats["completion_tokens"] == 3
+
+def test_client_errors_are_not_retried():
+    """A 400 fails immediately with its status code"""
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(1)
+        return httpx.Response(400, json={"error": {"message": "bad request"}})
+
+    async def scenario():
+        client = make_client(handler)
+        try:
+            await client.chat_completion("system", "user", "test:v1")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(LLMError) as exc:
+        asyncio.run(scenario())
+    assert exc.value.status_code == 400
+    assert len(calls) == 1
+
+def test_concurrency_is_capped_and_results_cached():
+    """No more than max_concurrency calls are in flight; repeated prompts hit the cache"""
+    in_flight = []
+    peak = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        return httpx.Response(200, json=completion("ok"))
+
+    async def scenario():
+        client = make_client(handler, max_concurrency=2)
+        cache = ResultCache(LRUCache())
+        try:
+            await asyncio.gather(*[client.chat_completion("system", f"prompt {i}", "test:v1") for i in range(6)])
+            await client.chat_completion("system", "cached", "test:v1", cache)
+            await client.chat_completion("system", "cached ", "test:v1", cache)
+            return client.stats()
+        finally:
+            await client.aclose()
+
+    stats = asyncio.run(scenario())
+    assert max(peak) == 2
+    assert stats["requests"] == 7
+
+def test_token_bucket_waits_for_refill():
+    """Acquiring beyond the available tokens waits for the refill"""
+    async def scenario():
+        bucket = TokenBucket(per_minute=600)
+        await bucket.acquire(600)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await bucket.acquire(2)
+        return loop.time() - started
+
+    assert asyncio.run(scenario()) >= 0.15
@@ -0,0 +1,103 @@
+import json
+import logging
+import queue
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.utils.logger import (
+    JsonFormatter,
+    Logger,
+    NonBlockingQueueHandler,
+    RequestIdFilter,
+    RequestIdMiddleware,
+    request_id_var
+)
+
+def _queued_logger(name: str, level: int, maxsize: int = 0):
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=maxsize))
+    handler.addFilter(RequestIdFilter())
+    stdlib = logging.getLogger(name)
+    stdlib.handlers = [handler]
+    stdlib.propagate = False
+    stdlib.setLevel(level)
+    return Logger(name), handler
+
+def test_records_are_formatted_as_json_with_request_id_and_extras():
+    logger, handler = _queued_logger("test.json", logging.INFO)
+    token = request_id_var.set("req-1")
+    try:
+        logger.info("Loaded %s in %.1fs", "ner", 1.25, extra={"model": "ner"})
+    finally:
+        request_id_var.reset(token)
+
+    entry = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+    assert entry["message"] == "Loaded ner in 1.2s"
+    assert entry["request_id"] == "req-1"
+    assert entry["model"] == "ner"
+    assert entry["level"] == "INFO"
+
+def test_disabled_levels_never_format_arguments():
+    formatted = []
+
+    class Expensive:
+        def __str__(self):
+            formatted.append(True)
+            return "expensive"
+
+    logger, handler = _queued_logger("test.lazy", logging.WARNING)
+    logger.info("value %s", Expensive())
+    logger.debug("value %s", Expensive())
+    assert handler.queue.empty()
+    # Enabled records are queued unformatted; the listener formats them later
+    logger.warning("value %s", Expensive())
+    assert not formatted
+    assert handler.queue.get_nowait().getMessage() == "value expensive"
+
+def test_debug_sampling_and_full_queue_drops():
+    logger, handler = _queued_logger("test.sampling", logging.DEBUG, maxsize=1000)
+    for _ in range(1000):
+        logger.debug("hot path", sample_rate=0.1)
+    assert 30 < handler.queue.qsize() < 200
+
+    logger, handler = _queued_logger("test.drops", logging.INFO, maxsize=2)
+    for _ in range(5):
+        logger.info("burst")
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+def _best_call_seconds(log, calls: int = 2000, rounds: int = 5) -> float:
+    # Best of several rounds: scheduler noise only ever makes a round slower
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for i in range(calls):
+            log("batch %d done", i)
+        best = min(best, (time.perf_counter() - started) / calls)
+    return best
+
+def test_disabled_log_calls_cost_a_fraction_of_enabled_ones():
+    """A relative bound, so the test holds on slow or loaded machines"""
+    logger, handler = _queued_logger("test.overhead", logging.INFO)
+    disabled = _best_call_seconds(logger.debug)
+    enabled = _best_call_seconds(logger.info)
+
+    assert handler.queue.qsize() == 2000 * 5
+    # A disabled call is a level check; an enabled one builds and queues a record (typically 20x+ slower)
+    assert disabled * 5 < enabled
+
+def test_middleware_binds_and_echoes_request_id():
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/id")
+    async def current_id():
+        return {"request_id": request_id_var.get()}
+
+    client = TestClient(app)
+    response = client.get("/id", headers={"X-Request-ID": "abc123"})
+    assert response.json() == {"request_id": "abc123"}
+    assert response.headers["x-request-id"] == "abc123"
+
+    generated = client.get("/id")
+    assert generated.headers["x-request-id"] == generated.json()["request_id"]
+    assert request_id_var.get() is None
@@ -0,0 +1,64 @@
+import asyncio
+import numpy as np
+import pytest
+from sanara_common.inference_executor import InferenceExecutor
+from sanara_common.model_server import ModelServerError, ModelServerUnavailable
+from app.services.model_client import ModelServerClient, RemoteModelRegistry
+from app.services.model_registry import ModelRegistry
+from app.services.model_server import ModelServer
+
+def run(coro):
+    return asyncio.run(coro)
+
+class FakeSentiment:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, items, batch_size, **options):
+        self.batch_sizes.append(len(items))
+        # Real pipelines return numpy scores for some tasks
+        return [{"label": item.upper(), "score": np.float32(0.5)} for item in items]
+
+def test_requests_from_several_clients_share_server_batches(tmp_path):
+    """Inputs sent by different workers are batched together on the server"""
+    pipeline = FakeSentiment()
+
+    async def scenario():
+        registry = ModelRegistry(InferenceExecutor(max_workers=2))
+        registry.register("sentiment", lambda: pipeline)
+        server = ModelServer(registry, str(tmp_path / "models.sock"))
+        await server.start()
+        clients = [ModelServerClient(server.path) for _ in range(3)]
+        try:
+            results = await asyncio.gather(*[
+                client.infer("sentiment", [f"{i}a", f"{i}b"], {"truncation": True})
+                for i, client in enumerate(clients)
+            ])
+            health = await clients[0].health()
+            with pytest.raises(ModelServerError):
+                await clients[0].infer("summarizer", ["x"])
+        finally:
+            for client in clients:
+                await client.close()
+            await server.close()
+            await registry.close_batchers()
+            registry.executor.shutdown()
+        return results, health
+
+    results, health = run(scenario())
+    assert results[1] == [{"label": "1A", "score": 0.5}, {"label": "1B", "score": 0.5}]
+    assert sum(pipeline.batch_sizes) == 6 and len(pipeline.batch_sizes) < 6
+    assert health["connections"] == 3
+    assert health["batchers"]["sentiment"]["items"] == 6
+
+def test_unreachable_server_is_reported_as_rejected(tmp_path):
+    """A missing server surfaces as InferenceRejected, which the routers map to 503"""
+    async def scenario():
+        registry = RemoteModelRegistry(ModelServerClient(str(tmp_path / "missing.sock")))
+        try:
+            await registry.batcher("sentiment").submit("texto")
+        finally:
+            registry.executor.shutdown()
+
+    with pytest.raises(ModelServerUnavailable):
+        run(scenario())
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from sanara_common.inference_executor import InferenceExecutor
+from app.config import settings
+from app.services.model_registry import ModelRegistry
+from app.services.nlp_service import Analysis, NLPService
+from app.services.result_cache import LRUCache, ResultCache
+
+class WhitespaceTokenizer:
+    """One token per word, with room for eight tokens per model input"""
+    model_max_length = 8
+
+    def __call__(self, text, add_special_tokens=False):
+        if isinstance(text, list):
+            return {"input_ids": [sentence.split() for sentence in text]}
+        return {"input_ids": text.split()}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(ids)
+
+    def num_special_tokens_to_add(self):
+        return 0
+
+class FakeSummarizer:
+    """Summarizes an input as its first three words"""
+
+    def __init__(self):
+        self.tokenizer = WhitespaceTokenizer()
+        self.inputs = []
+
+    def __call__(self, items, batch_size, **options):
+        self.inputs.extend(items)
+        return [{"summary_text": " ".join(word.strip(".") for word in item.split()[:3]) + "."} for item in items]
+
+class FakeSpacy:
+    """Splits sentences on periods; fails the first ``failures`` calls"""
+
+    def __init__(self, failures=0):
+        self.calls = 0
+        self.failures = failures
+        self._lock = threading.Lock()
+
+    def __call__(self, text):
+        with self._lock:
+            self.calls += 1
+            if self.calls <= self.failures:
+                raise RuntimeError("parser unavailable")
+        sentences = [SimpleNamespace(text=part.strip() + ".") for part in text.split(".") if part.strip()]
+        return SimpleNamespace(ents=[], noun_chunks=[], sents=sentences)
+
+def make_service(spacy, summarizer):
+    registry = ModelRegistry(InferenceExecutor(max_workers=2))
+    registry.register("spacy", lambda: spacy)
+    registry.register("summarizer", lambda: summarizer)
+    return NLPService(registry)
+
+async def close(service):
+    await service.registry.close_batchers()
+    service.registry.executor.shutdown()
+
+def document(sentences):
+    return " ".join(f"s{i} w w w." for i in range(sentences))
+
+def test_stages_of_one_analysis_share_a_parse_that_is_not_kept():
+    """The spaCy stage and the summary chunking parse once; the next analysis parses again"""
+    spacy = FakeSpacy()
+
+    async def scenario():
+        service = make_service(spacy, FakeSummarizer())
+        analyses = {Analysis.ENTITIES, Analysis.SUMMARY}
+        await service.analyze_text(document(4), analyses)
+        first = spacy.calls
+        await service.analyze_text(document(4), analyses)
+        await close(service)
+        return first
+
+    first = asyncio.run(scenario())
+    # The joined partial summaries fit one input, so only the document is parsed
+    assert first == 1
+    assert spacy.calls == 2 * first
+
+def test_failed_parse_is_not_reused():
+    """A failed parse surfaces once; retrying the same text parses again"""
+    spacy = FakeSpacy(failures=1)
+
+    async def scenario():
+        service = make_service(spacy, FakeSummarizer())
+        results = []
+        for _ in range(2):
+            try:
+                results.append(await service.analyze_text("a b. c d.", {Analysis.ENTITIES}))
+            except RuntimeError as e:
+                results.append(e)
+        await close(service)
+        return results
+
+    failed, succeeded = asyncio.run(scenario())
+    assert isinstance(failed, RuntimeError)
+    assert succeeded["entities"] == []
+
+def test_summary_depth_limit_keeps_every_chunk_of_the_document(monkeypatch):
+    """Past SUMMARY_MAX_DEPTH only the partial summaries are truncated, never the document"""
+    monkeypatch.setattr(settings, "SUMMARY_MAX_DEPTH", 0)
+    summarizer = FakeSummarizer()
+
+    async def scenario():
+        service = make_service(FakeSpacy(), summarizer)
+        summary = await service.summarize_text(document(12), max_length=10, min_length=1)
+        await close(service)
+        return summary
+
+    summary = asyncio.run(scenario())
+    # Every sentence of the document reached the model in the first round
+    assert all(any(f"s{i} " in text for text in summarizer.inputs) for i in range(12))
+    assert summary == "s0 w w."
+
+def test_cached_results_are_keyed_by_every_model_and_engine(monkeypatch):
+    """Changing the NER model or an engine misses the cache instead of serving stale results"""
+    spacy = FakeSpacy()
+
+    async def scenario():
+        service = make_service(spacy, FakeSummarizer())
+        service.cache = ResultCache(LRUCache())
+        calls = []
+        for change in [None, ("NER_MODEL", "other-ner"), ("INFERENCE_ENGINE", "onnx-int8"), None]:
+            if change is not None:
+                monkeypatch.setattr(settings, *change)
+            await service.analyze_text("a b. c d.", {Analysis.ENTITIES})
+            calls.append(spacy.calls)
+        await close(service)
+        return calls
+
+    assert asyncio.run(scenario()) == [1, 2, 3, 3]
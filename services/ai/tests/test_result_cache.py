@@ -0,0 +1,67 @@
+import asyncio
+from app.services.result_cache import LRUCache, ResultCache, cache_key, normalize_text
+
+def test_cache_key_ignores_whitespace_after_normalization():
+    """Equivalent inputs map to the same key; different parameters do not"""
+    a = cache_key("llm", prompt=normalize_text("Olá,\n  mundo"), temperature=0.3)
+    b = cache_key("llm", prompt=normalize_text("Olá, mundo "), temperature=0.3)
+    c = cache_key("llm", prompt=normalize_text("Olá, mundo"), temperature=0.7)
+    assert a == b
+    assert a != c
+
+def test_lru_evicts_least_recently_used_and_expires_entries():
+    """The LRU tier is bounded by entry count and honours TTLs"""
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.evictions == 1
+
+    cache.set("expired", 4, ttl_seconds=-1)
+    assert cache.get("expired") == (False, None)
+    assert cache.expirations == 1
+
+def test_get_or_compute_shares_concurrent_misses():
+    """Concurrent misses for one key run the computation once"""
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"summary": "ok"}
+
+    async def scenario():
+        cache = ResultCache(LRUCache())
+        results = await asyncio.gather(*[cache.get_or_compute("k", compute) for _ in range(5)])
+        results.append(await cache.get_or_compute("k", compute))
+        return results, cache.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert all(result == {"summary": "ok"} for result in results)
+    assert len(calls) == 1
+    assert stats["misses"] == 1
+    assert stats["hits"] == 5
+
+def test_shared_tier_failures_are_treated_as_misses():
+    """A broken shared tier never fails the request"""
+    class BrokenTier:
+        async def get(self, key):
+            raise ConnectionError("mongo down")
+
+        async def set(self, key, value, ttl_seconds):
+            raise ConnectionError("mongo down")
+
+    async def compute():
+        return 42
+
+    async def scenario():
+        cache = ResultCache(LRUCache(), BrokenTier())
+        value = await cache.get_or_compute("k", compute)
+        return value, cache.stats()
+
+    value, stats = asyncio.run(scenario())
+    assert value == 42
+    assert stats["shared_errors"] == 2
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import pytest
+from app.services.stage_graph import Stage, StageGraph
+
+def test_independent_stages_run_concurrently():
+    """Latency approaches the slowest stage rather than the sum of stages"""
+    async def slow(value):
+        await asyncio.sleep(0.1)
+        return value
+
+    started = time.perf_counter()
+    result = asyncio.run(StageGraph([
+        Stage("a", lambda: slow(1)),
+        Stage("b", lambda: slow(2)),
+        Stage("c", lambda a, b: slow(a + b), depends_on=("a", "b"))
+    ]).run())
+    elapsed = time.perf_counter() - started
+
+    assert result["c"] == 3
+    assert elapsed < 0.28
+    assert [span.status for span in result.spans] == ["ok", "ok", "ok"]
+
+def test_optional_stage_failure_uses_fallback():
+    """A failing optional stage is recorded and its dependents receive the fallback"""
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def echo(value):
+        return value
+
+    result = asyncio.run(StageGraph([
+        Stage("optional", fail, required=False, fallback="default"),
+        Stage("dependent", lambda optional: echo(optional), depends_on=("optional",))
+    ]).run())
+
+    assert result["dependent"] == "default"
+    spans = {span.name: span for span in result.spans}
+    assert spans["optional"].status == "failed"
+    assert "boom" in spans["optional"].error
+
+def test_required_stage_failure_cancels_the_graph():
+    """A failing required stage raises its error and cancels stages still running"""
+    cancelled = []
+
+    async def fail():
+        raise ValueError("required failed")
+
+    async def long_running():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(ValueError):
+        asyncio.run(StageGraph([
+            Stage("fail", fail),
+            Stage("long", long_running)
+        ]).run())
+
+    assert cancelled == [True]
+
+def test_rejects_dependency_cycles():
+    """Cyclic dependencies are rejected when the graph is built"""
+    async def noop(**_):
+        return None
+
+    with pytest.raises(ValueError):
+        StageGraph([
+            Stage("a", noop, depends_on=("b",)),
+            Stage("b", noop, depends_on=("a",))
+        ])